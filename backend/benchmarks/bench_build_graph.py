@@ -0,0 +1,69 @@
+"""
+CSS依赖图增量构建基准测试
+
+主题包含一个被少数输出导入的共享文件和大量互不相关的CSS文件。修改共享文件后，
+对比完整构建与依赖图增量构建的耗时：增量构建只重新构建依赖于它的输出。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_build_graph
+"""
+
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from src.millennium.build_graph import ThemeBuildGraph
+from src.millennium.css_build import CSSBuilder
+
+
+def make_theme(root: Path, files: int) -> None:
+    root.mkdir(parents=True)
+    (root / "skin.json").write_text(
+        json.dumps({"name": root.name, "author": "bench", "version": "1.0"})
+    )
+    (root / "vars.css").write_text(":root { --accent: #ffffff; }\n")
+    (root / "webkit.css").write_text(
+        "@import 'vars.css';\n" + "body { color: var(--accent); }\n" * 200
+    )
+    for i in range(files):
+        (root / f"page{i}.custom.css").write_text(
+            f".page{i} {{ margin: 0 auto; color: #aabbcc; }}\n" * 200
+        )
+
+
+def run_case(root: Path, files: int, edits: int = 20) -> None:
+    theme = root / f"theme{files}"
+    make_theme(theme, files)
+    builder = CSSBuilder(root / f"cache{files}")
+
+    full, incremental = [], []
+    graph = ThemeBuildGraph(theme, root / "templates", builder)
+    graph.build()
+    for i in range(edits):
+        (theme / "vars.css").write_text(f":root {{ --accent: #{i:06x}; }}\n")
+
+        start = time.perf_counter()
+        ThemeBuildGraph(theme, root / "templates", builder).build()
+        full.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        _, stats = graph.build(changed=["vars.css"])
+        incremental.append((time.perf_counter() - start) * 1000)
+    assert len(stats["rebuilt"]) == 2
+
+    print(
+        f"files={files:<5} full median={statistics.median(full):.3f}ms"
+        f"  incremental median={statistics.median(incremental):.3f}ms"
+    )
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for files in (10, 100, 500):
+            run_case(Path(temp_dir), files)
+
+
+if __name__ == "__main__":
+    main()
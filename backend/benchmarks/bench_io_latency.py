@@ -0,0 +1,97 @@
+"""
+事件循环延迟基准测试
+
+在并发部署大主题的同时持续请求 /api/health/ping，对比同步执行部署
+（阻塞事件循环）与通过 run_io 交给I/O线程池执行时的 ping 延迟。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_io_latency
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from src.main import app
+from src.millennium.builds import SkinBuilds
+from src.millennium.deploy import STRATEGY_COPY, get_deploy_function
+from src.millennium.executor import io_executor, run_io
+
+
+def make_theme(root: Path, files: int = 200, size: int = 256 * 1024) -> None:
+    root.mkdir(parents=True)
+    (root / "skin.json").write_text(
+        '{"name": "Bench", "author": "bench", "version": "1.0"}'
+    )
+    (root / "webkit.css").write_text("body {}\n")
+    for i in range(files):
+        (root / f"asset_{i}.png").write_bytes(os.urandom(size))
+
+
+async def ping_latencies(client: httpx.AsyncClient, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/health/ping")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def run_case(label: str, deploy, concurrency: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping_latencies(client, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(deploy(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        latencies = await pinger
+
+    latencies.sort()
+    p99 = (
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        if latencies
+        else 0
+    )
+    median = statistics.median(latencies) if latencies else 0
+    print(
+        f"{label:<10} deploys={concurrency} total={elapsed:.2f}s "
+        f"pings={len(latencies)} median={median:.2f}ms p99={p99:.2f}ms "
+        f"max={latencies[-1] if latencies else 0:.2f}ms"
+    )
+
+
+async def main(concurrency: int = 4) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        theme = root / "theme"
+        make_theme(theme)
+        deploy_file = get_deploy_function(STRATEGY_COPY)
+
+        def builds(case: str, i: int) -> SkinBuilds:
+            skins = root / case / f"skins{i}"
+            skins.mkdir(parents=True, exist_ok=True)
+            return SkinBuilds(skins, root / case / f"builds{i}", copy_file=deploy_file)
+
+        async def blocking(i):
+            builds("blocking", i).deploy(theme, "Bench")
+
+        async def offloaded(i):
+            await run_io(builds("offloaded", i).deploy, theme, "Bench")
+
+        await run_case("blocking", blocking, concurrency)
+        await run_case("run_io", offloaded, concurrency)
+        print(io_executor.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
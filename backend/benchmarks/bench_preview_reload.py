@@ -0,0 +1,78 @@
+"""
+预览热更新基准测试
+
+对比每次编辑都重新应用整个预览主题（旧的 update_preview 行为）与只写入
+变化文件的热更新路径，主题越大差距越明显。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_preview_reload
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from src.millennium.builds import SkinBuilds
+from src.millennium.core import MillenniumCore
+from src.millennium.preview import ThemePreview
+
+
+def make_theme(root: Path, files: int, size: int = 64 * 1024) -> None:
+    root.mkdir(parents=True)
+    config = {"name": root.name, "author": "bench", "version": "1.0"}
+    (root / "skin.json").write_text(json.dumps(config))
+    (root / "webkit.css").write_text("body {}\n" * 1000)
+    for i in range(files):
+        (root / f"asset_{i}.png").write_bytes(os.urandom(size))
+
+
+def summarize(label: str, samples: list) -> None:
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<24} median={statistics.median(samples):.3f}ms p95={p95:.3f}ms")
+
+
+async def run_case(root: Path, files: int, edits: int = 50) -> None:
+    core = MillenniumCore()
+    core.skins_path = root / f"skins{files}"
+    core.skins_path.mkdir()
+    core.skin_builds = SkinBuilds(
+        core.skins_path, root / f"builds{files}", copy_file=core.deploy_file
+    )
+    preview = ThemePreview(root)
+    preview.core = core
+
+    theme = root / f"theme{files}"
+    make_theme(theme, files)
+    await preview.preview_theme(theme)
+
+    full, hot = [], []
+    for i in range(edits):
+        css = f"body {{ --edit: {i}; }}\n" * 1000
+        start = time.perf_counter()
+        await core.apply_theme(
+            theme, is_preview=True, overlay={"webkit.css": css.encode("utf-8")}
+        )
+        full.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await preview.update_preview(css + "\n")
+        hot.append((time.perf_counter() - start) * 1000)
+
+    summarize(f"full apply ({files} files)", full)
+    summarize(f"hot reload ({files} files)", hot)
+    await preview.close()
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for files in (10, 200, 1000):
+            await run_case(Path(temp_dir), files)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
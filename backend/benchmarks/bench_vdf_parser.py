@@ -0,0 +1,151 @@
+"""
+VDF解析器基准测试
+
+对比旧的按行解析实现与基于分词器的新实现在 1 MB / 10 MB 合成VDF文件上的表现。
+旧实现只能处理 "键" 与 { 写在同一行的格式（键单独一行时会把栈弹空），所以合成
+文件使用这种格式，两种实现解析相同的内容。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_vdf_parser
+"""
+
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from src.millennium.vdf_parser import VDFParser, iter_file_events
+
+
+def legacy_parse(content: str) -> dict:
+    """旧版 VDFParser.parse 的实现，仅用于对比"""
+    lines = content.strip().split("\n")
+    result = {}
+    stack = [(result, 0)]
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        indent_level = (len(line) - len(line.lstrip())) // 2
+        line = line.strip()
+
+        if line.startswith('"') and line.endswith('"'):
+            key = line.strip('"')
+            current_dict = stack[-1][0]
+            current_dict[key] = {}
+        elif line.startswith('"'):
+            key = line.strip('"')
+            value = {}
+            current_dict = stack[-1][0]
+            current_dict[key] = value
+            stack.append((value, indent_level))
+        elif line == "{":
+            continue
+        elif line == "}":
+            if stack:
+                stack.pop()
+
+    return result
+
+
+def count_leaves(data: dict) -> int:
+    """统计解析结果中的叶子节点数量（旧实现把值丢失为空字典）"""
+    return sum(count_leaves(value) if value else 1 for value in data.values())
+
+
+def generate_vdf(target_size: int, seed: int = 0) -> str:
+    """生成类似 localconfig.vdf 的合成VDF内容（键和 { 写在同一行）"""
+    rng = random.Random(seed)
+    parts = [
+        '"UserLocalConfigStore" {\n\t"Software" {\n\t\t"Valve" {\n'
+        '\t\t\t"Steam" {\n\t\t\t\t"apps" {\n'
+    ]
+    size = len(parts[0])
+    app_id = 10
+    while size < target_size:
+        name = "".join(rng.choices(string.ascii_letters, k=12))
+        block = (
+            f'\t\t\t\t\t"{app_id}" {{\n'
+            f'\t\t\t\t\t\t"LastPlayed"\t\t"{rng.randint(1, 2**31)}"\n'
+            f'\t\t\t\t\t\t"Playtime"\t\t"{rng.randint(0, 100000)}"\n'
+            f'\t\t\t\t\t\t"name"\t\t"{name} \\"edition\\""\n'
+            f'\t\t\t\t\t\t"cloud" {{\n'
+            f'\t\t\t\t\t\t\t"last_sync_state"\t\t"synchronized"\n'
+            f"\t\t\t\t\t\t}}\n"
+            f"\t\t\t\t\t}}\n"
+        )
+        parts.append(block)
+        size += len(block)
+        app_id += 10
+    parts.append("\t\t\t\t}\n\t\t\t}\n\t\t}\n\t}\n}\n")
+    return "".join(parts)
+
+
+def measure(func, *args):
+    """返回 (结果, 耗时, 峰值内存)；计时与内存统计分两次运行，避免相互干扰"""
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception as e:
+        result = e
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        func(*args)
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def count_file_events(path: Path) -> int:
+    return sum(1 for _ in iter_file_events(path))
+
+
+def run(sizes=(1 << 20, 10 << 20)) -> None:
+    parser = VDFParser()
+    print(
+        f"{'size':>8} {'impl':<18} {'time (s)':>10} "
+        f"{'peak mem (MB)':>14} {'leaf values':>12}"
+    )
+    for size in sizes:
+        content = generate_vdf(size)
+        label = f"{size >> 20} MB"
+
+        data, elapsed, peak = measure(legacy_parse, content)
+        leaves = (
+            type(data).__name__ if isinstance(data, Exception) else count_leaves(data)
+        )
+        print(
+            f"{label:>8} {'legacy parse':<18} {elapsed:>10.3f} "
+            f"{peak / 2**20:>14.1f} {leaves:>12}"
+        )
+
+        data, elapsed, peak = measure(parser.parse, content)
+        leaves = sum(1 for _ in parser.iter_events(content))
+        print(
+            f"{label:>8} {'tokenizer parse':<18} {elapsed:>10.3f} "
+            f"{peak / 2**20:>14.1f} {leaves:>12}"
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "localconfig.vdf"
+            path.write_text(content, encoding="utf-8")
+            del content, data
+            count, elapsed, peak = measure(count_file_events, path)
+            print(
+                f"{label:>8} {'mmap event stream':<18} {elapsed:>10.3f} "
+                f"{peak / 2**20:>14.1f} {count:>12}"
+            )
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) << 20 for arg in sys.argv[1:]) or (1 << 20, 10 << 20)
+    run(sizes)
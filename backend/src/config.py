@@ -1,37 +1,77 @@
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
+
 from pydantic_settings import BaseSettings
-from functools import lru_cache
+
 
 class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///./steam_theme_studio.db"
-    
+
     # 应用配置
     APP_NAME: str = "Steam Theme Studio"
     APP_VERSION: str = "0.1.0"
     DEBUG: bool = True
-    
+
     # 路径配置
     BASE_DIR: Path = Path(__file__).parent.parent
     MILLENNIUM_PATH: Path = BASE_DIR / "millennium"
     THEMES_PATH: Path = BASE_DIR / "themes"
     TEMP_DIR: Path = BASE_DIR / "temp"
-    
+    IMPORT_PATH: Path = BASE_DIR / "imports"  # 批量导入只读取该目录下的主题压缩包
+
     # CORS配置
     CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000"]
-    
+
     # WebSocket配置
     WS_HEARTBEAT_INTERVAL: int = 30  # 秒
-    
+    PREVIEW_DEBOUNCE_MS: int = 30  # 预览编辑的防抖窗口，窗口内同一文件只应用最新内容
+
+    # 预览会话配置
+    PREVIEW_TRANSPORT: str = "file"  # file: 写入已部署的皮肤 / devtools: 通过CEF调试协议注入
+    CEF_DEBUG_HOST: str = "127.0.0.1"
+    CEF_DEBUG_PORT: int = 8080  # Steam CEF远程调试端口
+    PREVIEW_MAX_SESSIONS: int = 4  # 同时保留的预览会话数量
+    PREVIEW_IDLE_TIMEOUT: int = 600  # 秒，没有连接的会话空闲超过该时间后关闭
+
+    # 部署配置
+    DEPLOY_STRATEGY: str = "auto"  # auto / reflink / hardlink / copy
+    MAX_WARM_BUILDS: int = 4  # 保留的热备皮肤构建数量
+
+    # 文件I/O线程池配置
+    IO_WORKERS: int = 8  # 执行文件操作的线程数
+    IO_MAX_PENDING: int = 64  # 线程池满载时允许排队的任务数，超出后调用方等待
+
+    # 批量验证配置
+    VALIDATION_WORKERS: Optional[int] = None  # 验证进程数，默认为CPU核数
+
+    # CSS构建配置
+    CSS_BUILD_MODE: str = "minify"  # minify: 应用和导出时压缩CSS / passthrough: 原样输出（调试用）
+
+    # 导出配置
+    EXPORT_WORKERS: int = 4  # 同时压缩的文件数
+    EXPORT_CHUNK_SIZE: int = 256 * 1024  # 流式导出时每次读取和压缩的字节数
+
+    # 导入配置
+    IMPORT_MAX_SIZE: int = 512 * 1024 * 1024  # 主题压缩包解压后的总大小上限
+    IMPORT_MAX_FILES: int = 10000  # 主题压缩包中的文件数量上限
+    IMPORT_MAX_RATIO: int = 100  # 压缩率上限（解压后大小 / 压缩后大小），用于拒绝压缩炸弹
+    IMPORT_WORKERS: Optional[int] = None  # 批量导入的进程数，默认为CPU核数
+
+    # 缓存配置
+    PARSE_CACHE_SIZE: int = 256  # 已解析文件缓存的最大条目数
+
     class Config:
         env_file = ".env"
 
+    def ensure_directories(self) -> None:
+        """确保必要的目录存在（在应用启动时调用，而不是在导入时）"""
+        self.THEMES_PATH.mkdir(parents=True, exist_ok=True)
+        self.TEMP_DIR.mkdir(parents=True, exist_ok=True)
+        self.IMPORT_PATH.mkdir(parents=True, exist_ok=True)
+
+
 @lru_cache()
 def get_settings() -> Settings:
-    settings = Settings()
-    
-    # 确保必要的目录存在
-    settings.THEMES_PATH.mkdir(parents=True, exist_ok=True)
-    settings.TEMP_DIR.mkdir(parents=True, exist_ok=True)
-    
-    return settings 
\ No newline at end of file
+    return Settings()
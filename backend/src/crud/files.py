@@ -1,20 +1,22 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..models import ThemeFile
+
+from ..models import Theme, ThemeFile
 from ..schemas import ThemeFileCreate, ThemeFileUpdate
 
+
 async def get_theme_file(db: AsyncSession, file_id: int):
     """获取特定文件"""
     result = await db.execute(select(ThemeFile).filter(ThemeFile.id == file_id))
     return result.scalar_one_or_none()
 
+
 async def get_theme_files(db: AsyncSession, theme_id: int):
     """获取主题的所有文件"""
-    result = await db.execute(
-        select(ThemeFile).filter(ThemeFile.theme_id == theme_id)
-    )
+    result = await db.execute(select(ThemeFile).filter(ThemeFile.theme_id == theme_id))
     return result.scalars().all()
 
+
 async def create_theme_file(db: AsyncSession, file: ThemeFileCreate):
     """创建新文件"""
     db_file = ThemeFile(**file.model_dump())
@@ -23,6 +25,7 @@ async def create_theme_file(db: AsyncSession, file: ThemeFileCreate):
     await db.refresh(db_file)
     return db_file
 
+
 async def update_theme_file(db: AsyncSession, file_id: int, file: ThemeFileUpdate):
     """更新文件"""
     db_file = await get_theme_file(db, file_id)
@@ -34,10 +37,27 @@ async def update_theme_file(db: AsyncSession, file_id: int, file: ThemeFileUpdat
         await db.refresh(db_file)
     return db_file
 
+
 async def delete_theme_file(db: AsyncSession, file_id: int):
     """删除文件"""
     db_file = await get_theme_file(db, file_id)
     if db_file:
         await db.delete(db_file)
         await db.commit()
-    return db_file 
\ No newline at end of file
+    return db_file
+
+
+async def get_css_file_versions(db: AsyncSession):
+    """获取所有CSS文件的 (文件ID, 主题名称, 文件路径, 更新时间)，不读取文件内容"""
+    result = await db.execute(
+        select(ThemeFile.id, Theme.name, ThemeFile.file_path, ThemeFile.updated_at)
+        .join(Theme, Theme.id == ThemeFile.theme_id)
+        .filter(ThemeFile.file_type == "css")
+    )
+    return result.all()
+
+
+async def get_theme_files_by_ids(db: AsyncSession, file_ids):
+    """批量获取文件"""
+    result = await db.execute(select(ThemeFile).filter(ThemeFile.id.in_(file_ids)))
+    return result.scalars().all()
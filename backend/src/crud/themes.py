@@ -1,23 +1,30 @@
+from typing import List
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+
 from ..models import Theme
 from ..schemas import ThemeCreate, ThemeUpdate
 
+
 async def get_theme(db: AsyncSession, theme_id: int):
     """获取特定主题"""
     result = await db.execute(select(Theme).filter(Theme.id == theme_id))
     return result.scalar_one_or_none()
 
+
 async def get_theme_by_name(db: AsyncSession, name: str):
     """通过名称获取主题"""
     result = await db.execute(select(Theme).filter(Theme.name == name))
     return result.scalar_one_or_none()
 
+
 async def get_themes(db: AsyncSession, skip: int = 0, limit: int = 10):
     """获取主题列表"""
     result = await db.execute(select(Theme).offset(skip).limit(limit))
     return result.scalars().all()
 
+
 async def create_theme(db: AsyncSession, theme: ThemeCreate):
     """创建新主题"""
     db_theme = Theme(**theme.model_dump())
@@ -26,6 +33,7 @@ async def create_theme(db: AsyncSession, theme: ThemeCreate):
     await db.refresh(db_theme)
     return db_theme
 
+
 async def update_theme(db: AsyncSession, theme_id: int, theme: ThemeUpdate):
     """更新主题"""
     db_theme = await get_theme(db, theme_id)
@@ -37,10 +45,30 @@ async def update_theme(db: AsyncSession, theme_id: int, theme: ThemeUpdate):
         await db.refresh(db_theme)
     return db_theme
 
+
 async def delete_theme(db: AsyncSession, theme_id: int):
     """删除主题"""
     db_theme = await get_theme(db, theme_id)
     if db_theme:
         await db.delete(db_theme)
         await db.commit()
-    return db_theme 
\ No newline at end of file
+    return db_theme
+
+
+async def upsert_themes(db: AsyncSession, themes: List[ThemeCreate]) -> int:
+    """按名称批量创建或更新主题，在一个事务中提交"""
+    if not themes:
+        return 0
+    result = await db.execute(
+        select(Theme).filter(Theme.name.in_([theme.name for theme in themes]))
+    )
+    existing = {db_theme.name: db_theme for db_theme in result.scalars()}
+    for theme in themes:
+        db_theme = existing.get(theme.name)
+        if db_theme is None:
+            db.add(Theme(**theme.model_dump()))
+        else:
+            for key, value in theme.model_dump().items():
+                setattr(db_theme, key, value)
+    await db.commit()
+    return len(themes)
@@ -1,29 +1,43 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+
 from .config import get_settings
 
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-)
 
-AsyncSessionLocal = sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+@lru_cache()
+def get_engine():
+    """获取数据库引擎（首次使用时创建，避免在导入时加载数据库驱动）"""
+    return create_async_engine(
+        settings.DATABASE_URL,
+        echo=settings.DEBUG,
+    )
+
+
+@lru_cache()
+def get_sessionmaker():
+    """获取会话工厂"""
+    return sessionmaker(
+        get_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
 
 class Base(DeclarativeBase):
     pass
 
+
 async def init_db():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
         try:
             yield session
             await session.commit()
@@ -31,4 +45,4 @@ async def get_db():
             await session.rollback()
             raise
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
@@ -1,27 +1,42 @@
+from contextlib import asynccontextmanager
+
+from src.startup import startup_report
+
+# 以下导入的耗时记录为 import 阶段，startup_report 需要在它们之前导入
+# isort: split
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+
 from src.config import get_settings
 from src.database import init_db
 from src.routes import api_router
 from src.websocket import websocket_router
 
+startup_report.mark("import")
+
 settings = get_settings()
 
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时运行
-    await init_db()
+    with startup_report.phase("lifespan:directories"):
+        settings.ensure_directories()
+    with startup_report.phase("lifespan:init_db"):
+        await init_db()
+    startup_report.mark_ready()
     yield
     # 关闭时运行
     pass
 
+
 app = FastAPI(
     title="Steam Theme Studio API",
     description="Steam主题设计器的后端API服务",
     version="0.1.0",
     lifespan=lifespan,
 )
+app.state.startup_report = startup_report
 
 # 配置CORS
 app.add_middleware(
@@ -35,12 +50,14 @@ app.add_middleware(
 # 注册路由
 app.include_router(api_router)
 app.include_router(websocket_router)
+startup_report.mark("app:setup")
 
 if __name__ == "__main__":
     import uvicorn
+
     uvicorn.run(
         "src.main:app",
         host="127.0.0.1",
         port=8000,
         reload=settings.DEBUG,
-    ) 
\ No newline at end of file
+    )
@@ -0,0 +1,227 @@
+"""
+主题资源的内容寻址存储
+图片、字体等资源文件按内容的SHA-256保存在主题根目录下的 .assets/objects 中，主题
+目录中的文件是指向对象的硬链接，内容相同的资源在所有主题之间只保存一份。对象的
+引用计数就是文件系统的硬链接数（减去对象本身），删除主题后硬链接数为1的对象
+即为垃圾，可以直接删除。
+
+对象和主题中的文件是同一个文件，原地修改会影响所有引用它的主题，所以只存储
+通常整体替换的资源文件，CSS和 skin.json 不进入存储，存入的对象设为只读。
+"""
+
+import os
+import threading
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .sync import file_hash, iter_files
+
+ASSET_DIR = ".assets"
+
+ASSET_EXTENSIONS = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".ico",
+    ".bmp",
+    ".svg",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".otf",
+    ".eot",
+    ".mp3",
+    ".ogg",
+    ".wav",
+    ".mp4",
+    ".webm",
+}
+
+Inode = Tuple[int, int]
+
+OBJECT_MODE = 0o444
+
+
+def is_asset(rel_path: str) -> bool:
+    """文件是否存入资源存储"""
+    return PurePosixPath(rel_path).suffix.lower() in ASSET_EXTENSIONS
+
+
+def _make_read_only(path: Path) -> None:
+    # Windows上只读属性会使删除和替换主题目录失败，只在其他平台上设置
+    if os.name != "nt":
+        try:
+            os.chmod(path, OBJECT_MODE)
+        except OSError:
+            pass
+
+
+class AssetStore:
+    def __init__(self, root: Path):
+        self.root = root
+        self.objects_dir = root / "objects"
+        self._inodes: Optional[Dict[Inode, str]] = None  # 对象的 (设备, inode) -> 哈希
+        self._lock = threading.Lock()
+        self.bytes_deduplicated = 0
+        self.bytes_reclaimed = 0
+        self.objects_collected = 0
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _iter_objects(self) -> Iterator[Tuple[str, os.stat_result]]:
+        if not self.objects_dir.exists():
+            return
+        for _, entry in iter_files(self.objects_dir):
+            yield entry.path, entry.stat(follow_symlinks=False)
+
+    def _is_object(self, inodes: Dict[Inode, str], inode: Inode) -> bool:
+        # 缓存可能已过期（其他实例或进程回收了对象、inode被新文件重用），以对象路径的当前状态为准
+        digest = inodes.get(inode)
+        if digest is None:
+            return False
+        try:
+            object_stat = self._object_path(digest).stat()
+        except OSError:
+            object_stat = None
+        if (
+            object_stat is not None
+            and (object_stat.st_dev, object_stat.st_ino) == inode
+        ):
+            return True
+        del inodes[inode]
+        return False
+
+    def _load_inodes(self) -> Dict[Inode, str]:
+        if self._inodes is None:
+            self._inodes = {
+                (st.st_dev, st.st_ino): Path(path).name
+                for path, st in self._iter_objects()
+            }
+        return self._inodes
+
+    def ingest_tree(self, theme_dir: Path) -> Dict[str, int]:
+        """把主题目录中的资源文件存入存储，已有相同内容的对象时把文件替换为指向对象的硬链接
+
+        不支持硬链接（例如跨文件系统）的文件保持原样，计入 skipped。
+        """
+        stats = {
+            "files": 0,
+            "stored": 0,
+            "deduplicated": 0,
+            "bytes_deduplicated": 0,
+            "skipped": 0,
+        }
+        if not theme_dir.is_dir():
+            return stats
+        with self._lock:
+            inodes = self._load_inodes()
+            for rel_path, entry in iter_files(theme_dir):
+                if not is_asset(rel_path) or entry.is_symlink():
+                    continue
+                stats["files"] += 1
+                st = entry.stat(follow_symlinks=False)
+                if self._is_object(inodes, (st.st_dev, st.st_ino)):
+                    continue  # 已经是存储中的对象
+
+                path = Path(entry.path)
+                digest = file_hash(path)
+                target = self._object_path(digest)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    # 第一次出现的内容：文件本身成为对象，不需要复制
+                    os.link(path, target)
+                    _make_read_only(target)
+                    inodes[(st.st_dev, st.st_ino)] = digest
+                    stats["stored"] += 1
+                    continue
+                except FileExistsError:
+                    pass
+                except OSError:
+                    stats["skipped"] += 1
+                    continue
+
+                try:
+                    object_stat = target.stat()
+                except OSError:
+                    stats["skipped"] += 1
+                    continue
+                inode = (object_stat.st_dev, object_stat.st_ino)
+                if inode == (st.st_dev, st.st_ino):
+                    inodes[inode] = digest  # 其他进程已经存入了这个文件
+                    continue
+                # 对象按内容命名，链接前仍然确认内容一致，防止对象被修改后扩散到其他主题
+                if (
+                    object_stat.st_size != st.st_size
+                    or file_hash(target) != digest
+                    or not self._link_object(target, path)
+                ):
+                    stats["skipped"] += 1
+                    continue
+                inodes[inode] = digest
+                stats["deduplicated"] += 1
+                stats["bytes_deduplicated"] += st.st_size
+            self.bytes_deduplicated += stats["bytes_deduplicated"]
+        return stats
+
+    def _link_object(self, target: Path, path: Path) -> bool:
+        # 先在同一目录中创建硬链接再原子地替换，替换失败时原文件保持不变
+        temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.link")
+        try:
+            os.link(target, temp)
+            os.replace(temp, path)
+        except OSError:
+            try:
+                temp.unlink()
+            except FileNotFoundError:
+                pass
+            return False
+        return True
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """删除没有被任何主题引用（硬链接数为1）的对象，返回删除的对象数量和回收的字节数"""
+        removed = reclaimed = 0
+        with self._lock:
+            inodes = self._load_inodes()
+            for path, st in list(self._iter_objects()):
+                if st.st_nlink > 1:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                inodes.pop((st.st_dev, st.st_ino), None)
+                removed += 1
+                reclaimed += st.st_size
+            self.objects_collected += removed
+            self.bytes_reclaimed += reclaimed
+        return {"removed": removed, "bytes_reclaimed": reclaimed}
+
+    def stats(self) -> Dict[str, Any]:
+        """获取对象数量、引用数量、去重率和累计回收的空间
+
+        引用数按硬链接数计算，使用硬链接部署到Steam的文件也计入引用。
+        """
+        objects = object_bytes = references = referenced_bytes = 0
+        for _, st in self._iter_objects():
+            objects += 1
+            object_bytes += st.st_size
+            references += st.st_nlink - 1
+            referenced_bytes += st.st_size * (st.st_nlink - 1)
+        return {
+            "objects": objects,
+            "object_bytes": object_bytes,
+            "references": references,
+            "referenced_bytes": referenced_bytes,
+            "dedup_ratio": round(referenced_bytes / object_bytes, 3)
+            if object_bytes
+            else 1.0,
+            "bytes_saved": max(referenced_bytes - object_bytes, 0),
+            "bytes_deduplicated": self.bytes_deduplicated,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "objects_collected": self.objects_collected,
+        }
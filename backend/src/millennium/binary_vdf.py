@@ -0,0 +1,278 @@
+"""
+二进制VDF读取器
+用于读取Steam的 appinfo.vdf / shortcuts.vdf 等二进制配置文件
+
+AppInfoReader 通过内存映射打开文件，首次打开时只根据每个条目的长度字段
+建立 app_id -> 偏移 的索引，具体条目在访问时才解码，因此按 app_id 随机查询
+不需要解码整个文件，内存占用也不随文件大小增长。
+"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# 二进制VDF的类型标记
+TYPE_MAP = 0x00
+TYPE_STRING = 0x01
+TYPE_INT32 = 0x02
+TYPE_FLOAT32 = 0x03
+TYPE_POINTER = 0x04
+TYPE_WIDESTRING = 0x05
+TYPE_COLOR = 0x06
+TYPE_UINT64 = 0x07
+TYPE_MAP_END = 0x08
+TYPE_INT64 = 0x0A
+TYPE_MAP_END_ALT = 0x0B
+
+# appinfo.vdf 文件头魔数
+APPINFO_MAGIC_V27 = 0x07564427
+APPINFO_MAGIC_V28 = 0x07564428
+APPINFO_MAGIC_V29 = 0x07564429
+
+_INT32 = struct.Struct("<i")
+_UINT32 = struct.Struct("<I")
+_FLOAT32 = struct.Struct("<f")
+_UINT64 = struct.Struct("<Q")
+_INT64 = struct.Struct("<q")
+_APPINFO_HEADER = struct.Struct("<II")
+_ENTRY_PREFIX = struct.Struct("<II")  # app_id, size
+# info_state, last_updated, pics_token, sha1, change_number
+_ENTRY_HEADER_V27 = struct.Struct("<IIQ20sI")
+# 在v27基础上增加 binary_data_sha1
+_ENTRY_HEADER_V28 = struct.Struct("<IIQ20sI20s")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _read_cstring(data: Buffer, pos: int) -> Tuple[str, int]:
+    end = data.find(b"\x00", pos)
+    if end < 0:
+        raise ValueError(f"二进制VDF格式错误: 位置 {pos} 处字符串未结束")
+    return bytes(data[pos:end]).decode("utf-8", errors="replace"), end + 1
+
+
+def _read_wstring(data: Buffer, pos: int) -> Tuple[str, int]:
+    end = pos
+    while True:
+        end = data.find(b"\x00\x00", end)
+        if end < 0:
+            raise ValueError(f"二进制VDF格式错误: 位置 {pos} 处宽字符串未结束")
+        if (end - pos) % 2 == 0:
+            break
+        end += 1
+    return bytes(data[pos:end]).decode("utf-16-le", errors="replace"), end + 2
+
+
+class BinaryVDFParser:
+    def __init__(self, key_table: Optional[List[str]] = None):
+        # appinfo v29 中键以字符串表索引的形式存储
+        self.key_table = key_table
+
+    def _read_key(self, data: Buffer, pos: int) -> Tuple[str, int]:
+        if self.key_table is None:
+            return _read_cstring(data, pos)
+        (index,) = _UINT32.unpack_from(data, pos)
+        return self.key_table[index], pos + 4
+
+    def parse(self, data: Buffer, offset: int = 0) -> Dict[str, Any]:
+        """解析二进制VDF数据为字典"""
+        result, _ = self.parse_from(data, offset)
+        return result
+
+    def parse_from(self, data: Buffer, offset: int = 0) -> Tuple[Dict[str, Any], int]:
+        """从 offset 处解析一个完整的块，返回 (字典, 结束偏移)"""
+        result: Dict[str, Any] = {}
+        stack = [result]
+        pos = offset
+        length = len(data)
+
+        while pos < length:
+            value_type = data[pos]
+            pos += 1
+
+            if value_type in (TYPE_MAP_END, TYPE_MAP_END_ALT):
+                stack.pop()
+                if not stack:
+                    return result, pos
+                continue
+
+            key, pos = self._read_key(data, pos)
+            current = stack[-1]
+
+            if value_type == TYPE_MAP:
+                child: Dict[str, Any] = {}
+                current[key] = child
+                stack.append(child)
+            elif value_type == TYPE_STRING:
+                current[key], pos = _read_cstring(data, pos)
+            elif value_type == TYPE_WIDESTRING:
+                current[key], pos = _read_wstring(data, pos)
+            elif value_type in (TYPE_INT32, TYPE_POINTER, TYPE_COLOR):
+                (current[key],) = _INT32.unpack_from(data, pos)
+                pos += 4
+            elif value_type == TYPE_FLOAT32:
+                (current[key],) = _FLOAT32.unpack_from(data, pos)
+                pos += 4
+            elif value_type == TYPE_UINT64:
+                (current[key],) = _UINT64.unpack_from(data, pos)
+                pos += 8
+            elif value_type == TYPE_INT64:
+                (current[key],) = _INT64.unpack_from(data, pos)
+                pos += 8
+            else:
+                raise ValueError(f"二进制VDF格式错误: 位置 {pos - 1} 处未知类型 {value_type:#x}")
+
+        if len(stack) == 1:
+            # 顶层数据可以省略最后的结束标记
+            return result, pos
+        raise ValueError("二进制VDF格式错误: 数据意外结束")
+
+    def load(self, path: Path) -> Dict[str, Any]:
+        """读取二进制VDF文件（如 shortcuts.vdf）"""
+        with open(path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                return {}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.parse(mm)
+
+
+class AppInfoReader:
+    """appinfo.vdf 的惰性读取器"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.version = 0
+        self.universe = 0
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._index: Dict[int, Tuple[int, int]] = {}
+        self._parser: Optional[BinaryVDFParser] = None
+        self._header: Optional[struct.Struct] = None
+        self._size = -1  # 建立索引时的文件大小
+
+    def open(self) -> "AppInfoReader":
+        """映射文件并建立条目索引（release 后重新映射时，文件大小不变则沿用索引）"""
+        if self._mm is not None:
+            return self
+
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self._mm) != self._size:
+                self._build_index()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _build_index(self) -> None:
+        mm = self._mm
+        magic, self.universe = _APPINFO_HEADER.unpack_from(mm, 0)
+        pos = _APPINFO_HEADER.size
+        end = len(mm)
+        key_table = None
+
+        if magic == APPINFO_MAGIC_V27:
+            self.version, self._header = 27, _ENTRY_HEADER_V27
+        elif magic == APPINFO_MAGIC_V28:
+            self.version, self._header = 28, _ENTRY_HEADER_V28
+        elif magic == APPINFO_MAGIC_V29:
+            self.version, self._header = 29, _ENTRY_HEADER_V28
+            (table_offset,) = _INT64.unpack_from(mm, pos)
+            pos += 8
+            end = table_offset
+            key_table = self._read_key_table(table_offset)
+        else:
+            raise ValueError(f"不支持的appinfo.vdf版本: {magic:#x}")
+
+        self._parser = BinaryVDFParser(key_table)
+
+        # 只读取 app_id 和长度字段，按长度跳过条目内容
+        index = {}
+        while pos + _ENTRY_PREFIX.size <= end:
+            app_id, size = _ENTRY_PREFIX.unpack_from(mm, pos)
+            if app_id == 0:
+                break
+            start = pos + _ENTRY_PREFIX.size
+            index[app_id] = (start, size)
+            pos = start + size
+        self._index = index
+        self._size = len(mm)
+
+    def _read_key_table(self, offset: int) -> List[str]:
+        (count,) = _UINT32.unpack_from(self._mm, offset)
+        pos = offset + 4
+        table = []
+        for _ in range(count):
+            key, pos = _read_cstring(self._mm, pos)
+            table.append(key)
+        return table
+
+    def release(self) -> None:
+        """释放内存映射和文件句柄但保留条目索引，下次读取时重新映射
+
+        长期持有映射会阻止Steam替换文件（Windows），文件被原地截断时访问映射会触发SIGBUS。
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        """释放内存映射并丢弃索引"""
+        self.release()
+        self._index = {}
+        self._size = -1
+
+    def __enter__(self) -> "AppInfoReader":
+        return self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _ensure_open(self) -> None:
+        if self._mm is None:
+            self.open()
+
+    def __len__(self) -> int:
+        self._ensure_open()
+        return len(self._index)
+
+    def __contains__(self, app_id: int) -> bool:
+        self._ensure_open()
+        return app_id in self._index
+
+    def __iter__(self) -> Iterator[int]:
+        self._ensure_open()
+        return iter(list(self._index))
+
+    def app_ids(self) -> List[int]:
+        """获取所有app_id"""
+        self._ensure_open()
+        return list(self._index)
+
+    def __getitem__(self, app_id: int) -> Dict[str, Any]:
+        self._ensure_open()
+        start, size = self._index[app_id]
+        header = self._header.unpack_from(self._mm, start)
+        data_start = start + self._header.size
+        data = self._parser.parse(self._mm[data_start : start + size])
+        return {
+            "app_id": app_id,
+            "info_state": header[0],
+            "last_updated": header[1],
+            "pics_token": header[2],
+            "sha1": header[3].hex(),
+            "change_number": header[4],
+            "data": data,
+        }
+
+    def get(self, app_id: int, default: Any = None) -> Any:
+        """按app_id获取并解码单个条目"""
+        try:
+            return self[app_id]
+        except KeyError:
+            return default
@@ -0,0 +1,346 @@
+"""
+主题CSS构建依赖图
+主题的 skin.json 可以通过 "template" 字段继承 THEMES_PATH/templates 下的模板（模板
+的 skin.json 也可以继续继承），主题中的同名CSS文件覆盖模板中的文件。文件开头对本地
+CSS文件的 @import 在构建时内联；文件导入与自身同名的文件时，导入的是上一层模板中的
+版本，便于在模板样式的基础上追加修改。
+
+构建时记录每个输出依赖的文件，之后只重新构建依赖于变化文件的输出，
+单个文件修改后的构建时间与受影响的输出数量成正比，而不是与主题大小成正比。
+预览中只保存在内存里的修改通过 build_overlay 代替磁盘上的文件参与构建。
+"""
+
+import posixpath
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config import get_settings
+from .cache import parse_cache
+from .css_build import CSSBuilder, css_builder
+from .sync import iter_files
+
+settings = get_settings()
+
+TEMPLATE_KEY = "template"
+
+NodeKey = Tuple[int, str]  # (层级, 相对路径)，层级0为主题本身，之后依次为各级模板
+Stamps = Dict[NodeKey, Tuple[int, int]]
+
+_PRELUDE = re.compile(r"\s+|/\*.*?\*/|@charset\s+[^;]*;", re.S | re.I)
+_IMPORT = re.compile(
+    r"""@import\s+(?:url\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s]*))\s*\)"""
+    r"""|"([^"]*)"|'([^']*)')\s*([^;]*);""",
+    re.I,
+)
+_EXTERNAL = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|/)", re.I)
+
+
+def split_imports(text: str) -> Tuple[List[Tuple[str, str, str]], str]:
+    """拆分文件开头的 @import，返回 ([(语句, 目标, 媒体查询)], 其余内容)"""
+    imports = []
+    position = 0
+    while True:
+        match = _PRELUDE.match(text, position)
+        if match:
+            position = match.end()
+            continue
+        match = _IMPORT.match(text, position)
+        if not match:
+            break
+        target = next(group for group in match.groups()[:5] if group is not None)
+        imports.append((match.group(), target, match.group(6).strip()))
+        position = match.end()
+    return imports, text[position:] if imports else text
+
+
+class ThemeBuildGraph:
+    def __init__(
+        self, theme_path: Path, templates_dir: Path, builder: CSSBuilder = css_builder
+    ):
+        self.theme_path = theme_path
+        self.templates_dir = templates_dir
+        self.builder = builder
+        self._layers: Optional[List[Path]] = None
+        self._stamps: Stamps = {}
+        self._outputs: Dict[str, bytes] = {}
+        self._deps: Dict[str, Set[str]] = {}  # 输出 -> 依赖的文件
+        self._dependents: Dict[str, Set[str]] = {}  # 文件 -> 依赖它的输出
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.rebuilt = 0
+
+    def resolve_layers(self) -> List[Path]:
+        """解析模板继承链，返回 [主题目录, 模板目录, 上一级模板目录, ...]"""
+        layers = [self.theme_path]
+        config_path = self.theme_path / "skin.json"
+        while True:
+            try:
+                config = parse_cache.load_json(config_path)
+            except (OSError, ValueError):
+                break
+            template = config.get(TEMPLATE_KEY) if isinstance(config, dict) else None
+            if not template:
+                break
+            if (
+                not isinstance(template, str)
+                or template in (".", "..")
+                or "/" in template
+                or "\\" in template
+            ):
+                raise ValueError(f"无效的模板名称: {template}")
+            template_path = self.templates_dir / template
+            if template_path in layers:
+                raise ValueError(f"模板循环继承: {template}")
+            if not template_path.is_dir():
+                raise ValueError(f"模板不存在: {template}")
+            layers.append(template_path)
+            config_path = template_path / "skin.json"
+        return layers
+
+    def _scan(self, layers: List[Path]) -> Stamps:
+        stamps: Stamps = {}
+        for level, root in enumerate(layers):
+            if not root.exists():
+                continue
+            for rel_path, entry in iter_files(root):
+                if rel_path.lower().endswith(".css"):
+                    stat = entry.stat()
+                    stamps[(level, rel_path)] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _restat(self, layers: List[Path], rel_paths: Iterable[str]) -> Stamps:
+        stamps = dict(self._stamps)
+        for rel_path in rel_paths:
+            rel_path = Path(rel_path).as_posix()
+            if not rel_path.lower().endswith(".css"):
+                continue
+            for level, root in enumerate(layers):
+                try:
+                    stat = (root / rel_path).stat()
+                except FileNotFoundError:
+                    stamps.pop((level, rel_path), None)
+                    continue
+                stamps[(level, rel_path)] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _set_deps(self, output: str, deps: Set[str]) -> None:
+        for rel_path in self._deps.pop(output, ()):
+            dependents = self._dependents.get(rel_path)
+            if dependents is not None:
+                dependents.discard(output)
+                if not dependents:
+                    del self._dependents[rel_path]
+        if deps:
+            self._deps[output] = deps
+            for rel_path in deps:
+                self._dependents.setdefault(rel_path, set()).add(output)
+
+    def _inline(
+        self,
+        node: NodeKey,
+        layers: List[Path],
+        levels: Dict[str, List[int]],
+        stack: List[NodeKey],
+        deps: Set[str],
+        hoisted: List[str],
+        sources: Optional[Dict[str, bytes]] = None,
+    ) -> str:
+        level, rel_path = node
+        deps.add(rel_path)
+        data = sources.get(rel_path) if sources and level == 0 else None
+        if data is None:
+            data = (layers[level] / rel_path).read_bytes()
+        # surrogateescape 保证无法解码的文件原样输出
+        text = data.decode("utf-8", errors="surrogateescape")
+        imports, rest = split_imports(text)
+
+        parts = []
+        for statement, target, media in imports:
+            resolved = None
+            if not media and not _EXTERNAL.match(target):
+                target_path = posixpath.normpath(
+                    posixpath.join(posixpath.dirname(rel_path), target)
+                )
+                if target_path != ".." and not target_path.startswith("../"):
+                    # 即使目标不存在也记录依赖，文件出现后重新构建
+                    deps.add(target_path)
+                    candidates = [
+                        candidate
+                        for candidate in levels.get(target_path, ())
+                        if target_path != rel_path or candidate > level
+                    ]
+                    if candidates:
+                        resolved = (candidates[0], target_path)
+            if resolved is None:
+                if statement not in hoisted:
+                    hoisted.append(statement)  # 无法内联的 @import 必须留在输出开头
+                continue
+            if resolved in stack or resolved == node:
+                raise ValueError(f"@import 循环引用: {rel_path} -> {resolved[1]}")
+            parts.append(
+                self._inline(
+                    resolved, layers, levels, stack + [node], deps, hoisted, sources
+                )
+            )
+        parts.append(rest)
+        return "\n".join(parts)
+
+    def build(
+        self, changed: Optional[Iterable[str]] = None
+    ) -> Tuple[Dict[str, bytes], Dict[str, Any]]:
+        """构建主题的所有CSS输出，返回 ({相对路径: 构建结果}, 统计信息)
+
+        changed 为已知发生变化的文件（相对路径）时只检查这些文件，否则扫描主题和模板目录。
+        """
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                return self._build(changed, start)
+            except Exception:
+                self._layers = None  # 构建失败后下次完整重新构建
+                raise
+
+    def _build(
+        self, changed: Optional[Iterable[str]], start: float
+    ) -> Tuple[Dict[str, bytes], Dict[str, Any]]:
+        layers = self.resolve_layers()
+        full = layers != self._layers
+        stamps = (
+            self._scan(layers)
+            if full or changed is None
+            else self._restat(layers, changed)
+        )
+
+        levels: Dict[str, List[int]] = {}
+        for level, rel_path in sorted(stamps):
+            levels.setdefault(rel_path, []).append(level)
+
+        if full:
+            self._outputs.clear()
+            self._deps.clear()
+            self._dependents.clear()
+            dirty = set(levels)
+        else:
+            touched = {
+                key[1]
+                for key in stamps.keys() | self._stamps.keys()
+                if stamps.get(key) != self._stamps.get(key)
+            }
+            dirty = set(touched)
+            for rel_path in touched:
+                dirty.update(self._dependents.get(rel_path, ()))
+
+        rebuilt, cached = [], 0
+        for output in sorted(dirty):
+            if output not in levels:
+                self._outputs.pop(output, None)
+                self._set_deps(output, set())
+                continue
+            deps: Set[str] = set()
+            hoisted: List[str] = []
+            body = self._inline(
+                (levels[output][0], output), layers, levels, [], deps, hoisted
+            )
+            text = "\n".join(hoisted + [body]) if hoisted else body
+            data, hit = self.builder.build_bytes(
+                text.encode("utf-8", errors="surrogateescape")
+            )
+            self._outputs[output] = data
+            self._set_deps(output, deps)
+            rebuilt.append(output)
+            cached += hit
+
+        self._layers = layers
+        self._stamps = stamps
+        self.builds += 1
+        self.rebuilt += len(rebuilt)
+        return dict(self._outputs), {
+            "mode": self.builder.mode,
+            "templates": [layer.name for layer in layers[1:]],
+            "full": full,
+            "outputs": len(self._outputs),
+            "rebuilt": rebuilt,
+            "reused": len(self._outputs) - len(rebuilt),
+            "cached": cached,
+            "edges": sum(len(deps) for deps in self._deps.values()),
+            "output_bytes": sum(len(data) for data in self._outputs.values()),
+            "build_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def build_overlay(
+        self, overlay: Dict[str, bytes], changed: Optional[Iterable[str]] = None
+    ) -> Dict[str, bytes]:
+        """用内存中修改过的主题文件（{相对路径: 内容}）代替磁盘上的版本构建，返回需要部署的文件
+
+        只返回 changed（默认为 overlay 中的所有文件）及依赖它们的输出，非CSS文件原样返回；
+        不修改保存的构建结果，磁盘上其他文件的变化留到下一次 build 时处理。
+        """
+        self.build(changed=())  # 第一次使用时完整构建，建立依赖关系
+        changed = set(overlay if changed is None else changed)
+        with self._lock:
+            levels: Dict[str, List[int]] = {}
+            for level, rel_path in sorted(self._stamps):
+                levels.setdefault(rel_path, []).append(level)
+            for rel_path in overlay:
+                css = rel_path.lower().endswith(".css")
+                if css and 0 not in levels.get(rel_path, ()):
+                    levels[rel_path] = [0] + levels.get(rel_path, [])
+
+            result = {
+                rel_path: overlay[rel_path]
+                for rel_path in changed
+                if not rel_path.lower().endswith(".css")
+            }
+            # 磁盘上的依赖关系之外，内存中的文件可能新增了 @import，一并重新构建后按依赖筛选
+            candidates = set(changed)
+            for rel_path in changed:
+                candidates.update(self._dependents.get(rel_path, ()))
+            candidates.update(overlay)
+            for output in sorted(candidates):
+                if output not in levels or not output.lower().endswith(".css"):
+                    continue
+                deps: Set[str] = set()
+                hoisted: List[str] = []
+                body = self._inline(
+                    (levels[output][0], output),
+                    self._layers,
+                    levels,
+                    [],
+                    deps,
+                    hoisted,
+                    overlay,
+                )
+                if not deps & changed:
+                    continue
+                text = "\n".join(hoisted + [body]) if hoisted else body
+                result[output], _ = self.builder.build_bytes(
+                    text.encode("utf-8", errors="surrogateescape")
+                )
+            return result
+
+    def dependents(self, rel_path: str) -> List[str]:
+        """获取依赖某个文件的所有输出"""
+        with self._lock:
+            return sorted(self._dependents.get(Path(rel_path).as_posix(), ()))
+
+
+_graphs: Dict[Tuple[str, str, str], ThemeBuildGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_build_graph(
+    theme_path: Path,
+    templates_dir: Optional[Path] = None,
+    builder: CSSBuilder = css_builder,
+) -> ThemeBuildGraph:
+    """获取主题的构建依赖图，依赖关系和构建结果在多次构建之间保留"""
+    templates_dir = templates_dir or settings.THEMES_PATH / "templates"
+    key = (str(theme_path), str(templates_dir), builder.mode)
+    with _graphs_lock:
+        graph = _graphs.get(key)
+        if graph is None:
+            graph = _graphs[key] = ThemeBuildGraph(theme_path, templates_dir, builder)
+        return graph
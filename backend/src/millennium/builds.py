@@ -0,0 +1,152 @@
+"""
+双缓冲的皮肤部署
+主题先在 skins 目录旁边的构建目录中增量同步，完成后通过原子重命名切换到
+skins 中，Steam不会看到只复制了一半的皮肤。被替换下来的构建保留为热备，
+再次切换回该主题时只需一次重命名；热备数量有上限，超出时淘汰最久未用的。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .sync import manifest_path_for, remove_tree, sync_tree
+
+# renameat2 参数
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+_renameat2 = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _renameat2 = _libc.renameat2
+        _renameat2.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint,
+        ]
+        _renameat2.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _renameat2 = None
+
+
+def exchange_dirs(a: Path, b: Path) -> None:
+    """交换两个目录；Linux上使用 renameat2(RENAME_EXCHANGE) 原子完成"""
+    if _renameat2 is not None:
+        if (
+            _renameat2(
+                AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE
+            )
+            == 0
+        ):
+            return
+        error = ctypes.get_errno()
+        if error not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+            raise OSError(error, os.strerror(error), str(a))
+
+    # 回退：两次重命名，中间只有极短的时间目标目录不存在
+    temp = b.with_name(b.name + ".swap")
+    os.rename(b, temp)
+    os.rename(a, b)
+    os.rename(temp, a)
+
+
+class SkinBuilds:
+    def __init__(
+        self,
+        skins_path: Path,
+        builds_path: Path,
+        max_warm_builds: int = 4,
+        copy_file: Optional[Callable[[Path, Path], Any]] = None,
+    ):
+        self.skins_path = skins_path
+        self.builds_path = builds_path
+        self.max_warm_builds = max_warm_builds
+        self.copy_file = copy_file
+        # deploy/retire/remove 会在I/O线程池中并发执行，需要互斥
+        self._lock = threading.RLock()
+
+    def _sync(
+        self, source: Path, target: Path, overlay: Optional[Dict[str, bytes]] = None
+    ) -> Dict[str, Any]:
+        if self.copy_file is None:
+            return sync_tree(source, target, overlay=overlay)
+        return sync_tree(source, target, copy_file=self.copy_file, overlay=overlay)
+
+    def deploy(
+        self, theme_path: Path, name: str, overlay: Optional[Dict[str, bytes]] = None
+    ) -> Dict[str, Any]:
+        """在构建目录中同步主题，然后原子地切换到skins目录
+
+        overlay 中的文件（{相对路径: 内容}）以内存中的内容代替主题目录中的文件部署。
+        """
+        with self._lock:
+            return self._deploy(theme_path, name, overlay)
+
+    def _deploy(
+        self, theme_path: Path, name: str, overlay: Optional[Dict[str, bytes]] = None
+    ) -> Dict[str, Any]:
+        self.builds_path.mkdir(parents=True, exist_ok=True)
+        live = self.skins_path / name
+        staging = self.builds_path / name
+
+        warm = staging.exists()
+        stats = self._sync(theme_path, staging, overlay)
+        stats["warm_build"] = warm
+
+        if live.exists():
+            exchange_dirs(staging, live)
+        else:
+            os.rename(staging, live)
+
+        # 切换后留在构建目录中的旧版本作为下一次部署的后备缓冲区
+        if staging.exists():
+            os.utime(staging)
+        self.evict()
+        return stats
+
+    def retire(self, name: str) -> bool:
+        """把不再使用的皮肤移出skins目录作为热备，只处理由本工具部署的皮肤"""
+        with self._lock:
+            return self._retire(name)
+
+    def _retire(self, name: str) -> bool:
+        live = self.skins_path / name
+        if not manifest_path_for(live).exists():
+            return False
+
+        self.builds_path.mkdir(parents=True, exist_ok=True)
+        warm = self.builds_path / name
+        remove_tree(warm)
+        os.rename(live, warm)
+        os.utime(warm)
+        self.evict()
+        return True
+
+    def remove(self, name: str) -> None:
+        """删除皮肤及其热备"""
+        with self._lock:
+            remove_tree(self.skins_path / name)
+            remove_tree(self.builds_path / name)
+
+    def warm_builds(self) -> List[str]:
+        """按最近使用顺序列出热备"""
+        if not self.builds_path.exists():
+            return []
+        builds = [path for path in self.builds_path.iterdir() if path.is_dir()]
+        builds.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+        return [path.name for path in builds]
+
+    def evict(self) -> List[str]:
+        """淘汰超出上限的热备"""
+        evicted = self.warm_builds()[self.max_warm_builds :]
+        for name in evicted:
+            remove_tree(self.builds_path / name)
+        return evicted
@@ -0,0 +1,170 @@
+"""
+主题压缩包批量导入
+在进程池中并发处理大量主题压缩包：先计算每个压缩包的哈希并读取主题名称，内容
+相同的压缩包只导入一次，同名的不同压缩包按输入顺序只导入第一个；然后并发导入，
+每个压缩包处理完成时产出一条进度记录。
+"""
+
+import asyncio
+import threading
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..config import get_settings
+from .asset_store import AssetStore
+from .importer import (
+    ImportLimits,
+    check_theme_name,
+    default_limits,
+    import_archive,
+    plan_import,
+)
+from .sync import file_hash
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+settings = get_settings()
+
+STATUS_HASHED = "hashed"
+STATUS_IMPORTED = "imported"
+STATUS_DUPLICATE = "duplicate"
+STATUS_CONFLICT = "conflict"
+STATUS_FAILED = "failed"
+
+CONFIG_FIELDS = ("name", "author", "version", "description")
+
+
+def inspect_archive(path: str, limits: Tuple) -> Dict[str, Any]:
+    """计算压缩包的哈希并根据中央目录读取主题名称（在工作进程中执行）"""
+    try:
+        digest = file_hash(Path(path))
+        with zipfile.ZipFile(path) as archive:
+            plan = plan_import(archive, ImportLimits(*limits))
+        if plan is None:
+            raise ValueError("压缩包中缺少 skin.json")
+        name = check_theme_name(plan.config.get("name", Path(path).stem))
+        return {"path": path, "hash": digest, "name": name}
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        return {"path": path, "error": str(e)}
+
+
+def import_one(
+    path: str, output_dir: str, limits: Tuple, asset_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """导入单个压缩包，并把资源文件存入 asset_dir 中的资源存储（在工作进程中执行）"""
+    try:
+        result = import_archive(
+            Path(path), Path(output_dir), limits=ImportLimits(*limits)
+        )
+        if result is None:
+            raise ValueError("压缩包中缺少 skin.json")
+        config = {field: result.config.get(field) for field in CONFIG_FIELDS}
+        imported = {"path": path, "name": result.name, "config": config}
+        if asset_dir is not None:
+            imported["assets"] = AssetStore(Path(asset_dir)).ingest_tree(result.path)
+        return imported
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        return {"path": path, "error": str(e)}
+
+
+class BulkImporter:
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._pool: Optional["ProcessPoolExecutor"] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> "ProcessPoolExecutor":
+        with self._lock:
+            if self._pool is None:
+                # 进程池模块只在第一次批量导入时加载
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    async def import_many(
+        self,
+        paths: List[Path],
+        output_dir: Path,
+        limits: Optional[ImportLimits] = None,
+        asset_dir: Optional[Path] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """并发导入多个主题压缩包，按完成顺序产出每个压缩包的进度和结果
+
+        指定 asset_dir 时导入后的资源文件存入该目录中的资源存储。
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        limits = tuple(limits or default_limits())
+        total = len(paths)
+        done = 0
+
+        def progress(result: Dict[str, Any], status: str) -> Dict[str, Any]:
+            return dict(result, status=status, done=done, total=total)
+
+        # 第一阶段：计算哈希并读取主题名称
+        inspected: Dict[str, Dict[str, Any]] = {}
+        futures = [
+            loop.run_in_executor(pool, inspect_archive, str(path), limits)
+            for path in paths
+        ]
+        for future in asyncio.as_completed(futures):
+            result = await future
+            inspected[result["path"]] = result
+            if "error" in result:
+                done += 1
+                yield progress(result, STATUS_FAILED)
+            else:
+                yield progress(result, STATUS_HASHED)
+
+        # 按输入顺序去重：相同内容只导入一次，同名主题只导入第一个
+        by_hash: Dict[str, str] = {}
+        by_name: Dict[str, str] = {}
+        unique = []
+        for path in paths:
+            result = inspected[str(path)]
+            if "error" in result:
+                continue
+            if result["hash"] in by_hash:
+                done += 1
+                yield progress(
+                    dict(result, duplicate_of=by_hash[result["hash"]]), STATUS_DUPLICATE
+                )
+            elif result["name"] in by_name:
+                done += 1
+                yield progress(
+                    dict(result, conflicts_with=by_name[result["name"]]),
+                    STATUS_CONFLICT,
+                )
+            else:
+                by_hash[result["hash"]] = by_name[result["name"]] = result["path"]
+                unique.append(result)
+
+        # 第二阶段：并发导入
+        asset_dir = str(asset_dir) if asset_dir is not None else None
+        futures = [
+            loop.run_in_executor(
+                pool, import_one, result["path"], str(output_dir), limits, asset_dir
+            )
+            for result in unique
+        ]
+        hashes = {result["path"]: result["hash"] for result in unique}
+        for future in asyncio.as_completed(futures):
+            result = await future
+            done += 1
+            result["hash"] = hashes[result["path"]]
+            yield progress(
+                result, STATUS_FAILED if "error" in result else STATUS_IMPORTED
+            )
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+bulk_importer = BulkImporter(settings.IMPORT_WORKERS)
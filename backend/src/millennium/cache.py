@@ -0,0 +1,104 @@
+"""
+已解析文件缓存
+以 (路径, mtime_ns, 文件大小) 为键缓存 skin.json / libraryconfig.vdf 等文件的解析结果，
+文件未变化时直接返回缓存，避免重复的JSON/VDF解码。
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+from ..config import get_settings
+from .vdf_parser import VDFParser
+
+settings = get_settings()
+
+
+class ParsedFileCache:
+    """有界LRU缓存，返回的对象在多个调用方之间共享，调用方不应修改"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, int, Any]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, path: Path, kind: str, loader: Callable[[bytes], Any]) -> Any:
+        """读取并解析文件，文件未变化时返回缓存的结果
+
+        返回的对象是共享的缓存内容，调用方只能读取；需要修改时先 copy.deepcopy。
+        """
+        stat = path.stat()
+        key = (str(path), kind)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        data = path.read_bytes()
+        value = loader(data)
+        # 读取后再次检查：读取期间文件被改写时不缓存，避免新内容记在旧的修改时间下
+        after = path.stat()
+        if (after.st_mtime_ns, after.st_size) == (stat.st_mtime_ns, len(data)):
+            self._store(key, stat.st_mtime_ns, stat.st_size, value)
+        return value
+
+    def put(self, path: Path, kind: str, value: Any) -> None:
+        """写入文件后直接更新缓存，避免下次读取时重新解析"""
+        stat = path.stat()
+        self._store((str(path), kind), stat.st_mtime_ns, stat.st_size, value)
+
+    def _store(
+        self, key: Tuple[str, str], mtime_ns: int, size: int, value: Any
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (mtime_ns, size, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def load_json(self, path: Path) -> Any:
+        """读取JSON文件"""
+        return self.load(path, "json", lambda data: json.loads(data.decode("utf-8")))
+
+    def load_vdf(self, path: Path) -> Dict[str, Any]:
+        """读取文本VDF文件"""
+        return self.load(
+            path, "vdf", lambda data: VDFParser().parse(data.decode("utf-8"))
+        )
+
+    def invalidate(self, path: Path) -> None:
+        """移除某个文件的所有缓存"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == str(path)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """获取命中统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+parse_cache = ParsedFileCache(settings.PARSE_CACHE_SIZE)
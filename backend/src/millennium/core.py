@@ -1,14 +1,86 @@
 import asyncio
-import sys
-import shutil
+import copy
 import json
+import shutil
+import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple, Union
+
 from ..config import get_settings
-from .vdf_parser import VDFParser
+from .asset_store import ASSET_DIR, AssetStore
+from .binary_vdf import AppInfoReader
+from .build_graph import get_build_graph
+from .builds import SkinBuilds
+from .bulk_import import bulk_importer
+from .cache import parse_cache
+from .css_build import preview_builder
+from .css_index import CSSIndex
+from .delta_package import (
+    VERSIONS_DIR,
+    DeltaBaseMismatch,
+    VersionHistory,
+    apply_delta,
+    delta_members,
+    member_hashes,
+)
+from .deploy import get_deploy_function
+from .executor import run_io
+from .importer import check_theme_name, import_archive, is_theme_dir_name
+from .index import ThemeIndex
+from .theme import archive_members
+from .validation import REQUIRED_FIELDS, REQUIRED_FILES, theme_validator
+from .vdf_parser import THEME_KEY, THEME_SETTINGS_PATH, VDFParser
+from .zip_stream import ZipMember
 
 settings = get_settings()
 
+
+@lru_cache()
+def find_steam_path() -> Optional[Path]:
+    """查找Steam安装路径（每个进程只查找一次）"""
+    if sys.platform == "win32":
+        import winreg
+
+        try:
+            with winreg.OpenKey(
+                winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Valve\Steam"
+            ) as key:
+                return Path(winreg.QueryValueEx(key, "InstallPath")[0])
+        except WindowsError:
+            return None
+    elif sys.platform == "darwin":
+        paths = [
+            Path.home() / "Library/Application Support/Steam",
+        ]
+        for path in paths:
+            if path.exists():
+                return path
+    else:  # Linux
+        paths = [
+            Path.home() / ".local/share/Steam",
+            Path.home() / ".steam/steam",
+        ]
+        for path in paths:
+            if path.exists():
+                return path
+    return None
+
+
+def _resolve_paths(
+    root: Path, paths: List[str], label: str, allow_root: bool
+) -> List[Path]:
+    root = root.resolve()
+    resolved = []
+    for path in paths:
+        full_path = (root / path).resolve()
+        if (full_path == root and not allow_root) or not full_path.is_relative_to(root):
+            raise ValueError(f"路径不在{label}中: {path}")
+        resolved.append(full_path)
+    return resolved
+
+
 class MillenniumCore:
     def __init__(self):
         self.millennium_path = settings.MILLENNIUM_PATH
@@ -16,40 +88,51 @@ class MillenniumCore:
         self.initialized = False
         self.steam_ui_path = self.steam_path / "steamui" if self.steam_path else None
         self.skins_path = self.steam_ui_path / "skins" if self.steam_ui_path else None
+        self.builds_path = (
+            self.steam_ui_path / ".skin-builds" if self.steam_ui_path else None
+        )
         self.themes_path = settings.THEMES_PATH
+        self.import_path = settings.IMPORT_PATH
+        self.theme_index = ThemeIndex(
+            self.themes_path, settings.TEMP_DIR / "theme_index.json"
+        )
+        self.css_index = CSSIndex(
+            self.themes_path, settings.TEMP_DIR / "css_index.json"
+        )
+        self.asset_store = AssetStore(self.themes_path / ASSET_DIR)
+        self.version_history = VersionHistory(self.themes_path / VERSIONS_DIR)
         self.vdf_parser = VDFParser()
+        self.deploy_file = get_deploy_function(settings.DEPLOY_STRATEGY)
+        self.skin_builds = (
+            SkinBuilds(
+                self.skins_path,
+                self.builds_path,
+                settings.MAX_WARM_BUILDS,
+                self.deploy_file,
+            )
+            if self.skins_path
+            else None
+        )
+        self._appinfo: Optional[AppInfoReader] = None
+        self._appinfo_mtime = 0
+        self._appinfo_lock = threading.Lock()
 
     def _get_steam_path(self) -> Optional[Path]:
         """获取Steam安装路径"""
-        if sys.platform == "win32":
-            import winreg
-            try:
-                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Valve\Steam") as key:
-                    return Path(winreg.QueryValueEx(key, "InstallPath")[0])
-            except WindowsError:
-                return None
-        elif sys.platform == "darwin":
-            paths = [
-                Path.home() / "Library/Application Support/Steam",
-            ]
-            for path in paths:
-                if path.exists():
-                    return path
-        else:  # Linux
-            paths = [
-                Path.home() / ".local/share/Steam",
-                Path.home() / ".steam/steam",
-            ]
-            for path in paths:
-                if path.exists():
-                    return path
-        return None
+        return find_steam_path()
 
     async def initialize(self):
         """初始化Millennium框架"""
         if self.initialized:
             return
 
+        await run_io(self._check_environment)
+
+        # 初始化其他必要的设置
+        await self._setup_environment()
+        self.initialized = True
+
+    def _check_environment(self):
         if not self.millennium_path.exists():
             raise RuntimeError(f"Millennium框架未找到: {self.millennium_path}")
 
@@ -62,12 +145,11 @@ class MillenniumCore:
         # 创建主题目录
         self.skins_path.mkdir(exist_ok=True)
 
-        # 初始化其他必要的设置
-        await self._setup_environment()
-        self.initialized = True
-
     async def _setup_environment(self):
         """设置运行环境"""
+        await run_io(self._prepare_environment)
+
+    def _prepare_environment(self):
         # 确保CEF调试功能已启用
         cef_debug_file = self.steam_path / ".cef-enable-remote-debugging"
         if not cef_debug_file.exists():
@@ -80,84 +162,209 @@ class MillenniumCore:
         # 确保libraryconfig.vdf存在
         library_config = config_dir / "libraryconfig.vdf"
         if not library_config.exists():
-            library_config.write_text('{\n  "libraryconfig"\n  {\n    "settings"\n    {\n    }\n  }\n}\n')
+            library_config.write_text(
+                '{\n  "libraryconfig"\n  {\n    "settings"\n    {\n    }\n  }\n}\n'
+            )
 
     async def validate_theme(self, theme_path: Path) -> bool:
         """验证主题是否有效"""
+        return await run_io(self._validate_theme, theme_path)
+
+    def _validate_theme(self, theme_path: Path) -> bool:
         if not theme_path.exists():
             return False
 
         # 检查必需文件
-        required_files = ["skin.json", "webkit.css"]
-        if not all((theme_path / file).exists() for file in required_files):
+        if not all((theme_path / file).exists() for file in REQUIRED_FILES):
             return False
 
         # 验证skin.json格式
         try:
             config = self.get_theme_config(theme_path)
-            required_fields = ["name", "author", "version"]
-            return all(field in config for field in required_fields)
+            return all(field in config for field in REQUIRED_FIELDS)
         except (json.JSONDecodeError, FileNotFoundError):
             return False
 
+    async def validate_themes(
+        self, paths: Optional[List[Path]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """并发验证多个主题目录或压缩包，默认验证主题目录下的所有主题，按完成顺序产出结果"""
+        if paths is None:
+            paths = await run_io(self._list_theme_dirs)
+        async for result in theme_validator.validate_many(paths):
+            yield result
+
+    async def resolve_theme_paths(self, paths: List[str]) -> List[Path]:
+        """把客户端传入的路径（相对路径相对于主题目录）解析为主题目录下的绝对路径，
+        不在主题目录下的路径抛出 ValueError"""
+        return await run_io(self._resolve_theme_paths, paths)
+
+    def _resolve_theme_paths(self, paths: List[str]) -> List[Path]:
+        return _resolve_paths(self.themes_path, paths, "主题目录", allow_root=False)
+
+    async def resolve_import_paths(self, paths: List[str]) -> List[Path]:
+        """把客户端传入的批量导入路径（相对路径相对于导入目录）解析为导入目录下的
+        绝对路径，不在导入目录下的路径抛出 ValueError"""
+        return await run_io(
+            _resolve_paths, self.import_path, paths, "导入目录", allow_root=True
+        )
+
+    def _list_theme_dirs(self) -> List[Path]:
+        if not self.themes_path.exists():
+            return []
+        return sorted(
+            path
+            for path in self.themes_path.iterdir()
+            if path.is_dir() and is_theme_dir_name(path.name)
+        )
+
     def get_theme_config(self, theme_path: Path) -> Dict:
-        """获取主题配置"""
+        """获取主题配置（文件未变化时使用缓存，返回值不应被修改）"""
         config_path = theme_path / "skin.json"
-        with config_path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-
-    async def apply_theme(self, theme_path: Path, is_preview: bool = False) -> None:
-        """应用主题"""
+        return parse_cache.load_json(config_path)
+
+    async def apply_theme(
+        self,
+        theme_path: Path,
+        is_preview: bool = False,
+        overlay: Optional[Dict[str, bytes]] = None,
+        skin_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """应用主题，返回本次同步复制/删除的文件统计
+
+        overlay 为预览中修改过、只保存在内存中的文件（{相对路径: 内容}）；
+        skin_name 为部署到skins目录中的名称，默认为主题名称（不同预览会话各自部署）。
+        """
         if not await self.validate_theme(theme_path):
             raise ValueError("无效的主题")
 
-        theme_config = self.get_theme_config(theme_path)
+        theme_config = await run_io(self.get_theme_config, theme_path)
         theme_name = theme_config["name"]
-        target_path = self.skins_path / theme_name
 
-        # 如果目标目录已存在，先删除
-        if target_path.exists():
-            shutil.rmtree(target_path)
-
-        # 复制主题文件到Steam主题目录
-        shutil.copytree(theme_path, target_path)
+        # 按依赖图增量构建CSS：内联 @import、合并模板并压缩；预览不压缩，便于调试，
+        # 预览中修改过的文件代替磁盘上的版本参与构建
+        if is_preview:
+            graph = get_build_graph(theme_path, builder=preview_builder)
+        else:
+            # 手动放入主题目录的资源文件在应用时存入共享的资源存储
+            await run_io(self.asset_store.ingest_tree, theme_path)
+            graph = get_build_graph(theme_path)
+        built, build_stats = await run_io(graph.build)
+        if overlay:
+            built.update(await run_io(graph.build_overlay, overlay))
+        overlay = built
+
+        # 在构建目录中增量同步后原子地切换到Steam主题目录
+        stats = await run_io(
+            self.skin_builds.deploy, theme_path, skin_name or theme_name, overlay
+        )
+        stats["css_build"] = build_stats
 
         # 更新Steam配置文件
         if not is_preview:
+            previous_theme = await run_io(self.get_current_theme)
             await self._update_steam_config(theme_name)
 
+            # 之前使用的主题移出skins目录作为热备，切换回来时只需重命名
+            if previous_theme and previous_theme != theme_name:
+                await run_io(self.skin_builds.retire, previous_theme)
+
+        return stats
+
+    def _get_theme_setting(self, data: Dict[str, Any]) -> str:
+        for key in THEME_SETTINGS_PATH:
+            data = data.get(key)
+            if not isinstance(data, dict):
+                return ""
+        value = data.get(THEME_KEY, "")
+        return value if isinstance(value, str) else ""
+
+    def get_current_theme(self) -> str:
+        """获取Steam当前使用的主题名称"""
+        if not self.steam_path:
+            return ""
+        config_path = self.steam_path / "config/libraryconfig.vdf"
+        try:
+            return self._get_theme_setting(parse_cache.load_vdf(config_path))
+        except (OSError, ValueError):
+            return ""
+
     async def _update_steam_config(self, theme_name: str):
         """更新Steam配置文件"""
+        await run_io(self._write_steam_config, theme_name)
+
+    def _write_steam_config(self, theme_name: str):
         config_path = self.steam_path / "config/libraryconfig.vdf"
-        
+
         try:
-            # 读取现有配置
-            content = config_path.read_text(encoding="utf-8")
-            
-            # 更新配置
+            # 主题未变化时无需读写配置文件
+            data = parse_cache.load_vdf(config_path)
+            if self._get_theme_setting(data) == theme_name:
+                return
+
+            # 读取现有配置（按字节读取，保留原有换行符）
+            content = config_path.read_bytes().decode("utf-8")
+
+            # 只改写SteamTheme的值，其余内容保持不变
             new_content = self.vdf_parser.update_theme_config(content, theme_name)
-            
+            if new_content == content:
+                return
+
             # 备份原配置
             backup_path = config_path.with_suffix(".vdf.bak")
             shutil.copy2(config_path, backup_path)
-            
+
             # 写入新配置
-            config_path.write_text(new_content, encoding="utf-8")
-            
+            config_path.write_bytes(new_content.encode("utf-8"))
+
+            # 直接更新缓存中的配置，下次读取无需重新解析
+            data = copy.deepcopy(data)
+            section = data
+            for key in THEME_SETTINGS_PATH:
+                if not isinstance(section.get(key), dict):
+                    section[key] = {}
+                section = section[key]
+            section[THEME_KEY] = theme_name
+            parse_cache.put(config_path, "vdf", data)
+
         except Exception as e:
             raise RuntimeError(f"更新Steam配置失败: {str(e)}")
 
     async def remove_theme(self, theme_path: Path):
         """移除主题"""
+        await run_io(self._remove_theme, theme_path)
+
+    def _remove_theme(self, theme_path: Path):
         if not theme_path.exists():
             return
 
         theme_config = self.get_theme_config(theme_path)
         theme_name = theme_config["name"]
-        target_path = self.skins_path / theme_name
+        self.skin_builds.remove(theme_name)
+
+    def get_app_info(self, app_id: int) -> Optional[Dict[str, Any]]:
+        """从appinfo.vdf中读取单个应用的信息"""
+        if not self.steam_path:
+            return None
 
-        if target_path.exists():
-            shutil.rmtree(target_path)
+        appinfo_path = self.steam_path / "appcache/appinfo.vdf"
+        try:
+            mtime = appinfo_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        # 多个IO线程共用同一个读取器；只缓存索引，每次读取后释放映射
+        with self._appinfo_lock:
+            # Steam更新appinfo.vdf后重新建立索引
+            if self._appinfo is None or mtime != self._appinfo_mtime:
+                if self._appinfo is not None:
+                    self._appinfo.close()
+                self._appinfo = AppInfoReader(appinfo_path).open()
+                self._appinfo_mtime = mtime
+            try:
+                return self._appinfo.get(app_id)
+            finally:
+                self._appinfo.release()
 
     async def restart_steam(self):
         """重启Steam客户端"""
@@ -168,35 +375,45 @@ class MillenniumCore:
         else:
             await asyncio.create_subprocess_shell("pkill steam")
             await asyncio.sleep(1)
-            await asyncio.create_subprocess_shell("steam") 
+            await asyncio.create_subprocess_shell("steam")
 
     async def list_themes(self) -> List[Dict[str, Any]]:
         """获取所有主题列表"""
-        themes = []
-        if not self.themes_path.exists():
-            return themes
-
-        for theme_dir in self.themes_path.iterdir():
-            if theme_dir.is_dir():
-                try:
-                    config = self.get_theme_config(theme_dir)
-                    themes.append({
-                        "name": theme_dir.name,
-                        "config": config,
-                        "path": str(theme_dir)
-                    })
-                except Exception:
-                    continue  # 跳过无效的主题
+        _, themes = await self.query_themes()
         return themes
 
+    async def query_themes(
+        self,
+        search: Optional[str] = None,
+        author: Optional[str] = None,
+        sort_by: str = "name",
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """通过元数据索引查询主题，返回 (匹配总数, 当前页)，无效的主题会被跳过"""
+        return await run_io(
+            self.theme_index.query, search, author, sort_by, descending, offset, limit
+        )
+
+    async def search_css(
+        self, query: str, kind: Optional[str] = None, limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """在所有主题的CSS中查询选择器、自定义属性或 @import 目标，查询前增量刷新索引"""
+        await run_io(self.css_index.refresh)
+        return self.css_index.search(query, kind, limit)
+
     async def create_theme(self, name: str, config: Dict[str, Any]) -> Path:
         """创建新主题"""
+        return await run_io(self._create_theme, name, config)
+
+    def _create_theme(self, name: str, config: Dict[str, Any]) -> Path:
         theme_path = self.themes_path / name
         if theme_path.exists():
             raise ValueError(f"主题 '{name}' 已存在")
 
         theme_path.mkdir(parents=True)
-        
+
         # 创建主题配置文件
         config_path = theme_path / "skin.json"
         with config_path.open("w", encoding="utf-8") as f:
@@ -206,23 +423,26 @@ class MillenniumCore:
         css_path = theme_path / "webkit.css"
         css_path.write_text("/* Steam主题样式 */\n")
 
+        self.asset_store.ingest_tree(theme_path)
         return theme_path
 
     async def get_theme(self, theme_name: str) -> Dict[str, Any]:
         """获取主题信息"""
+        return await run_io(self._get_theme, theme_name)
+
+    def _get_theme(self, theme_name: str) -> Dict[str, Any]:
         theme_path = self.themes_path / theme_name
         if not theme_path.exists():
             raise ValueError(f"主题 '{theme_name}' 不存在")
 
         config = self.get_theme_config(theme_path)
-        return {
-            "name": theme_name,
-            "config": config,
-            "path": str(theme_path)
-        }
+        return {"name": theme_name, "config": config, "path": str(theme_path)}
 
     async def update_theme(self, theme_name: str, config: Dict[str, Any]) -> None:
         """更新主题配置"""
+        await run_io(self._update_theme, theme_name, config)
+
+    def _update_theme(self, theme_name: str, config: Dict[str, Any]) -> None:
         theme_path = self.themes_path / theme_name
         if not theme_path.exists():
             raise ValueError(f"主题 '{theme_name}' 不存在")
@@ -231,9 +451,130 @@ class MillenniumCore:
         with config_path.open("w", encoding="utf-8") as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
 
-    async def delete_theme(self, theme_name: str) -> None:
-        """删除主题"""
-        theme_path = self.themes_path / theme_name
+    async def import_theme(
+        self, source: Union[Path, BinaryIO], default_name: Optional[str] = None
+    ) -> str:
+        """导入主题压缩包（文件路径或上传的文件对象）到主题目录，返回主题名称"""
+        result = await run_io(import_archive, source, self.themes_path, default_name)
+        if result is None:
+            raise ValueError("压缩包中缺少 skin.json")
+        await run_io(self.asset_store.ingest_tree, result.path)
+        return result.name
+
+    async def import_theme_delta(
+        self,
+        source: Union[Path, BinaryIO],
+        fallback: Optional[Union[Path, BinaryIO]] = None,
+    ) -> Dict[str, Any]:
+        """把增量包应用到已安装的主题上
+
+        已安装的主题与增量包的基础版本不一致时改为导入完整包 fallback，没有 fallback 时
+        抛出 DeltaBaseMismatch。
+        """
+        try:
+            result = await run_io(apply_delta, source, self.themes_path)
+        except DeltaBaseMismatch as e:
+            if fallback is None:
+                raise
+            name = await self.import_theme(fallback)
+            return {"name": name, "mode": "full", "mismatched": e.files}
+        await run_io(self.asset_store.ingest_tree, result.path)
+        return {
+            "name": result.name,
+            "mode": "delta",
+            "version": result.config.get("version"),
+        }
+
+    async def import_themes(self, paths: List[Path]) -> AsyncIterator[Dict[str, Any]]:
+        """批量导入主题压缩包（目录会展开为其中的 .zip 文件），按完成顺序产出进度"""
+        archives = await run_io(self._expand_archives, paths)
+        async for result in bulk_importer.import_many(
+            archives, self.themes_path, asset_dir=self.asset_store.root
+        ):
+            yield result
+
+    def _expand_archives(self, paths: List[Path]) -> List[Path]:
+        archives = []
+        for path in paths:
+            if path.is_dir():
+                archives.extend(
+                    sorted(
+                        child
+                        for child in path.iterdir()
+                        if child.suffix.lower() == ".zip" and child.is_file()
+                    )
+                )
+            else:
+                archives.append(path)
+        return archives
+
+    async def archive_themes(
+        self, theme_names: List[str], record: bool = False
+    ) -> List[ZipMember]:
+        """列出导出主题时写入压缩包的文件；导出多个主题时每个主题位于以其名称命名的目录中
+
+        record 为真时记录导出的版本的文件清单（需要计算所有文件的哈希），之后可以
+        相对于该版本导出增量包。
+        """
+        return await run_io(self._archive_themes, theme_names, record)
+
+    def _existing_theme_dir(self, theme_name: str) -> Path:
+        # 名称来自客户端，先检查不会指向主题目录之外
+        theme_path = self.themes_path / check_theme_name(theme_name)
+        if not theme_path.is_dir():
+            raise ValueError(f"主题 '{theme_name}' 不存在")
+        return theme_path
+
+    def _archive_themes(
+        self, theme_names: List[str], record: bool = False
+    ) -> List[ZipMember]:
+        if not theme_names:
+            raise ValueError("没有要导出的主题")
+        members = []
+        for theme_name in theme_names:
+            theme_path = self._existing_theme_dir(theme_name)
+            prefix = f"{theme_name}/" if len(theme_names) > 1 else ""
+            theme_members = archive_members(theme_path)
+            if record:
+                self._record_version(theme_name, theme_path, theme_members)
+            members.extend(
+                member._replace(name=prefix + member.name) for member in theme_members
+            )
+        return members
+
+    def _record_version(
+        self, theme_name: str, theme_path: Path, members: List[ZipMember]
+    ) -> Tuple[str, Dict[str, str]]:
+        """记录导出的版本的文件清单，之后可以相对于该版本导出增量包"""
+        version = str(self.get_theme_config(theme_path).get("version") or "")
+        hashes = member_hashes(members)
+        if version:
+            self.version_history.record(theme_name, version, hashes)
+        return version, hashes
+
+    async def archive_theme_delta(
+        self, theme_name: str, base_version: str
+    ) -> List[ZipMember]:
+        """列出相对于导出过的旧版本 base_version 的增量包文件"""
+        return await run_io(self._archive_theme_delta, theme_name, base_version)
+
+    def _archive_theme_delta(
+        self, theme_name: str, base_version: str
+    ) -> List[ZipMember]:
+        theme_path = self._existing_theme_dir(theme_name)
+        base = self.version_history.load(theme_name, base_version)
+        if base is None:
+            raise ValueError(f"主题 '{theme_name}' 没有导出过版本 '{base_version}'")
+        members = archive_members(theme_path)
+        version, hashes = self._record_version(theme_name, theme_path, members)
+        return delta_members(theme_name, members, hashes, base, base_version, version)
+
+    async def delete_theme(self, theme_name: str) -> Dict[str, int]:
+        """删除主题，返回资源存储回收的对象数量和字节数"""
+        return await run_io(self._delete_theme, theme_name)
+
+    def _delete_theme(self, theme_name: str) -> Dict[str, int]:
+        theme_path = self.themes_path / check_theme_name(theme_name)
         if not theme_path.exists():
             raise ValueError(f"主题 '{theme_name}' 不存在")
 
@@ -241,8 +582,15 @@ class MillenniumCore:
         if self.skins_path:
             applied_path = self.skins_path / theme_name
             if applied_path.exists():
-                await self.remove_theme(theme_path)
+                self._remove_theme(theme_path)
 
-        # 删除主题目录
+        # 删除主题目录后回收不再被任何主题引用的资源
         shutil.rmtree(theme_path)
-  
\ No newline at end of file
+        self.version_history.remove(theme_name)
+        return self.asset_store.collect_garbage()
+
+
+@lru_cache()
+def get_core() -> MillenniumCore:
+    """获取进程内共享的 MillenniumCore（首次使用时创建）"""
+    return MillenniumCore()
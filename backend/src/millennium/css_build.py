@@ -0,0 +1,302 @@
+"""
+主题CSS构建
+应用和导出主题前对CSS做一次压缩：去掉注释和多余空白、合并相邻的相同选择器、
+缩短颜色值。构建结果按内容哈希缓存在 TEMP_DIR 中，内容未变化的文件不会重新构建。
+passthrough 模式原样输出，便于调试。
+"""
+
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple, Union
+
+from ..config import get_settings
+from .sync import iter_files, write_file_atomic
+
+settings = get_settings()
+
+BUILD_VERSION = 3  # 压缩规则变化时递增，使旧的缓存失效
+
+MODE_MINIFY = "minify"
+MODE_PASSTHROUGH = "passthrough"
+BUILD_MODES = (MODE_MINIFY, MODE_PASSTHROUGH)
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<url>url\(\s*(?:"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[^)"']*)\s*\))
+  | (?P<punct>[{};])
+  | (?P<text>[^{};"'/uU]+|.)
+    """,
+    re.S | re.X | re.I,
+)
+
+_WHITESPACE = re.compile(r"\s+")
+# 两侧空白可以去掉的符号；选择器中的 > 以及声明中的 ! 和冒号后的空白单独处理
+_AROUND_COMMON = re.compile(r"\s*([,{}])\s*")
+_AFTER_PAREN = re.compile(r"\(\s+")
+_BEFORE_PAREN = re.compile(r"\s+\)")
+_AROUND_CHILD = re.compile(r"\s*>\s*")
+_AFTER_COLON = re.compile(r":\s+")
+_BEFORE_BANG = re.compile(r"\s*!\s*")
+_HEX_COLOR = re.compile(r"#([0-9a-fA-F]{8}|[0-9a-fA-F]{6})\b")
+_NAME_CHAR = re.compile(r"[\w-]")
+
+Segments = List[Tuple[str, str]]
+
+
+class Declaration(NamedTuple):
+    segments: Segments
+
+
+class Block(NamedTuple):
+    prelude: Segments
+    items: List[Union["Declaration", "Block"]]
+
+
+def _shorten_color(match: "re.Match") -> str:
+    value = match.group(1).lower()
+    if all(value[i] == value[i + 1] for i in range(0, len(value), 2)):
+        return "#" + value[::2]
+    return "#" + value
+
+
+def parse_css(text: str) -> List[Union[Declaration, Block]]:
+    """把CSS解析为声明和块的树，注释保留为空的 comment 片段，序列化时去掉"""
+    root: List[Union[Declaration, Block]] = []
+    stack = [root]
+    current: Segments = []
+
+    def flush():
+        if any(
+            kind not in ("text", "comment") or value.strip() for kind, value in current
+        ):
+            stack[-1].append(Declaration(list(current)))
+        current.clear()
+
+    for match in _TOKEN_PATTERN.finditer(text):
+        kind, value = match.lastgroup, match.group()
+        if kind == "comment":
+            current.append(("comment", ""))
+        elif kind == "punct":
+            if value == "{":
+                block = Block(list(current), [])
+                stack[-1].append(block)
+                stack.append(block.items)
+                current.clear()
+            elif value == ";":
+                flush()
+            else:
+                flush()
+                if len(stack) > 1:
+                    stack.pop()
+        else:
+            current.append((kind, value))
+    flush()
+    return root
+
+
+def _merges(before: str, after: str) -> bool:
+    # 去掉注释后两侧的字符是否会连成一个记号，例如 a/**/b 和 1/**/.5
+    if not before or not after:
+        return False
+    if _NAME_CHAR.match(before):
+        return bool(_NAME_CHAR.match(after)) or (after == "." and before.isdigit())
+    return False
+
+
+def _strip_comments(segments: Segments) -> Segments:
+    # 注释直接去掉（.a/**/.b 即 .a.b），只有两侧的记号会连在一起时才换成空白；
+    # 相邻的文本片段合并，使空白的压缩跨过原来注释的位置
+    result: Segments = []
+    for index, (kind, value) in enumerate(segments):
+        if kind == "comment":
+            before = result[-1][1][-1:] if result else ""
+            after = next((value for _, value in segments[index + 1 :] if value), "")[:1]
+            if not _merges(before, after):
+                continue
+            kind, value = "text", " "
+        if kind == "text" and result and result[-1][0] == "text":
+            result[-1] = ("text", result[-1][1] + value)
+        else:
+            result.append((kind, value))
+    return result
+
+
+def _is_custom_property(segments: Segments) -> bool:
+    first = next((value for kind, value in segments if value.strip()), "")
+    return first.lstrip().startswith("--")
+
+
+def _join(segments: Segments, declaration: bool) -> str:
+    # 自定义属性（--*）的值在 var() 替换后才有意义，除空白外原样保留
+    custom = declaration and _is_custom_property(segments)
+    parts = []
+    for kind, value in _strip_comments(segments):
+        if kind == "url":
+            # url( "x" ) 括号内侧的空白
+            value = value[:4] + value[4:-1].strip() + ")"
+        elif kind == "text" and custom:
+            value = _WHITESPACE.sub(" ", value)
+        elif kind == "text":
+            value = _WHITESPACE.sub(" ", value)
+            value = _AROUND_COMMON.sub(r"\1", value)
+            value = _AFTER_PAREN.sub("(", value)
+            value = _BEFORE_PAREN.sub(")", value)
+            if declaration:
+                value = _AFTER_COLON.sub(":", value)
+                value = _BEFORE_BANG.sub("!", value)
+                value = _HEX_COLOR.sub(_shorten_color, value)
+            else:
+                value = _AROUND_CHILD.sub(">", value)
+        parts.append(value)
+    text = "".join(parts).strip()
+    if declaration:
+        # 属性名和冒号两侧的空白
+        text = re.sub(r"^([-\w]+)\s*:\s*", r"\1:", text)
+    return text
+
+
+def _serialize(items: List[Union[Declaration, Block]]) -> str:
+    parts = []
+    previous_prelude = None
+    for item in items:
+        if isinstance(item, Declaration):
+            parts.append(_join(item.segments, declaration=True) + ";")
+            previous_prelude = None
+            continue
+
+        prelude = _join(item.prelude, declaration=False)
+        body = _serialize(item.items)
+        if body.endswith(";"):
+            body = body[:-1]
+        is_rule = not prelude.startswith("@")
+        if is_rule and not body:
+            continue  # 空规则
+        # 相邻的相同选择器合并为一条规则（不相邻的合并会改变层叠顺序）
+        if is_rule and prelude == previous_prelude and "{" not in body:
+            parts[-1] = parts[-1][:-1] + ";" + body + "}"
+            continue
+        parts.append(f"{prelude}{{{body}}}")
+        previous_prelude = prelude if is_rule and "{" not in body else None
+    return "".join(parts)
+
+
+def _content_key(data: bytes) -> str:
+    return hashlib.sha256(f"{BUILD_VERSION}\0".encode("utf-8") + data).hexdigest()
+
+
+def minify_css(text: str) -> str:
+    """压缩CSS"""
+    return _serialize(parse_css(text))
+
+
+class CSSBuilder:
+    def __init__(self, cache_dir: Path, mode: str = MODE_MINIFY):
+        if mode not in BUILD_MODES:
+            raise ValueError(f"不支持的CSS构建模式: {mode}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        # 文件路径 -> (mtime_ns, 大小, 内容哈希)，未变化的文件不必重新读取和计算哈希
+        self._keys: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self.built = 0
+        self.cached = 0
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.css"
+
+    def _build_cached(self, key: str, load: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        cache_path = self._cache_path(key)
+        try:
+            output = cache_path.read_bytes()
+            cached = True
+        except FileNotFoundError:
+            data = load()
+            try:
+                output = minify_css(data.decode("utf-8")).encode("utf-8")
+            except UnicodeDecodeError:
+                output = data  # 无法解码的文件原样输出
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(cache_path, output)
+            cached = False
+
+        with self._lock:
+            if cached:
+                self.cached += 1
+            else:
+                self.built += 1
+        return output, cached
+
+    def build_bytes(self, data: bytes) -> Tuple[bytes, bool]:
+        """构建内存中的CSS内容，返回 (构建结果, 是否命中缓存)；passthrough 模式原样返回"""
+        if self.mode == MODE_PASSTHROUGH:
+            return data, False
+        key = _content_key(data)
+        return self._build_cached(key, lambda: data)
+
+    def build_file(self, path: Path) -> Tuple[bytes, Dict[str, Any]]:
+        """构建单个CSS文件，返回 (构建结果, 统计信息)"""
+        start = time.perf_counter()
+        stat = path.stat()
+        with self._lock:
+            known = self._keys.get(str(path))
+
+        data = None
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            key = known[2]
+        else:
+            data = path.read_bytes()
+            key = _content_key(data)
+            with self._lock:
+                self._keys[str(path)] = (stat.st_mtime_ns, stat.st_size, key)
+
+        output, cached = self._build_cached(
+            key, lambda: data if data is not None else path.read_bytes()
+        )
+        return output, {
+            "input_bytes": stat.st_size,
+            "output_bytes": len(output),
+            "cached": cached,
+            "build_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def build_tree(self, root: Path) -> Tuple[Dict[str, bytes], Dict[str, Any]]:
+        """构建主题目录中的所有CSS文件，返回 ({相对路径: 构建结果}, 统计信息)
+
+        passthrough 模式下不做任何处理，返回空结果。
+        """
+        start = time.perf_counter()
+        outputs: Dict[str, bytes] = {}
+        files = []
+        if self.mode == MODE_MINIFY:
+            for rel_path, entry in iter_files(root):
+                if not rel_path.lower().endswith(".css"):
+                    continue
+                output, file_stats = self.build_file(Path(entry.path))
+                outputs[rel_path] = output
+                files.append(dict(file_stats, file=rel_path))
+        files.sort(key=lambda item: item["file"])
+
+        return outputs, {
+            "mode": self.mode,
+            "files": files,
+            "input_bytes": sum(item["input_bytes"] for item in files),
+            "output_bytes": sum(item["output_bytes"] for item in files),
+            "built": sum(1 for item in files if not item["cached"]),
+            "cached": sum(1 for item in files if item["cached"]),
+            "build_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """获取累计构建次数和缓存命中次数"""
+        with self._lock:
+            return {"mode": self.mode, "built": self.built, "cached": self.cached}
+
+
+css_builder = CSSBuilder(settings.TEMP_DIR / "css-build", settings.CSS_BUILD_MODE)
+# 预览只内联 @import 和合并模板，不压缩，便于调试
+preview_builder = CSSBuilder(settings.TEMP_DIR / "css-build", MODE_PASSTHROUGH)
@@ -0,0 +1,352 @@
+"""
+跨主题CSS倒排索引
+索引主题目录（以及数据库 ThemeFile 行）中所有CSS文件的选择器、自定义属性和
+@import 目标，用于回答“哪些主题覆盖了 .libraryhome_* 或设置了 --accent-color”。
+文件按修改时间和大小（数据库行按 updated_at）增量刷新，只有变化的文件才会重新解析；
+索引保存在磁盘上，重启后不必重新解析所有文件。
+"""
+
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .css_build import Block, Declaration, parse_css
+from .importer import is_theme_dir_name
+from .sync import iter_files
+
+INDEX_VERSION = 1
+
+SOURCE_FILE = "file"
+SOURCE_DB = "db"
+
+KIND_SELECTOR = "selector"
+KIND_PROPERTY = "property"
+KIND_IMPORT = "import"
+KINDS = (KIND_SELECTOR, KIND_PROPERTY, KIND_IMPORT)
+
+FileKey = Tuple[str, str, str]  # (来源, 主题名称, 文件路径)
+Terms = Dict[str, List[str]]  # 类型 -> 词项
+
+_WHITESPACE = re.compile(r"\s+")
+_ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+_SIMPLE_SELECTOR = re.compile(r"[.#]-?[_a-zA-Z\u00a0-\uffff][-\w]*")
+_IMPORT_TARGET = re.compile(
+    r"""@import\s+(?:url\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s]*))\s*\)"""
+    r"""|"([^"]*)"|'([^']*)')""",
+    re.I,
+)
+_WILDCARD = re.compile(r"[*?]")
+
+
+def _text(segments) -> str:
+    return _WHITESPACE.sub(" ", "".join(value for _, value in segments)).strip()
+
+
+def _split_selectors(prelude: str) -> List[str]:
+    # 只在括号外的逗号处分割，:is(.a, .b) 保持完整
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth = max(depth - 1, 0)
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+def extract_terms(text: str) -> Terms:
+    """提取CSS中的选择器（完整选择器及其中的类名、ID）、自定义属性和 @import 目标"""
+    terms: Dict[str, Set[str]] = {kind: set() for kind in KINDS}
+
+    def walk(items: List[Union[Declaration, Block]]) -> None:
+        for item in items:
+            if isinstance(item, Declaration):
+                declaration = _text(item.segments)
+                if declaration.startswith("--"):
+                    terms[KIND_PROPERTY].add(declaration.split(":", 1)[0].strip())
+                elif declaration[:7].lower() == "@import":
+                    match = _IMPORT_TARGET.match(declaration)
+                    if match:
+                        terms[KIND_IMPORT].add(
+                            next(group for group in match.groups() if group is not None)
+                        )
+                continue
+
+            prelude = _text(item.prelude)
+            if not prelude.startswith("@"):
+                for selector in _split_selectors(prelude):
+                    terms[KIND_SELECTOR].add(selector)
+                    terms[KIND_SELECTOR].update(
+                        _SIMPLE_SELECTOR.findall(_ATTRIBUTE.sub("", selector))
+                    )
+            walk(item.items)  # @media 等规则内的嵌套规则
+
+    walk(parse_css(text))
+    return {kind: sorted(values) for kind, values in terms.items() if values}
+
+
+class CSSIndex:
+    def __init__(self, root: Path, index_path: Path):
+        self.root = root
+        self.index_path = index_path
+        # 文件 -> {"stamp": 版本戳, "terms": 词项}
+        self._files: Optional[Dict[FileKey, Dict[str, Any]]] = None
+        # 类型 -> 词项 -> 包含该词项的文件
+        self._postings: Dict[str, Dict[str, Set[FileKey]]] = {
+            kind: {} for kind in KINDS
+        }
+        self._vocabulary: Dict[str, List[str]] = {}  # 排好序的词项，用于前缀查找
+        self._lock = threading.RLock()
+        self.parsed = 0  # 累计重新解析的文件数量
+
+    def _load(self) -> Dict[FileKey, Dict[str, Any]]:
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION and data.get("root") == str(
+                self.root
+            ):
+                return {
+                    (entry["source"], entry["theme"], entry["file"]): {
+                        "stamp": entry["stamp"],
+                        "terms": entry["terms"],
+                    }
+                    for entry in data["files"]
+                }
+        except (
+            FileNotFoundError,
+            json.JSONDecodeError,
+            KeyError,
+            AttributeError,
+            TypeError,
+        ):
+            pass
+        return {}
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        files = [
+            {
+                "source": source,
+                "theme": theme,
+                "file": file,
+                "stamp": entry["stamp"],
+                "terms": entry["terms"],
+            }
+            for (source, theme, file), entry in self._files.items()
+        ]
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump(
+                {"version": INDEX_VERSION, "root": str(self.root), "files": files},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(temp_path, self.index_path)
+
+    def _ensure_loaded(self) -> Dict[FileKey, Dict[str, Any]]:
+        if self._files is None:
+            self._files = self._load()
+            for key, entry in self._files.items():
+                self._add_postings(key, entry["terms"])
+        return self._files
+
+    def _add_postings(self, key: FileKey, terms: Terms) -> None:
+        for kind, values in terms.items():
+            postings = self._postings[kind]
+            for term in values:
+                if term not in postings:
+                    postings[term] = set()
+                    self._vocabulary.pop(kind, None)
+                postings[term].add(key)
+
+    def _remove_postings(self, key: FileKey, terms: Terms) -> None:
+        for kind, values in terms.items():
+            postings = self._postings[kind]
+            for term in values:
+                files = postings.get(term)
+                if files is None:
+                    continue
+                files.discard(key)
+                if not files:
+                    del postings[term]
+                    self._vocabulary.pop(kind, None)
+
+    def _set(self, key: FileKey, stamp: Any, text: str) -> None:
+        old = self._files.get(key)
+        if old is not None:
+            self._remove_postings(key, old["terms"])
+        terms = extract_terms(text)
+        self._files[key] = {"stamp": stamp, "terms": terms}
+        self._add_postings(key, terms)
+        self.parsed += 1
+
+    def _remove(self, key: FileKey) -> None:
+        self._remove_postings(key, self._files.pop(key)["terms"])
+
+    def _iter_css_files(self) -> Iterable[Tuple[str, str, os.DirEntry]]:
+        # 只遍历各主题目录，跳过资源存储、导入暂存目录以及模板和输出目录
+        if not self.root.exists():
+            return
+        with os.scandir(self.root) as it:
+            themes = [
+                entry
+                for entry in it
+                if entry.is_dir(follow_symlinks=False) and is_theme_dir_name(entry.name)
+            ]
+        for theme in themes:
+            for rel_path, entry in iter_files(Path(theme.path)):
+                if rel_path.lower().endswith(".css"):
+                    yield theme.name, rel_path, entry
+
+    def refresh(self) -> int:
+        """根据修改时间和大小增量刷新主题目录中的CSS文件，返回重新解析的文件数量"""
+        with self._lock:
+            files = self._ensure_loaded()
+            seen = set()
+            changed = 0
+
+            for theme, rel_path, entry in self._iter_css_files():
+                key = (SOURCE_FILE, theme, rel_path)
+                seen.add(key)
+                stat = entry.stat()
+                stamp = [stat.st_mtime_ns, stat.st_size]
+                old = files.get(key)
+                if old is not None and old["stamp"] == stamp:
+                    continue
+                try:
+                    text = (
+                        Path(entry.path).read_bytes().decode("utf-8", errors="replace")
+                    )
+                except OSError:
+                    continue
+                self._set(key, stamp, text)
+                changed += 1
+
+            removed = [
+                key for key in files if key[0] == SOURCE_FILE and key not in seen
+            ]
+            for key in removed:
+                self._remove(key)
+
+            if changed or removed:
+                self._save()
+            return changed
+
+    def stale_db_files(
+        self, versions: Dict[Tuple[str, str], str]
+    ) -> List[Tuple[str, str]]:
+        """对比数据库中CSS文件的版本戳 {(主题名称, 文件路径): updated_at}，
+        删除已不存在的行，返回需要重新索引的 (主题名称, 文件路径)"""
+        with self._lock:
+            files = self._ensure_loaded()
+            removed = [
+                key for key in files if key[0] == SOURCE_DB and key[1:] not in versions
+            ]
+            for key in removed:
+                self._remove(key)
+            if removed:
+                self._save()
+            return [
+                name
+                for name, stamp in versions.items()
+                if files.get((SOURCE_DB, *name), {}).get("stamp") != stamp
+            ]
+
+    def update_db_files(self, rows: Iterable[Tuple[str, str, str, str]]) -> int:
+        """重新索引数据库中的CSS文件，rows 为 (主题名称, 文件路径, updated_at, 内容)"""
+        with self._lock:
+            self._ensure_loaded()
+            changed = 0
+            for theme, file, stamp, content in rows:
+                self._set((SOURCE_DB, theme, file), stamp, content or "")
+                changed += 1
+            if changed:
+                self._save()
+            return changed
+
+    def _match_terms(self, kind: str, query: str) -> List[str]:
+        postings = self._postings[kind]
+        wildcard = _WILDCARD.search(query)
+        if wildcard is None:
+            return [query] if query in postings else []
+
+        vocabulary = self._vocabulary.get(kind)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[kind] = sorted(postings)
+        # 通配符之前的部分作为前缀，在排好序的词项中二分查找
+        prefix = query[: wildcard.start()]
+        pattern = query.replace("[", "[[]")  # 选择器中的 [ 是属性选择器，不是字符集
+        matches = []
+        for term in vocabulary[bisect.bisect_left(vocabulary, prefix) :]:
+            if not term.startswith(prefix):
+                break
+            if fnmatchcase(term, pattern):
+                matches.append(term)
+        return matches
+
+    def search(
+        self, query: str, kind: Optional[str] = None, limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """查询词项（支持 * 和 ? 通配符），按文件返回匹配结果；kind 为空时查询所有类型"""
+        if kind is not None and kind not in KINDS:
+            raise ValueError(f"不支持的查询类型: {kind}")
+        query = _WHITESPACE.sub(" ", query).strip()
+        if not query:
+            raise ValueError("查询不能为空")
+
+        start = time.perf_counter()
+        results: Dict[FileKey, Dict[str, List[str]]] = {}
+        with self._lock:
+            self._ensure_loaded()
+            for search_kind in (kind,) if kind else KINDS:
+                postings = self._postings[search_kind]
+                for term in self._match_terms(search_kind, query):
+                    for key in postings[term]:
+                        results.setdefault(key, {}).setdefault(search_kind, []).append(
+                            term
+                        )
+
+        keys = sorted(results)
+        items = [
+            {
+                "source": key[0],
+                "theme": key[1],
+                "file": key[2],
+                "matches": {
+                    match_kind: sorted(terms)
+                    for match_kind, terms in results[key].items()
+                },
+            }
+            for key in (keys[:limit] if limit is not None else keys)
+        ]
+        return {
+            "query": query,
+            "kind": kind,
+            "total": len(keys),
+            "themes": sorted({theme for _, theme, _ in keys}),
+            "results": items,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """获取索引的文件数量和各类型词项数量"""
+        with self._lock:
+            files = self._ensure_loaded()
+            return {
+                "files": len(files),
+                "terms": {
+                    kind: len(postings) for kind, postings in self._postings.items()
+                },
+                "parsed": self.parsed,
+            }
@@ -0,0 +1,161 @@
+"""
+预览WebSocket的二进制增量帧
+客户端只发送相对于服务端保存的基准版本的文本差异，而不是每次发送完整CSS。
+
+帧格式（网络字节序）:
+    version   u8    协议版本，当前为 1
+    flags     u8    bit0: 操作序列经过 zlib(deflate) 压缩
+    base_rev  u32   差异所基于的版本
+    new_rev   u32   应用差异后的版本
+    crc32     u32   应用差异后完整文档（UTF-8）的CRC32
+    name_len  u16   文件名长度
+    name            文件名（UTF-8）
+    ops             操作序列，每个操作为
+                    offset u32, delete u32, insert_len u32, insert（UTF-8）
+
+偏移量按UTF-8字节计算，操作依次应用，每个偏移量都相对于前一个操作之后的文档。
+基准版本不一致或校验失败时服务端要求客户端重新发送完整内容（resync）。
+"""
+
+import struct
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+PROTOCOL_VERSION = 1
+FLAG_DEFLATE = 0x01
+
+MAX_DOCUMENT_SIZE = 16 * 1024 * 1024  # 单个文档（以及解压后的操作序列）的上限
+
+_HEADER = struct.Struct("!BBIIIH")
+_OP = struct.Struct("!III")
+
+
+class DeltaOp(NamedTuple):
+    offset: int
+    delete: int
+    insert: bytes = b""
+
+
+class DeltaFrame(NamedTuple):
+    file_name: str
+    base_rev: int
+    new_rev: int
+    checksum: int
+    ops: List[DeltaOp]
+
+
+class RevisionMismatch(ValueError):
+    """差异的基准版本与服务端保存的版本不一致"""
+
+    def __init__(self, file_name: str, expected_rev: Optional[int]):
+        super().__init__(f"版本不一致: {file_name}")
+        self.file_name = file_name
+        self.expected_rev = expected_rev
+
+
+def encode_frame(
+    file_name: str,
+    base_rev: int,
+    new_rev: int,
+    ops: Iterable[DeltaOp],
+    document: bytes,
+    compress: bool = False,
+) -> bytes:
+    """编码增量帧，document 为应用差异后的完整文档，用于计算校验值"""
+    payload = b"".join(
+        _OP.pack(op.offset, op.delete, len(op.insert)) + op.insert for op in ops
+    )
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= FLAG_DEFLATE
+    name = file_name.encode("utf-8")
+    header = _HEADER.pack(
+        PROTOCOL_VERSION, flags, base_rev, new_rev, zlib.crc32(document), len(name)
+    )
+    return header + name + payload
+
+
+def decode_frame(data: bytes) -> DeltaFrame:
+    """解码增量帧"""
+    if len(data) < _HEADER.size:
+        raise ValueError("增量帧不完整")
+    version, flags, base_rev, new_rev, checksum, name_len = _HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"不支持的增量帧版本: {version}")
+
+    offset = _HEADER.size
+    if len(data) < offset + name_len:
+        raise ValueError("增量帧不完整")
+    file_name = data[offset : offset + name_len].decode("utf-8")
+    payload = memoryview(data)[offset + name_len :]
+
+    if flags & FLAG_DEFLATE:
+        decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(payload, MAX_DOCUMENT_SIZE)
+        if decompressor.unconsumed_tail:
+            raise ValueError("增量帧解压后过大")
+        payload = memoryview(payload)
+
+    ops = []
+    position = 0
+    while position < len(payload):
+        if len(payload) - position < _OP.size:
+            raise ValueError("增量帧不完整")
+        op_offset, delete, insert_len = _OP.unpack_from(payload, position)
+        position += _OP.size
+        if len(payload) - position < insert_len:
+            raise ValueError("增量帧不完整")
+        ops.append(
+            DeltaOp(op_offset, delete, bytes(payload[position : position + insert_len]))
+        )
+        position += insert_len
+
+    return DeltaFrame(file_name, base_rev, new_rev, checksum, ops)
+
+
+def apply_ops(document: bytes, ops: Iterable[DeltaOp]) -> bytes:
+    """依次应用差异操作"""
+    result = bytearray(document)
+    for op in ops:
+        if op.offset + op.delete > len(result):
+            raise ValueError("差异操作超出文档范围")
+        result[op.offset : op.offset + op.delete] = op.insert
+        if len(result) > MAX_DOCUMENT_SIZE:
+            raise ValueError("文档过大")
+    return bytes(result)
+
+
+class DeltaDocuments:
+    """每个连接在服务端保存的各文件基准版本"""
+
+    def __init__(self):
+        self._documents: Dict[str, Tuple[int, bytes]] = {}
+
+    def set(self, file_name: str, rev: int, content: bytes) -> None:
+        """以完整内容设置文件的基准版本"""
+        self._documents[file_name] = (rev, content)
+
+    def revision(self, file_name: str) -> Optional[int]:
+        document = self._documents.get(file_name)
+        return document[0] if document else None
+
+    def memory_usage(self) -> int:
+        """保存的基准版本占用的字节数"""
+        return sum(len(content) for _, content in self._documents.values())
+
+    def apply(self, frame: DeltaFrame) -> bytes:
+        """把增量帧应用到基准版本上，返回新的完整文档"""
+        document = self._documents.get(frame.file_name)
+        if document is None or document[0] != frame.base_rev:
+            raise RevisionMismatch(frame.file_name, document[0] if document else None)
+
+        try:
+            content = apply_ops(document[1], frame.ops)
+        except ValueError:
+            raise RevisionMismatch(frame.file_name, document[0])
+        if zlib.crc32(content) != frame.checksum:
+            raise RevisionMismatch(frame.file_name, document[0])
+
+        self._documents[frame.file_name] = (frame.new_rev, content)
+        return content
@@ -0,0 +1,240 @@
+"""
+主题增量包
+导出主题时可以按 skin.json 中的 version 记录每个文件的SHA-256（CSS按构建后的内容
+计算，只在要求记录时和导出增量包时计算），之后可以相对于记录过的旧版本导出只包含
+新增和修改文件的增量包。增量包根目录下的
+delta.json 记录旧版本的完整文件清单、新增/修改文件的哈希和删除的文件，文件内容
+位于 files/ 目录下。
+
+导入增量包时先校验本地安装的主题与旧版本清单完全一致，不一致时抛出
+DeltaBaseMismatch，由调用方改用完整包导入。未变化的文件从已安装的目录硬链接
+（或复制）到暂存目录，新文件边解压边校验哈希，最后原子地替换主题目录。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+from urllib.parse import quote, unquote
+
+from .importer import (
+    COPY_CHUNK_SIZE,
+    STAGING_PREFIX,
+    ImportLimits,
+    ImportResult,
+    check_member_path,
+    check_members,
+    check_theme_name,
+    default_limits,
+    replace_dir,
+)
+from .sync import file_hash, iter_files
+from .zip_stream import ZipMember
+
+DELTA_MANIFEST = "delta.json"
+DELTA_FILES_DIR = "files/"
+DELTA_FORMAT = 1
+VERSIONS_DIR = ".versions"
+
+Hashes = Dict[str, str]
+
+
+class DeltaBaseMismatch(ValueError):
+    """本地安装的主题与增量包的旧版本不一致"""
+
+    def __init__(self, message: str, files: List[str]):
+        super().__init__(message)
+        self.files = files
+
+
+def member_hashes(members: List[ZipMember]) -> Hashes:
+    """计算导出文件的SHA-256，内存中的内容（构建后的CSS）按内容计算"""
+    hashes = {}
+    for member in members:
+        if member.data is not None:
+            hashes[member.name] = hashlib.sha256(member.data).hexdigest()
+        else:
+            hashes[member.name] = file_hash(member.path)
+    return hashes
+
+
+class VersionHistory:
+    """按主题和版本保存导出时的文件清单（{相对路径: 哈希}）"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, theme_name: str, version: str) -> Path:
+        return self.root / theme_name / f"{quote(version, safe='')}.json"
+
+    def record(self, theme_name: str, version: str, hashes: Hashes) -> None:
+        """记录版本的文件清单，同一版本再次导出时覆盖"""
+        path = self._path(theme_name, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        temp.write_text(json.dumps(hashes, sort_keys=True), encoding="utf-8")
+        os.replace(temp, path)
+
+    def load(self, theme_name: str, version: str) -> Optional[Hashes]:
+        """读取版本的文件清单，没有记录时返回None"""
+        try:
+            return json.loads(
+                self._path(theme_name, version).read_text(encoding="utf-8")
+            )
+        except FileNotFoundError:
+            return None
+
+    def versions(self, theme_name: str) -> List[str]:
+        """列出记录过的版本"""
+        directory = self.root / theme_name
+        if not directory.is_dir():
+            return []
+        return sorted(unquote(path.stem) for path in directory.glob("*.json"))
+
+    def remove(self, theme_name: str) -> None:
+        """删除主题的所有版本记录"""
+        shutil.rmtree(self.root / theme_name, ignore_errors=True)
+
+
+def delta_members(
+    theme_name: str,
+    members: List[ZipMember],
+    hashes: Hashes,
+    base: Hashes,
+    base_version: str,
+    version: str,
+) -> List[ZipMember]:
+    """根据当前文件的哈希（member_hashes）和旧版本的文件清单生成增量包的文件列表"""
+    changed = {
+        name: digest for name, digest in hashes.items() if base.get(name) != digest
+    }
+    delta = {
+        "format": DELTA_FORMAT,
+        "theme": theme_name,
+        "base_version": base_version,
+        "version": version,
+        "base": base,
+        "files": changed,
+        "removed": sorted(name for name in base if name not in hashes),
+    }
+    result = [
+        ZipMember(
+            DELTA_MANIFEST,
+            data=json.dumps(delta, ensure_ascii=False, indent=2).encode("utf-8"),
+        )
+    ]
+    result.extend(
+        member._replace(name=DELTA_FILES_DIR + member.name)
+        for member in members
+        if member.name in changed
+    )
+    return result
+
+
+def _read_delta(archive: zipfile.ZipFile) -> Dict[str, Any]:
+    try:
+        delta = json.loads(archive.read(DELTA_MANIFEST).decode("utf-8"))
+    except KeyError:
+        raise ValueError(f"压缩包中缺少 {DELTA_MANIFEST}，不是增量包")
+    except ValueError as e:
+        raise ValueError(f"{DELTA_MANIFEST} 无效: {e}")
+    if not isinstance(delta, dict) or delta.get("format") != DELTA_FORMAT:
+        raise ValueError("不支持的增量包格式")
+    for key in ("base", "files"):
+        if not isinstance(delta.get(key), dict):
+            raise ValueError(f"{DELTA_MANIFEST} 缺少 {key}")
+    for rel_path in list(delta["base"]) + list(delta["files"]):
+        if not PurePosixPath(rel_path).parts:
+            raise ValueError(f"增量包包含不安全的路径: {rel_path}")
+        check_member_path(rel_path)
+    return delta
+
+
+def verify_base(theme_dir: Path, base: Hashes) -> List[str]:
+    """校验已安装的主题与旧版本清单是否完全一致，返回不一致的文件"""
+    installed = dict(iter_files(theme_dir))
+    mismatched = sorted(installed.keys() ^ base.keys())
+    for rel_path in installed.keys() & base.keys():
+        if file_hash(Path(installed[rel_path].path)) != base[rel_path]:
+            mismatched.append(rel_path)
+    return sorted(mismatched)
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _extract_verified(
+    archive: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path, expected: str
+) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    with archive.open(info) as src, target.open("wb") as dst:
+        for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    if digest.hexdigest() != expected:
+        raise ValueError(f"增量包中的文件已损坏: {info.filename}")
+
+
+def apply_delta(
+    source: Union[Path, BinaryIO],
+    output_dir: Path,
+    limits: Optional[ImportLimits] = None,
+) -> ImportResult:
+    """把增量包应用到 output_dir 中已安装的主题上，返回 (主题名称, 主题目录, skin.json 内容)
+
+    已安装的主题与增量包的旧版本不一致时抛出 DeltaBaseMismatch，不修改任何文件。
+    """
+    limits = limits or default_limits()
+    with zipfile.ZipFile(source) as archive:
+        delta = _read_delta(archive)
+        theme_name = check_theme_name(delta.get("theme"))
+        members = {
+            info.filename[len(DELTA_FILES_DIR) :]: info
+            for info in archive.infolist()
+            if info.filename.startswith(DELTA_FILES_DIR) and not info.is_dir()
+        }
+        check_members(list(members.values()), limits)
+        missing = sorted(delta["files"].keys() - members.keys())
+        if missing:
+            raise ValueError(f"增量包中缺少文件: {', '.join(missing)}")
+
+        target = output_dir / theme_name
+        if not target.is_dir():
+            raise DeltaBaseMismatch(f"主题 '{theme_name}' 未安装", [])
+        mismatched = verify_base(target, delta["base"])
+        if mismatched:
+            raise DeltaBaseMismatch(
+                f"主题 '{theme_name}' 与增量包的基础版本 {delta.get('base_version')} 不一致",
+                mismatched,
+            )
+
+        staging = output_dir / f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            removed = set(delta.get("removed") or ())
+            for rel_path in delta["base"]:
+                if rel_path not in removed and rel_path not in delta["files"]:
+                    _link_or_copy(target / rel_path, staging / rel_path)
+            for rel_path, digest in delta["files"].items():
+                _extract_verified(
+                    archive, members[rel_path], staging / rel_path, digest
+                )
+            try:
+                config = json.loads((staging / "skin.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise ValueError(f"skin.json 无效: {e}")
+            replace_dir(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    return ImportResult(theme_name, target, config)
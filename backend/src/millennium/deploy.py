@@ -0,0 +1,139 @@
+"""
+主题文件部署策略
+按配置依次尝试 reflink（写时复制克隆）、硬链接（仅限不可变资源）和普通复制，
+在支持的文件系统上部署资源较多的主题时几乎不产生额外的磁盘写入。
+"""
+
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STRATEGY_AUTO = "auto"
+STRATEGY_REFLINK = "reflink"
+STRATEGY_HARDLINK = "hardlink"
+STRATEGY_COPY = "copy"
+STRATEGIES = (STRATEGY_AUTO, STRATEGY_REFLINK, STRATEGY_HARDLINK, STRATEGY_COPY)
+
+# Linux ioctl FICLONE
+FICLONE = 0x40049409
+
+# 部署后不会被原地修改的资源类型，可以安全地使用硬链接
+# CSS/JSON等文本文件会被编辑器和预览直接改写，始终不使用硬链接
+IMMUTABLE_SUFFIXES = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".ico",
+    ".bmp",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".otf",
+    ".eot",
+    ".mp3",
+    ".ogg",
+    ".wav",
+    ".mp4",
+    ".webm",
+}
+
+# 已确认不支持reflink/硬链接的 (源设备, 目标设备)，避免反复尝试
+_reflink_unsupported: Set[Tuple[int, int]] = set()
+_hardlink_unsupported: Set[Tuple[int, int]] = set()
+
+PathLike = Union[str, Path]
+
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.EPERM,
+    getattr(errno, "EOPNOTSUPP", errno.EINVAL),
+    getattr(errno, "ENOTSUP", errno.EINVAL),
+    getattr(errno, "EMLINK", errno.EINVAL),
+}
+
+
+def is_immutable_asset(path: PathLike) -> bool:
+    """判断文件是否属于可以硬链接的不可变资源"""
+    return Path(path).suffix.lower() in IMMUTABLE_SUFFIXES
+
+
+def _devices(src: PathLike, dst: PathLike) -> Tuple[int, int]:
+    return os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+
+def reflink_file(src: PathLike, dst: PathLike) -> None:
+    """通过FICLONE克隆文件，不支持时抛出OSError"""
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "当前平台不支持reflink")
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def deploy_file(src: PathLike, dst: PathLike, strategy: str = STRATEGY_AUTO) -> str:
+    """按策略部署单个文件，返回实际使用的方式（reflink/hardlink/copy）"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知的部署策略: {strategy}")
+
+    if strategy != STRATEGY_COPY:
+        devices = _devices(src, dst)
+
+        if (
+            strategy in (STRATEGY_AUTO, STRATEGY_REFLINK)
+            and devices not in _reflink_unsupported
+        ):
+            try:
+                reflink_file(src, dst)
+                return STRATEGY_REFLINK
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+                _reflink_unsupported.add(devices)
+
+        if (
+            strategy in (STRATEGY_AUTO, STRATEGY_HARDLINK)
+            and is_immutable_asset(src)
+            and devices[0] == devices[1]
+            and devices not in _hardlink_unsupported
+        ):
+            try:
+                os.link(src, dst)
+                return STRATEGY_HARDLINK
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+                _hardlink_unsupported.add(devices)
+
+    shutil.copy2(src, dst)
+    return STRATEGY_COPY
+
+
+def get_deploy_function(
+    strategy: str = STRATEGY_AUTO,
+) -> Callable[[PathLike, PathLike], str]:
+    """获取指定策略的部署函数，可直接用作 copytree 的 copy_function"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知的部署策略: {strategy}")
+
+    def deploy(src: PathLike, dst: PathLike) -> str:
+        return deploy_file(src, dst, strategy)
+
+    return deploy
@@ -0,0 +1,318 @@
+"""
+通过CEF远程调试协议注入预览CSS
+Steam启用 .cef-enable-remote-debugging 后会在本地开放DevTools端口。这里枚举
+Steam UI的页面目标，为每个目标保持一个持久的WebSocket连接，编辑时直接通过
+CSS.setStyleSheetText 更新注入的样式表（不支持时回退到 Runtime.evaluate），
+不需要等待Steam重新读取皮肤文件。注入的样式表排在皮肤样式之后。
+样式表按预览会话区分，停止预览时清空该会话注入的样式表。
+"""
+
+import asyncio
+import itertools
+import json
+import time
+import urllib.request
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ..config import get_settings
+from .executor import run_io, summarize_latencies
+
+settings = get_settings()
+
+LATENCY_SAMPLES = 512
+TARGETS_TTL = 5.0  # 秒，目标列表的缓存时间
+
+METHOD_CSS = "css"
+METHOD_RUNTIME = "runtime"
+
+StyleKey = Tuple[str, str, str]  # (目标ID, 会话ID, 文件名)
+
+
+class DevToolsError(RuntimeError):
+    """DevTools协议调用失败"""
+
+
+class DevToolsConnection:
+    """单个调试目标的持久连接，按消息ID匹配响应"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._websocket = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def connected(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def connect(self) -> None:
+        import websockets  # 只在使用DevTools预览时加载
+
+        self._websocket = await asyncio.wait_for(
+            websockets.connect(self.url, max_size=None), self.timeout
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        try:
+            async for message in self._websocket:
+                data = json.loads(message)
+                future = self._pending.pop(data.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(data)
+        except Exception:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(DevToolsError("DevTools连接已断开"))
+            self._pending.clear()
+
+    async def call(
+        self, method: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """调用DevTools协议方法并等待结果"""
+        if not self.connected:
+            raise DevToolsError("DevTools连接已断开")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        await self._websocket.send(
+            json.dumps({"id": message_id, "method": method, "params": params or {}})
+        )
+        try:
+            response = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(message_id, None)
+        if "error" in response:
+            raise DevToolsError(f"{method} 失败: {response['error'].get('message')}")
+        return response.get("result", {})
+
+    async def close(self) -> None:
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._websocket = None
+        self._reader = None
+
+
+class DevToolsTransport:
+    """把预览样式表推送到所有Steam UI页面目标"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        url_filter: str = "steamloopback.host",
+    ):
+        self.host = host
+        self.port = port
+        self.url_filter = url_filter
+        self._connections: Dict[str, DevToolsConnection] = {}
+        # (目标ID, 会话ID, 文件名) -> 注入的样式表ID
+        self._stylesheets: Dict[StyleKey, str] = {}
+        # 通过 Runtime.evaluate 注入的 <style> 元素
+        self._style_elements: Set[StyleKey] = set()
+        self._methods: Dict[str, str] = {}  # 目标ID -> 可用的注入方式
+        self._targets: List[Dict[str, Any]] = []
+        self._targets_at = 0.0
+        self._lock = asyncio.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.pushes = 0
+        self.failures = 0
+
+    def _fetch_targets(self) -> List[Dict[str, Any]]:
+        with urllib.request.urlopen(
+            f"http://{self.host}:{self.port}/json", timeout=2
+        ) as response:
+            return json.load(response)
+
+    async def list_targets(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """枚举Steam UI的页面目标"""
+        if refresh or time.monotonic() - self._targets_at > TARGETS_TTL:
+            try:
+                targets = await run_io(self._fetch_targets)
+            except (OSError, ValueError) as e:
+                raise DevToolsError(f"无法连接到Steam客户端: {e}")
+            self._targets = [
+                target
+                for target in targets
+                if target.get("type") == "page"
+                and target.get("webSocketDebuggerUrl")
+                and self.url_filter in target.get("url", "")
+            ]
+            self._targets_at = time.monotonic()
+        return self._targets
+
+    async def _get_connection(self, target: Dict[str, Any]) -> DevToolsConnection:
+        target_id = target["id"]
+        connection = self._connections.get(target_id)
+        if connection is None or not connection.connected:
+            connection = DevToolsConnection(target["webSocketDebuggerUrl"])
+            await connection.connect()
+            self._connections[target_id] = connection
+            # 新连接中之前注入的样式表ID可能已经失效
+            for key in [key for key in self._stylesheets if key[0] == target_id]:
+                del self._stylesheets[key]
+            self._style_elements = {
+                key for key in self._style_elements if key[0] != target_id
+            }
+        return connection
+
+    async def _push_css(
+        self, connection: DevToolsConnection, key: StyleKey, css: str
+    ) -> None:
+        stylesheet_id = self._stylesheets.get(key)
+        if stylesheet_id is None:
+            await connection.call("DOM.enable")
+            await connection.call("CSS.enable")
+            frame_tree = await connection.call("Page.getFrameTree")
+            result = await connection.call(
+                "CSS.createStyleSheet",
+                {"frameId": frame_tree["frameTree"]["frame"]["id"]},
+            )
+            stylesheet_id = self._stylesheets[key] = result["styleSheetId"]
+        await connection.call(
+            "CSS.setStyleSheetText", {"styleSheetId": stylesheet_id, "text": css}
+        )
+
+    @staticmethod
+    def _element_id(key: StyleKey) -> str:
+        return json.dumps(f"sts-preview-{key[1]}-{key[2]}")
+
+    async def _push_runtime(
+        self, connection: DevToolsConnection, key: StyleKey, css: str
+    ) -> None:
+        element_id = self._element_id(key)
+        expression = (
+            f"(() => {{ let style = document.getElementById({element_id});"
+            f" if (!style) {{ style = document.createElement('style');"
+            f" style.id = {element_id};"
+            f" document.head.appendChild(style); }}"
+            f" style.textContent = {json.dumps(css)}; }})()"
+        )
+        await connection.call("Runtime.evaluate", {"expression": expression})
+        self._style_elements.add(key)
+
+    async def _push_target(
+        self, target: Dict[str, Any], session_id: str, file_name: str, css: str
+    ) -> None:
+        target_id = target["id"]
+        key = (target_id, session_id, file_name)
+        connection = await self._get_connection(target)
+        if self._methods.get(target_id, METHOD_CSS) == METHOD_CSS:
+            try:
+                await self._push_css(connection, key, css)
+                return
+            except DevToolsError:
+                if not connection.connected:
+                    raise
+                # 目标不支持CSS域，之后改用 Runtime.evaluate
+                self._methods[target_id] = METHOD_RUNTIME
+                self._stylesheets.pop(key, None)
+        await self._push_runtime(connection, key, css)
+
+    async def push_stylesheet(
+        self, file_name: str, css: str, session_id: str = ""
+    ) -> Dict[str, Any]:
+        """把会话的样式表推送到所有目标，返回成功的目标数量和往返耗时"""
+        async with self._lock:
+            targets = await self.list_targets()
+            if not targets:
+                raise DevToolsError("未找到Steam UI调试目标")
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(
+                    self._push_target(target, session_id, file_name, css)
+                    for target in targets
+                ),
+                return_exceptions=True,
+            )
+            elapsed = time.perf_counter() - start
+
+            failed = [
+                target
+                for target, result in zip(targets, results)
+                if isinstance(result, Exception)
+            ]
+            for target in failed:
+                connection = self._connections.pop(target["id"], None)
+                if connection is not None:
+                    await connection.close()
+            self.pushes += 1
+            self.failures += len(failed)
+            if len(failed) == len(targets):
+                self._targets_at = 0.0  # 下次重新枚举目标
+                raise DevToolsError(f"推送样式表失败: {results[0]}")
+
+            self._latencies.append(elapsed)
+            return {
+                "targets": len(targets) - len(failed),
+                "failed": len(failed),
+                "round_trip_ms": round(elapsed * 1000, 3),
+            }
+
+    async def _clear(self, match: Callable[[StyleKey], bool]) -> int:
+        # 清空注入的样式表、删除注入的 <style> 元素；已断开的目标中的样式随页面连接一起失效
+        cleared = 0
+        for key in [key for key in self._stylesheets if match(key)]:
+            stylesheet_id = self._stylesheets.pop(key)
+            connection = self._connections.get(key[0])
+            if connection is None or not connection.connected:
+                continue
+            try:
+                await connection.call(
+                    "CSS.setStyleSheetText", {"styleSheetId": stylesheet_id, "text": ""}
+                )
+                cleared += 1
+            except (DevToolsError, asyncio.TimeoutError):
+                pass
+        for key in [key for key in self._style_elements if match(key)]:
+            self._style_elements.discard(key)
+            connection = self._connections.get(key[0])
+            if connection is None or not connection.connected:
+                continue
+            expression = f"document.getElementById({self._element_id(key)})?.remove()"
+            try:
+                await connection.call("Runtime.evaluate", {"expression": expression})
+                cleared += 1
+            except (DevToolsError, asyncio.TimeoutError):
+                pass
+        return cleared
+
+    async def clear_session(self, session_id: str = "") -> int:
+        """移除会话注入到各目标中的样式，返回清除的样式表数量"""
+        async with self._lock:
+            return await self._clear(lambda key: key[1] == session_id)
+
+    async def close(self) -> None:
+        """移除所有注入的样式并关闭所有连接"""
+        async with self._lock:
+            await self._clear(lambda key: True)
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            await connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接数量和往返耗时统计（毫秒）"""
+        return {
+            "connections": sum(
+                1 for connection in self._connections.values() if connection.connected
+            ),
+            "pushes": self.pushes,
+            "failures": self.failures,
+            "round_trip_ms": summarize_latencies(sorted(self._latencies)),
+        }
+
+
+@lru_cache()
+def get_devtools_transport() -> DevToolsTransport:
+    """获取进程内共享的DevTools连接池"""
+    return DevToolsTransport(settings.CEF_DEBUG_HOST, settings.CEF_DEBUG_PORT)
@@ -0,0 +1,155 @@
+"""
+文件I/O线程池
+millennium 中的异步方法通过 run_io 把 copytree / rmtree / json.load 等同步
+文件操作交给有界线程池执行，避免阻塞事件循环上的HTTP和WebSocket请求。
+同时统计排队深度和等待/执行耗时。
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from ..config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+LATENCY_SAMPLES = 512
+
+
+class IOExecutor:
+    def __init__(self, max_workers: int = 8, max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 事件循环 -> 信号量，限制同时提交到线程池的任务数量
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.waiting = 0  # 等待提交（背压）的任务
+        self.queued = 0  # 已提交、尚未开始执行的任务
+        self.running = 0
+        self.max_queue_depth = 0
+        self._wait_times = deque(maxlen=LATENCY_SAMPLES)
+        self._run_times = deque(maxlen=LATENCY_SAMPLES)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="millennium-io"
+                    )
+        return self._pool
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_workers + self.max_pending)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _call(self, func: Callable[..., T], submitted_at: float) -> T:
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._wait_times.append(started_at - submitted_at)
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._run_times.append(time.perf_counter() - started_at)
+
+    def _on_done(self, future: "Future") -> None:
+        # 开始执行前被取消的任务不会进入 _call，在这里移出排队计数
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在线程池中执行同步函数并等待结果"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            with self._lock:
+                self.submitted += 1
+                self.queued += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queued)
+            call = functools.partial(func, *args, **kwargs)
+            pool_future = self._get_pool().submit(self._call, call, time.perf_counter())
+            pool_future.add_done_callback(self._on_done)
+            future = asyncio.wrap_future(pool_future, loop=loop)
+            try:
+                result = await future
+            except BaseException:
+                self.failed += 1
+                raise
+            self.completed += 1
+            return result
+        finally:
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取队列深度和延迟统计（毫秒）"""
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+            run_times = sorted(self._run_times)
+            stats = {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "waiting": self.waiting,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queue_depth": self.max_queue_depth,
+            }
+        stats["wait_ms"] = summarize_latencies(wait_times)
+        stats["run_ms"] = summarize_latencies(run_times)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def summarize_latencies(samples: list) -> Dict[str, float]:
+    """把已排序的耗时样本（秒）汇总为毫秒统计"""
+    if not samples:
+        return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "avg": round(sum(samples) / len(samples) * 1000, 3),
+        "p95": round(
+            samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3
+        ),
+        "max": round(samples[-1] * 1000, 3),
+    }
+
+
+io_executor = IOExecutor(settings.IO_WORKERS, settings.IO_MAX_PENDING)
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在共享的I/O线程池中执行同步文件操作"""
+    return await io_executor.run(func, *args, **kwargs)
@@ -0,0 +1,199 @@
+"""
+主题压缩包导入
+先读取中央目录，根据文件列表找到 skin.json 和主题根目录并检查大小、文件数量和
+压缩率限制，然后只把主题根目录下的文件逐个流式解压到输出目录中的暂存目录，
+最后原子地重命名为主题目录。不需要先完整解压到临时目录再复制。
+"""
+
+import json
+import os
+import shutil
+import stat
+import uuid
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Union
+
+from ..config import get_settings
+from .builds import exchange_dirs
+
+settings = get_settings()
+
+COPY_CHUNK_SIZE = 1024 * 1024
+RATIO_MIN_SIZE = 1024 * 1024  # 小于该大小的文件不单独检查压缩率（小的CSS文件压缩率本来就高）
+STAGING_PREFIX = ".import-"
+# 主题目录下 ThemeManager 使用的模板和输出目录，不是主题
+RESERVED_DIRS = ("templates", "output")
+
+
+class ImportLimits(NamedTuple):
+    max_size: int  # 解压后的总大小
+    max_files: int
+    max_ratio: float
+
+
+class ArchiveLimitError(ValueError):
+    """压缩包超出导入限制"""
+
+
+class ImportPlan(NamedTuple):
+    root: str  # 主题根目录在压缩包中的路径（"" 为压缩包根目录）
+    members: List[zipfile.ZipInfo]
+    config: Dict[str, Any]
+    size: int
+
+
+class ImportResult(NamedTuple):
+    name: str
+    path: Path
+    config: Dict[str, Any]
+
+
+def default_limits() -> ImportLimits:
+    return ImportLimits(
+        settings.IMPORT_MAX_SIZE, settings.IMPORT_MAX_FILES, settings.IMPORT_MAX_RATIO
+    )
+
+
+def is_theme_dir_name(name: str) -> bool:
+    """主题目录下的条目是否是主题（排除隐藏目录、导入暂存目录和保留目录）"""
+    return not name.startswith(".") and name not in RESERVED_DIRS
+
+
+def check_theme_name(name: Any) -> str:
+    """检查主题名称可以安全地用作目录名，并且不与主题目录下的保留目录冲突"""
+    # 以 . 开头的名称（资源存储 .assets、版本记录 .versions、导入暂存目录）一并拒绝
+    if (
+        not isinstance(name, str)
+        or not name.strip()
+        or name in (".", "..")
+        or name.startswith(".")
+        or name in RESERVED_DIRS
+        or any(char in name for char in "/\\:\0")
+    ):
+        raise ValueError(f"无效的主题名称: {name}")
+    return name
+
+
+def check_member_path(name: str) -> None:
+    """检查压缩包内的路径不是绝对路径、不含 .. 也不以盘符开头"""
+    path = PurePosixPath(name.replace("\\", "/"))
+    if (
+        path.is_absolute()
+        or ".." in path.parts
+        or (path.parts and ":" in path.parts[0])
+    ):
+        raise ValueError(f"压缩包包含不安全的路径: {name}")
+
+
+def plan_import(archive: zipfile.ZipFile, limits: ImportLimits) -> Optional[ImportPlan]:
+    """根据中央目录确定要解压的文件并检查限制，没有 skin.json 时返回None"""
+    infos = archive.infolist()
+    configs = sorted(
+        (
+            info
+            for info in infos
+            if not info.is_dir() and PurePosixPath(info.filename).name == "skin.json"
+        ),
+        key=lambda info: info.filename.count("/"),
+    )
+    if not configs:
+        return None
+    root = PurePosixPath(configs[0].filename).parent.as_posix()
+    prefix = "" if root == "." else root + "/"
+
+    members = [
+        info
+        for info in infos
+        if info.filename.startswith(prefix) and info.filename != prefix
+    ]
+    size = check_members(members, limits)
+
+    try:
+        config = json.loads(archive.read(configs[0]).decode("utf-8"))
+    except ValueError as e:
+        raise ValueError(f"skin.json 无效: {e}")
+    if not isinstance(config, dict):
+        raise ValueError("skin.json 必须是JSON对象")
+    return ImportPlan(root if prefix else "", members, config, size)
+
+
+def check_members(members: List[zipfile.ZipInfo], limits: ImportLimits) -> int:
+    """检查要解压的文件的路径、文件数量、大小和压缩率，返回解压后的总大小"""
+    files = [info for info in members if not info.is_dir()]
+    for info in members:
+        check_member_path(info.filename)
+        if stat.S_ISLNK(info.external_attr >> 16):
+            raise ValueError(f"压缩包包含符号链接: {info.filename}")
+
+    if len(files) > limits.max_files:
+        raise ArchiveLimitError(f"文件数量超过限制: {len(files)} > {limits.max_files}")
+    size = sum(info.file_size for info in files)
+    if size > limits.max_size:
+        raise ArchiveLimitError(f"解压后大小超过限制: {size} > {limits.max_size}")
+    compressed = sum(info.compress_size for info in files)
+    if size > RATIO_MIN_SIZE and size > compressed * limits.max_ratio:
+        raise ArchiveLimitError("压缩率超过限制")
+    for info in files:
+        if (
+            info.file_size > RATIO_MIN_SIZE
+            and info.file_size > info.compress_size * limits.max_ratio
+        ):
+            raise ArchiveLimitError(f"压缩率超过限制: {info.filename}")
+    return size
+
+
+def _extract_members(archive: zipfile.ZipFile, plan: ImportPlan, staging: Path) -> None:
+    offset = len(plan.root) + 1 if plan.root else 0
+    for info in plan.members:
+        rel_path = info.filename[offset:].replace("\\", "/")
+        target = staging / rel_path
+        if info.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # ZipExtFile 最多读取中央目录中声明的大小，并在结尾校验CRC
+        with archive.open(info) as src, target.open("wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def replace_dir(staging: Path, target: Path) -> None:
+    """用暂存目录原子地替换目标目录，交换后暂存目录中的旧版本被删除"""
+    if target.exists():
+        exchange_dirs(staging, target)
+        shutil.rmtree(staging, ignore_errors=True)
+    else:
+        os.replace(staging, target)
+
+
+def import_archive(
+    source: Union[Path, BinaryIO],
+    output_dir: Path,
+    default_name: Optional[str] = None,
+    limits: Optional[ImportLimits] = None,
+) -> Optional[ImportResult]:
+    """把主题压缩包（文件路径或可随机读取的文件对象，例如上传的文件）导入到 output_dir
+
+    返回 (主题名称, 主题目录, skin.json 内容)，压缩包中没有 skin.json 时返回None。
+    """
+    limits = limits or default_limits()
+    if default_name is None and isinstance(source, Path):
+        default_name = source.stem
+
+    with zipfile.ZipFile(source) as archive:
+        plan = plan_import(archive, limits)
+        if plan is None:
+            return None
+        theme_name = check_theme_name(plan.config.get("name", default_name))
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        staging = output_dir / f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            _extract_members(archive, plan, staging)
+            target = output_dir / theme_name
+            replace_dir(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    return ImportResult(theme_name, target, plan.config)
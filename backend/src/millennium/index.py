@@ -0,0 +1,169 @@
+"""
+主题元数据索引
+把主题目录下每个主题的 skin.json 内容保存在磁盘上的紧凑JSON索引中，
+以主题目录和 skin.json 的修改时间为键增量刷新：列出主题时只需 stat，
+只有发生变化的主题才会重新读取 skin.json。
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .importer import is_theme_dir_name
+
+INDEX_VERSION = 1
+
+SORT_FIELDS = ("name", "title", "author", "version", "modified")
+
+
+class ThemeIndex:
+    def __init__(self, root: Path, index_path: Path):
+        self.root = root
+        self.index_path = index_path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self.reads = 0  # 累计重新读取 skin.json 的次数
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION and data.get("root") == str(
+                self.root
+            ):
+                return data["themes"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, AttributeError):
+            pass
+        return {}
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "root": str(self.root),
+                    "themes": self._entries,
+                },
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self) -> int:
+        """根据修改时间增量刷新索引，返回重新读取的主题数量"""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+
+            entries = self._entries
+            seen = set()
+            changed = 0
+
+            if self.root.exists():
+                with os.scandir(self.root) as it:
+                    for entry in it:
+                        if not entry.is_dir() or not is_theme_dir_name(entry.name):
+                            continue
+                        seen.add(entry.name)
+                        dir_mtime = entry.stat().st_mtime_ns
+                        config_path = Path(entry.path) / "skin.json"
+                        try:
+                            config_stat = config_path.stat()
+                            config_key = [config_stat.st_mtime_ns, config_stat.st_size]
+                        except FileNotFoundError:
+                            config_key = None
+
+                        old = entries.get(entry.name)
+                        if (
+                            old
+                            and old["dir_mtime_ns"] == dir_mtime
+                            and old["config_key"] == config_key
+                        ):
+                            continue
+
+                        entries[entry.name] = {
+                            "dir_mtime_ns": dir_mtime,
+                            "config_key": config_key,
+                            "config": self._read_config(config_path)
+                            if config_key
+                            else None,
+                        }
+                        changed += 1
+
+            removed = entries.keys() - seen
+            for name in removed:
+                del entries[name]
+
+            if changed or removed:
+                self._save()
+            return changed
+
+    def _read_config(self, config_path: Path) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        try:
+            with config_path.open("r", encoding="utf-8") as f:
+                config = json.load(f)
+            return config if isinstance(config, dict) else None
+        except (OSError, ValueError):
+            return None  # 无效的主题
+
+    def query(
+        self,
+        search: Optional[str] = None,
+        author: Optional[str] = None,
+        sort_by: str = "name",
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """查询主题，返回 (匹配总数, 当前页)"""
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+
+        self.refresh()
+        with self._lock:
+            items = [
+                (name, entry)
+                for name, entry in self._entries.items()
+                if entry["config"] is not None
+            ]
+
+        if search:
+            needle = search.lower()
+            items = [
+                (name, entry)
+                for name, entry in items
+                if needle in name.lower()
+                or any(
+                    needle in str(entry["config"].get(field, "")).lower()
+                    for field in ("name", "author", "description")
+                )
+            ]
+        if author:
+            items = [
+                (name, entry)
+                for name, entry in items
+                if str(entry["config"].get("author", "")).lower() == author.lower()
+            ]
+
+        def sort_key(item):
+            name, entry = item
+            if sort_by == "name":
+                return name.lower()
+            if sort_by == "modified":
+                return entry["config_key"][0]
+            field = "name" if sort_by == "title" else sort_by
+            return str(entry["config"].get(field, "")).lower()
+
+        items.sort(key=sort_key, reverse=descending)
+        total = len(items)
+        page = items[offset : offset + limit] if limit is not None else items[offset:]
+        return total, [
+            {"name": name, "config": entry["config"], "path": str(self.root / name)}
+            for name, entry in page
+        ]
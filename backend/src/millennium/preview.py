@@ -1,101 +1,403 @@
 import asyncio
-from pathlib import Path
-import websockets
 import json
-import shutil
-import tempfile
-from typing import Optional, Dict, Any
-from .core import MillenniumCore
+import re
+import time
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, NamedTuple, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from ..config import get_settings
+from .build_graph import ThemeBuildGraph, get_build_graph
+from .core import get_core
+from .css_build import preview_builder
+from .delta import DeltaDocuments, RevisionMismatch, decode_frame
+from .devtools import DevToolsError, DevToolsTransport, get_devtools_transport
+from .executor import run_io
+from .preview_updates import PreviewUpdateScheduler, SendResult
+from .sync import invalidate_manifest_entry, write_file_atomic
+
+settings = get_settings()
+
+DEFAULT_PREVIEW_FILE = "webkit.css"
+CUSTOM_CSS_SUFFIX = ".custom.css"
+
+TRANSPORT_FILE = "file"
+TRANSPORT_DEVTOOLS = "devtools"
+PREVIEW_TRANSPORTS = (TRANSPORT_FILE, TRANSPORT_DEVTOOLS)
+
+DEFAULT_SESSION = "default"
+
+
+def preview_skin_name(theme_name: str, session_id: Optional[str] = None) -> str:
+    """预览皮肤在skins目录中的名称：默认会话使用主题名称，其他会话各自部署到独立的目录"""
+    if not session_id or session_id == DEFAULT_SESSION:
+        return theme_name
+    return f"{theme_name}@{re.sub(r'[^A-Za-z0-9_-]', '_', session_id)}"
+
+
+def resolve_preview_file(root: Path, file_name: str) -> Path:
+    """检查文件是否允许热更新（webkit.css 或任意 *.custom.css），返回其在主题目录中的路径"""
+    rel_path = PurePosixPath(file_name)
+    if (
+        rel_path.is_absolute()
+        or ".." in rel_path.parts
+        or not (
+            rel_path.as_posix() == DEFAULT_PREVIEW_FILE
+            or rel_path.name.endswith(CUSTOM_CSS_SUFFIX)
+        )
+    ):
+        raise ValueError(f"不支持热更新的文件: {file_name}")
+    return root.joinpath(*rel_path.parts)
+
+
+class PreviewMessage(NamedTuple):
+    file_name: str
+    content: str
+    message_id: Any = None
+    rev: int = 0  # 内容对应的版本，作为后续二进制增量帧的基准
+
+
+def parse_preview_message(text: str) -> PreviewMessage:
+    """解析文本预览消息"""
+    if text.lstrip().startswith("{"):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get("content"), str):
+            rev = data.get("rev", 0)
+            return PreviewMessage(
+                str(data.get("file") or DEFAULT_PREVIEW_FILE),
+                data["content"],
+                data.get("id"),
+                rev if isinstance(rev, int) else 0,
+            )
+    return PreviewMessage(DEFAULT_PREVIEW_FILE, text)
+
 
 class ThemePreview:
-    def __init__(self, steam_path: Path):
+    def __init__(
+        self,
+        steam_path: Path,
+        transport: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
         self.steam_path = steam_path
-        self.preview_path = Path(tempfile.mkdtemp())
-        self.core = MillenniumCore()
+        self.session_id = session_id
+        self.core = get_core()
+        self.transport = transport or settings.PREVIEW_TRANSPORT
+        self._devtools: Optional[DevToolsTransport] = None
+        self._devtools_pushed = False  # 是否通过DevTools注入过样式，停止预览时需要移除
         self.current_theme: Optional[Path] = None
         self.preview_active = False
-        self.websocket: Optional[websockets.WebSocketServerProtocol] = None
+        self.websocket: Optional[WebSocket] = None
+        # 预览中修改过的文件只保存在内存中（{相对路径: 内容}），其余文件直接读取主题目录
+        self.overlay: Dict[str, bytes] = {}
+        self.documents: Optional[DeltaDocuments] = None
+        # Steam skins 目录中已部署的预览皮肤，热更新直接写入这里
+        self.skin_name: Optional[str] = None
+        self.deployed_path: Optional[Path] = None
+        self._dirty_files: Set[str] = set()
+        self.scheduler: Optional[PreviewUpdateScheduler] = None
+        self._closed_update_stats = {"received": 0, "applied": 0, "coalesced": 0}
+        self.last_used = time.monotonic()
+        self.warm = False  # 最近一次预览是否复用了热备的皮肤构建
+
+    @property
+    def transport(self) -> str:
+        return self._transport
+
+    @transport.setter
+    def transport(self, value: str) -> None:
+        if value not in PREVIEW_TRANSPORTS:
+            raise ValueError(f"不支持的预览方式: {value}")
+        self._transport = value
+
+    @property
+    def devtools(self) -> DevToolsTransport:
+        if self._devtools is None:
+            self._devtools = get_devtools_transport()
+        return self._devtools
+
+    @devtools.setter
+    def devtools(self, value: DevToolsTransport) -> None:
+        self._devtools = value
+
+    def touch(self) -> None:
+        """记录最近一次使用时间（用于空闲超时和LRU淘汰）"""
+        self.last_used = time.monotonic()
 
     async def preview_theme(self, theme_path: Path) -> None:
         """开始预览主题"""
         if not await self.core.validate_theme(theme_path):
             raise ValueError("无效的主题")
 
+        self.touch()
         self.current_theme = theme_path
         self.preview_active = True
+        self.overlay = {}
 
-        # 复制主题到临时目录
-        preview_theme_path = self.preview_path / theme_path.name
-        if preview_theme_path.exists():
-            shutil.rmtree(preview_theme_path)
-        shutil.copytree(theme_path, preview_theme_path)
-
-        # 应用预览主题
+        # 直接从主题目录部署，只同步skins中需要变化的文件
         try:
-            await self.core.apply_theme(preview_theme_path, is_preview=True)
+            stats = await self._deploy_preview()
+            self.warm = stats["warm_build"]
         except Exception as e:
             self.preview_active = False
             raise Exception(f"应用预览主题失败: {str(e)}")
 
-    async def update_preview(self, css_content: str) -> Dict[str, Any]:
-        """更新预览CSS"""
+    async def _deploy_preview(self) -> Dict[str, Any]:
+        """完整部署预览主题（验证并同步主题目录和内存中修改过的文件）"""
+        theme_config = await run_io(self.core.get_theme_config, self.current_theme)
+        self.skin_name = preview_skin_name(theme_config["name"], self.session_id)
+        # 部署在IO线程中遍历 overlay，传入快照，避免事件循环上的编辑同时修改它
+        stats = await self.core.apply_theme(
+            self.current_theme,
+            is_preview=True,
+            overlay=dict(self.overlay),
+            skin_name=self.skin_name,
+        )
+        self.deployed_path = self.core.skins_path / self.skin_name
+        self._dirty_files = set()
+        return stats
+
+    async def update_preview(
+        self, css_content: str, file_name: str = DEFAULT_PREVIEW_FILE
+    ) -> Dict[str, Any]:
+        """更新预览CSS：只把变化的文件写入已部署的预览皮肤，不重新验证和部署整个主题"""
         if not self.preview_active or not self.current_theme:
             return {"status": "error", "message": "预览未激活"}
 
-        try:
-            preview_theme_path = self.preview_path / self.current_theme.name
-            webkit_css_path = preview_theme_path / "webkit.css"
-
-            # 更新CSS文件
-            with webkit_css_path.open("w", encoding="utf-8") as f:
-                f.write(css_content)
+        self.touch()
+        start = time.perf_counter()
+        if self.transport == TRANSPORT_DEVTOOLS:
+            try:
+                return await self._update_devtools(css_content, file_name, start)
+            except DevToolsError:
+                pass  # Steam未开放调试端口，回退到写入文件
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
 
-            # 重新应用主题以更新预览
-            await self.core.apply_theme(preview_theme_path, is_preview=True)
-            return {"status": "success", "message": "预览已更新"}
+        try:
+            # overlay 只在事件循环上修改，IO线程只负责写文件
+            rel_path = PurePosixPath(file_name).as_posix()
+            resolve_preview_file(self.current_theme, file_name)
+            self.overlay[rel_path] = css_content.encode("utf-8")
+            hot_reload = await run_io(
+                self._write_preview_file, rel_path, dict(self.overlay)
+            )
+            if not hot_reload:
+                # 预览皮肤尚未部署（或已被移除），回退到完整部署
+                await self._deploy_preview()
+            return {
+                "status": "success",
+                "message": "预览已更新",
+                "file": file_name,
+                "hot_reload": hot_reload,
+                "transport": TRANSPORT_FILE,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    async def _update_devtools(
+        self, css_content: str, file_name: str, start: float
+    ) -> Dict[str, Any]:
+        """通过DevTools直接更新页面中的样式表，修改同时保存在内存中供之后部署"""
+        resolve_preview_file(self.current_theme, file_name)
+        rel_path = PurePosixPath(file_name).as_posix()
+        overlay = dict(self.overlay)
+        overlay[rel_path] = css_content.encode("utf-8")
+        # 推送构建后的样式表：内联 @import 和模板，依赖该文件的其他输出一并更新
+        outputs = await run_io(self._preview_graph().build_overlay, overlay, [rel_path])
+        targets = round_trip_ms = 0
+        for output, data in sorted(outputs.items()):
+            push = await self.devtools.push_stylesheet(
+                output,
+                data.decode("utf-8", errors="replace"),
+                self.session_id or DEFAULT_SESSION,
+            )
+            self._devtools_pushed = True
+            targets = push["targets"]
+            round_trip_ms += push["round_trip_ms"]
+        self.overlay[rel_path] = overlay[rel_path]
+        return {
+            "status": "success",
+            "message": "预览已更新",
+            "file": file_name,
+            "hot_reload": True,
+            "transport": TRANSPORT_DEVTOOLS,
+            "targets": targets,
+            "round_trip_ms": round(round_trip_ms, 3),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def _preview_graph(self) -> ThemeBuildGraph:
+        return get_build_graph(self.current_theme, builder=preview_builder)
+
+    def _write_preview_file(self, rel_path: str, overlay: Dict[str, bytes]) -> bool:
+        """重新构建修改的文件及依赖它的输出并写入已部署的皮肤，返回是否完成了热更新
+
+        在IO线程中运行，overlay 为事件循环上的 self.overlay 的快照。
+        """
+        if self.deployed_path is None or not self.deployed_path.is_dir():
+            return False
+        outputs = self._preview_graph().build_overlay(overlay, [rel_path])
+        for output, data in outputs.items():
+            deployed_file = self.deployed_path.joinpath(*PurePosixPath(output).parts)
+            deployed_file.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(deployed_file, data)
+
+            # 已部署的文件与同步清单不再一致，每个文件只需标记一次
+            if output not in self._dirty_files:
+                invalidate_manifest_entry(self.deployed_path, output)
+                self._dirty_files.add(output)
+        return True
+
     async def stop_preview(self) -> None:
-        """停止预览"""
+        """停止预览，把预览皮肤移出skins目录作为热备，再次预览时只需同步变化的文件"""
         if self.preview_active and self.current_theme:
             try:
-                preview_theme_path = self.preview_path / self.current_theme.name
-                await self.core.remove_theme(preview_theme_path)
+                if self.skin_name == await run_io(self.core.get_current_theme):
+                    # 预览的是Steam正在使用的主题，按正常应用的方式重新构建并部署
+                    await self.core.apply_theme(
+                        self.current_theme, skin_name=self.skin_name
+                    )
+                elif self.skin_name:
+                    await run_io(self.core.skin_builds.retire, self.skin_name)
             except Exception:
                 pass  # 忽略清理错误
+            if self._devtools_pushed:
+                self._devtools_pushed = False
+                try:
+                    await self.devtools.clear_session(
+                        self.session_id or DEFAULT_SESSION
+                    )
+                except Exception:
+                    pass  # Steam可能已经关闭
 
             self.preview_active = False
             self.current_theme = None
+            self.deployed_path = None
+            self.overlay = {}
 
-        # 清理临时目录
-        try:
-            shutil.rmtree(self.preview_path)
-        except Exception:
-            pass
+    async def close(self) -> None:
+        """停止预览并删除预览皮肤及其热备"""
+        await self.stop_preview()
+        if self.skin_name and self.skin_name != await run_io(
+            self.core.get_current_theme
+        ):
+            try:
+                await run_io(self.core.skin_builds.remove, self.skin_name)
+            except Exception:
+                pass  # 忽略清理错误
+        self.skin_name = None
+
+    def memory_usage(self) -> Dict[str, int]:
+        """获取会话在内存中保存的文件数量和字节数"""
+        return {
+            "overlay_files": len(self.overlay),
+            "overlay_bytes": sum(len(data) for data in self.overlay.values()),
+            "delta_bytes": self.documents.memory_usage() if self.documents else 0,
+        }
 
-    async def handle_websocket(self, websocket: websockets.WebSocketServerProtocol) -> None:
-        """处理WebSocket连接"""
+    def attach_websocket(self, websocket: WebSocket) -> bool:
+        """把WebSocket连接登记为会话的唯一连接，会话已有其他连接时返回 False"""
+        if self.websocket is not None and self.websocket is not websocket:
+            return False
         self.websocket = websocket
+        return True
+
+    async def handle_websocket(self, websocket: WebSocket) -> None:
+        """处理WebSocket连接
+
+        文本消息可以是 webkit.css 的完整内容，也可以是
+        {"file": "libraryroot.custom.css", "content": "...", "id": 1, "rev": 0} 形式的JSON，
+        完整内容同时作为该文件的基准版本。二进制消息是相对基准版本的增量帧
+        （格式见 delta.py），确认消息的 id 为新版本号；基准版本不一致时返回 resync，
+        客户端需要重新发送完整内容。
+        编辑经过调度器合并，被更新内容取代的消息以 dropped 状态确认。
+        同一会话同时只能有一个连接，会话已有其他连接时抛出 RuntimeError。
+        """
+
+        async def send(result: Dict[str, Any]) -> None:
+            await websocket.send_text(json.dumps(result, ensure_ascii=False))
+
+        if not self.attach_websocket(websocket):
+            raise RuntimeError("该预览会话已有WebSocket连接")
+        documents = self.documents = DeltaDocuments()
+        self.scheduler = PreviewUpdateScheduler(
+            self.update_preview, send, settings.PREVIEW_DEBOUNCE_MS / 1000
+        )
+        self.scheduler.start()
         try:
-            async for message in websocket:
-                if isinstance(message, str):
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") is not None:
                     # 处理CSS更新
-                    result = await self.update_preview(message)
-                    await websocket.send(json.dumps(result))
-                elif isinstance(message, bytes):
-                    # 处理二进制数据（如果需要）
-                    pass
-        except websockets.exceptions.ConnectionClosed:
+                    update = parse_preview_message(message["text"])
+                    documents.set(
+                        update.file_name, update.rev, update.content.encode("utf-8")
+                    )
+                    await self.scheduler.submit(
+                        update.file_name, update.content, update.message_id
+                    )
+                elif message.get("bytes") is not None:
+                    # 处理增量帧
+                    await self._handle_delta_frame(message["bytes"], documents, send)
+        except WebSocketDisconnect:
             pass
         finally:
-            self.websocket = None
-            await self.stop_preview()
+            try:
+                await self.scheduler.close()
+                for key in self._closed_update_stats:
+                    self._closed_update_stats[key] += self.scheduler.stats()[key]
+            finally:
+                self.scheduler = None
+                self.documents = None
+                # 停止预览后才释放连接，避免新连接的预览被这里停止
+                await self.stop_preview()
+                self.websocket = None
 
-    def __del__(self):
-        """清理资源"""
+    async def _handle_delta_frame(
+        self, data: bytes, documents: DeltaDocuments, send: SendResult
+    ) -> None:
         try:
-            if self.preview_path.exists():
-                shutil.rmtree(self.preview_path)
-        except Exception:
-            pass 
\ No newline at end of file
+            frame = decode_frame(data)
+        except (ValueError, UnicodeDecodeError) as e:
+            await send({"status": "error", "message": f"无效的增量帧: {e}"})
+            return
+
+        try:
+            content = documents.apply(frame).decode("utf-8")
+        except RevisionMismatch as e:
+            await send(
+                {
+                    "status": "resync",
+                    "file": e.file_name,
+                    "rev": e.expected_rev,
+                    "id": frame.new_rev,
+                }
+            )
+            return
+        except UnicodeDecodeError:
+            await send(
+                {
+                    "status": "resync",
+                    "file": frame.file_name,
+                    "rev": None,
+                    "id": frame.new_rev,
+                }
+            )
+            return
+        await self.scheduler.submit(frame.file_name, content, frame.new_rev)
+
+    def update_stats(self) -> Dict[str, int]:
+        """获取所有连接累计收到/已应用/被合并的预览更新数量"""
+        stats = dict(self._closed_update_stats, pending=0)
+        if self.scheduler is not None:
+            for key, value in self.scheduler.stats().items():
+                stats[key] += value
+        return stats
@@ -0,0 +1,156 @@
+"""
+预览会话池
+每个 (会话, 主题) 拥有独立的 ThemePreview 和内存中的修改，非默认会话部署到
+各自的皮肤目录（见 preview_skin_name），多个用户同时预览同一主题时互不影响。
+会话数量有上限，超出时按最近使用顺序淘汰没有连接的会话。第一次获取会话时启动
+后台任务定期关闭空闲超时的会话，获取会话和查询状态（/preview/stats）时也会检查。
+停止预览后皮肤构建作为热备保留，再次预览同一主题时复用。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .preview import DEFAULT_SESSION, ThemePreview
+
+SessionKey = Tuple[str, str]  # (会话ID, 主题名称)
+
+
+class PreviewPool:
+    def __init__(
+        self,
+        steam_path: Path,
+        max_sessions: int = 4,
+        idle_timeout: float = 600,
+        factory: Optional[Callable[[Path], ThemePreview]] = None,
+        reap_interval: Optional[float] = None,
+    ):
+        self.steam_path = steam_path
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.factory = factory or ThemePreview
+        # 后台检查空闲会话的间隔，默认为空闲超时的一半（最多60秒）
+        self.reap_interval = (
+            reap_interval if reap_interval is not None else min(idle_timeout / 2, 60)
+        )
+        self._reaper: Optional[asyncio.Task] = None
+        self._sessions: "OrderedDict[SessionKey, ThemePreview]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.expired = 0
+
+    async def acquire(
+        self, theme_name: str, session_id: Optional[str] = None
+    ) -> ThemePreview:
+        """获取会话对应的预览，不存在时创建；必要时淘汰空闲或最久未用的会话"""
+        key = (session_id or DEFAULT_SESSION, theme_name)
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+        async with self._lock:
+            await self._expire_idle()
+
+            preview = self._sessions.get(key)
+            if preview is not None:
+                self._sessions.move_to_end(key)
+                self.reused += 1
+                preview.touch()
+                return preview
+
+            while len(self._sessions) >= self.max_sessions:
+                if not await self._evict_one():
+                    raise RuntimeError("预览会话数量已达上限")
+
+            preview = self.factory(self.steam_path)
+            preview.session_id = key[0]
+            self._sessions[key] = preview
+            self.created += 1
+            return preview
+
+    def get(
+        self, theme_name: str, session_id: Optional[str] = None
+    ) -> Optional[ThemePreview]:
+        """获取已存在的预览会话"""
+        return self._sessions.get((session_id or DEFAULT_SESSION, theme_name))
+
+    async def release(self, theme_name: str, session_id: Optional[str] = None) -> bool:
+        """关闭会话并删除其预览皮肤"""
+        async with self._lock:
+            preview = self._sessions.pop(
+                (session_id or DEFAULT_SESSION, theme_name), None
+            )
+        if preview is None:
+            return False
+        await preview.close()
+        return True
+
+    async def _evict_one(self) -> bool:
+        # 按LRU顺序淘汰第一个没有WebSocket连接的会话
+        for key, preview in self._sessions.items():
+            if preview.websocket is None:
+                del self._sessions[key]
+                await preview.close()
+                self.evicted += 1
+                return True
+        return False
+
+    async def _expire_idle(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, preview in self._sessions.items()
+            if preview.websocket is None and now - preview.last_used > self.idle_timeout
+        ]
+        for key in expired:
+            await self._sessions.pop(key).close()
+            self.expired += 1
+
+    async def expire_idle(self) -> None:
+        """关闭空闲超时的会话"""
+        async with self._lock:
+            await self._expire_idle()
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            await self.expire_idle()
+
+    async def close(self) -> None:
+        """关闭所有会话"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for preview in sessions:
+            await preview.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取会话池状态以及各会话的预览更新统计"""
+        now = time.monotonic()
+        sessions: List[Dict[str, Any]] = [
+            {
+                "session": session_id,
+                "theme": theme_name,
+                "active": preview.preview_active,
+                "connected": preview.websocket is not None,
+                "warm": preview.warm,
+                "idle_seconds": round(now - preview.last_used, 3),
+                "updates": preview.update_stats(),
+                "memory": preview.memory_usage(),
+            }
+            for (session_id, theme_name), preview in self._sessions.items()
+        ]
+        return {
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "sessions": sessions,
+        }
@@ -0,0 +1,96 @@
+"""
+预览更新调度
+每个WebSocket连接一个调度器：同一文件只保留最新的待处理内容，在防抖窗口内
+合并连续的编辑，被新内容取代的消息以 dropped 状态确认，避免快速输入时
+排队执行大量过期的更新。
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+ApplyUpdate = Callable[[str, str], Awaitable[Dict[str, Any]]]
+SendResult = Callable[[Dict[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewUpdateScheduler:
+    def __init__(self, apply: ApplyUpdate, send: SendResult, debounce: float = 0.03):
+        self.apply = apply
+        self.send = send
+        self.debounce = debounce
+        # 文件名 -> (内容, 消息ID)，按首次等待的顺序应用
+        self._pending: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self.received = 0
+        self.applied = 0
+        self.coalesced = 0
+
+    def start(self) -> None:
+        """启动后台应用更新的任务"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(
+        self, file_name: str, content: str, message_id: Any = None
+    ) -> None:
+        """提交一次编辑；同一文件尚未应用的旧内容会被丢弃"""
+        self.received += 1
+        superseded = self._pending.pop(file_name, None)
+        self._pending[file_name] = (content, message_id)
+        self._wakeup.set()
+        if superseded is not None:
+            self.coalesced += 1
+            await self.send(
+                {"status": "dropped", "file": file_name, "id": superseded[1]}
+            )
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # 防抖：窗口内的后续编辑直接覆盖待处理内容
+            if self.debounce > 0:
+                await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """立即应用所有待处理的更新；单个更新失败时记录日志并继续处理后面的更新"""
+        while self._pending:
+            file_name, (content, message_id) = self._pending.popitem(last=False)
+            try:
+                result = await self.apply(content, file_name)
+                self.applied += 1
+            except Exception as e:
+                logger.exception("应用预览更新失败: %s", file_name)
+                result = {"status": "error", "file": file_name, "message": str(e)}
+            try:
+                await self.send(dict(result, id=message_id))
+            except Exception:
+                # 例如客户端在应用期间断开连接
+                logger.warning("发送预览更新结果失败: %s", file_name, exc_info=True)
+
+    async def close(self) -> None:
+        """停止调度，未应用的更新直接丢弃"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("预览更新任务异常退出")
+            self._worker = None
+        self._pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """获取收到/已应用/被合并的更新数量"""
+        return {
+            "received": self.received,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,323 @@
+"""
+主题目录增量同步
+根据源目录与目标目录的清单（大小、修改时间、内容哈希）只复制变化的文件、
+只删除已移除的文件。清单保存在部署目录中（随目录一起重命名），后续同步时
+大小和修改时间未变化的文件直接沿用记录的哈希，无需重新计算。
+清单同时记录源目录中每个子目录的修改时间；这些目录都未变化时文件列表不变，
+直接按清单逐个检查文件而不再遍历源目录（原地修改文件不改变目录的修改时间，
+所以仍需检查每个文件的大小和修改时间）。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .deploy import STRATEGY_HARDLINK, STRATEGY_REFLINK
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = ".sts-manifest.json"
+MANIFEST_FORMAT = 2
+
+Manifest = Dict[str, Dict[str, Any]]
+
+
+def file_hash(path: Path) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path_for(target: Path) -> Path:
+    """部署目录对应的清单文件路径"""
+    return target / MANIFEST_NAME
+
+
+def iter_files(root: Path, dirs: Optional[Dict[str, int]] = None):
+    """遍历目录下所有文件（不含清单文件），产出 (相对路径, os.DirEntry)
+
+    dirs 不为None时记录遍历到的每个目录（相对路径）的修改时间。
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        if dirs is not None:
+            # 在读取目录内容之前记录，遍历期间的变化会在下一次同步时发现
+            rel_dir = directory.relative_to(root).as_posix()
+            dirs[rel_dir] = os.stat(directory).st_mtime_ns
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file():
+                    rel_path = Path(entry.path).relative_to(root).as_posix()
+                    if rel_path != MANIFEST_NAME:
+                        yield rel_path, entry
+
+
+def build_manifest(root: Path, previous: Optional[Manifest] = None) -> Manifest:
+    """生成目录清单，大小和修改时间未变的文件沿用 previous 中的哈希"""
+    previous = previous or {}
+    manifest: Manifest = {}
+    if not root.exists():
+        return manifest
+
+    for rel_path, entry in iter_files(root):
+        stat = entry.stat()
+        old = previous.get(rel_path)
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            digest = old["hash"]
+        else:
+            digest = file_hash(Path(entry.path))
+        manifest[rel_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+        }
+    return manifest
+
+
+def _load_state(target: Path) -> Optional[Dict[str, Any]]:
+    path = manifest_path_for(target)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if data.get("format") != MANIFEST_FORMAT:
+        # 旧格式的清单只有文件记录
+        return {"source": None, "dirs": None, "files": data}
+    return data
+
+
+def load_manifest(target: Path) -> Optional[Manifest]:
+    """读取部署目录的清单，不存在或损坏时返回None"""
+    state = _load_state(target)
+    return state["files"] if state is not None else None
+
+
+def save_manifest(
+    target: Path,
+    manifest: Manifest,
+    source: Optional[Path] = None,
+    dirs: Optional[Dict[str, int]] = None,
+) -> None:
+    """原子地保存清单；source 和 dirs 为同步时源目录及其各子目录的修改时间"""
+    path = manifest_path_for(target)
+    temp_path = path.with_name(path.name + ".tmp")
+    state = {
+        "format": MANIFEST_FORMAT,
+        "source": str(source) if source is not None else None,
+        "dirs": dirs,
+        "files": manifest,
+    }
+    with temp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def invalidate_manifest_entry(target: Path, rel_path: str) -> bool:
+    """把部署目录中被直接修改的文件标记为未知内容，下次同步时必定重新部署"""
+    state = _load_state(target)
+    if state is None or rel_path not in state["files"]:
+        return False
+    state["files"][rel_path].update(mtime_ns=None, hash=None)
+    source = Path(state["source"]) if state["source"] else None
+    save_manifest(target, state["files"], source, state["dirs"])
+    return True
+
+
+def _dirs_unchanged(source: Path, dirs: Optional[Dict[str, int]]) -> bool:
+    if not dirs:
+        return False
+    try:
+        return all(
+            os.stat(source / rel_dir).st_mtime_ns == mtime_ns
+            for rel_dir, mtime_ns in dirs.items()
+        )
+    except OSError:
+        return False
+
+
+def _source_files(source: Path, deployed: Manifest, overlay: Dict[str, bytes]):
+    # 目录未变化时源文件列表就是上次清单中的文件（上次的 overlay 文件在源目录中
+    # 可能不存在）；产出 (相对路径, 源文件, stat)
+    for rel_path in deployed:
+        if rel_path in overlay:
+            continue
+        source_file = source / rel_path
+        try:
+            stat = source_file.stat()
+        except FileNotFoundError:
+            continue
+        yield rel_path, source_file, stat
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """原子地写入文件：先写入同目录下的临时文件，再重命名覆盖"""
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, temp_name = tempfile.mkstemp(
+        prefix=f".{path.name}.", suffix=".tmp", dir=path.parent
+    )
+    try:
+        if hasattr(os, "fchmod"):  # Windows上没有 fchmod
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def remove_tree(target: Path) -> None:
+    """删除部署目录（清单随目录一起删除）"""
+    if target.exists():
+        shutil.rmtree(target)
+
+
+def sync_tree(
+    source: Path,
+    target: Path,
+    copy_file: Callable[[Path, Path], Any] = shutil.copy2,
+    overlay: Optional[Dict[str, bytes]] = None,
+) -> Dict[str, Any]:
+    """把 source 增量同步到 target，返回复制/删除的统计信息
+
+    copy_file 可以是 deploy.get_deploy_function 返回的部署函数，
+    通过reflink或硬链接部署的文件计入 files_linked / bytes_linked。
+    overlay 为 {相对路径: 内容}，其中的文件以内存中的内容代替源文件部署。
+    """
+    start = time.perf_counter()
+    stats = {
+        "files_copied": 0,
+        "bytes_copied": 0,
+        "files_linked": 0,
+        "bytes_linked": 0,
+        "files_deleted": 0,
+        "files_unchanged": 0,
+        "files_hashed": 0,
+    }
+
+    # 已部署内容的清单；没有记录时对目标目录做一次完整扫描
+    state = _load_state(target) if target.exists() else None
+    deployed = state["files"] if state is not None else None
+    if deployed is None:
+        deployed = {}
+        if target.exists():
+            for rel_path, item in build_manifest(target).items():
+                deployed[rel_path] = {
+                    "size": item["size"],
+                    "mtime_ns": None,
+                    "hash": item["hash"],
+                }
+                stats["files_hashed"] += 1
+
+    target.mkdir(parents=True, exist_ok=True)
+    manifest: Manifest = {}
+
+    overlay = overlay or {}
+    for rel_path, data in overlay.items():
+        digest = hashlib.sha256(data).hexdigest()
+        manifest[rel_path] = {"size": len(data), "mtime_ns": None, "hash": digest}
+        old = deployed.get(rel_path)
+        target_file = target / rel_path
+        if old and old["hash"] == digest and _target_matches(target_file, len(data)):
+            stats["files_unchanged"] += 1
+            continue
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        if target_file.is_symlink():
+            target_file.unlink()
+        write_file_atomic(target_file, data)
+        stats["files_copied"] += 1
+        stats["bytes_copied"] += len(data)
+
+    # 源目录和各子目录都未变化时不必遍历源目录
+    walked = not (
+        state is not None
+        and state["source"] == str(source)
+        and _dirs_unchanged(source, state["dirs"])
+    )
+    if walked:
+        dirs: Dict[str, int] = {}
+        source_files = (
+            (rel_path, Path(entry.path), entry.stat())
+            for rel_path, entry in iter_files(source, dirs)
+            if rel_path not in overlay
+        )
+    else:
+        dirs = state["dirs"]
+        source_files = _source_files(source, deployed, overlay)
+    stats["source_walked"] = walked
+
+    for rel_path, source_file, stat in source_files:
+        old = deployed.get(rel_path)
+        target_file = target / rel_path
+
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            digest = old["hash"]
+        else:
+            digest = file_hash(source_file)
+            stats["files_hashed"] += 1
+
+        manifest[rel_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+        }
+
+        if old and old["hash"] == digest and _target_matches(target_file, stat.st_size):
+            stats["files_unchanged"] += 1
+            continue
+
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        if target_file.exists() or target_file.is_symlink():
+            target_file.unlink()
+        method = copy_file(source_file, target_file)
+        if method in (STRATEGY_REFLINK, STRATEGY_HARDLINK):
+            stats["files_linked"] += 1
+            stats["bytes_linked"] += stat.st_size
+        else:
+            stats["files_copied"] += 1
+            stats["bytes_copied"] += stat.st_size
+
+    # 删除源目录中已不存在的文件
+    for rel_path in deployed.keys() - manifest.keys():
+        target_file = target / rel_path
+        if target_file.exists() or target_file.is_symlink():
+            target_file.unlink()
+            stats["files_deleted"] += 1
+            _prune_empty_dirs(target_file.parent, target)
+
+    save_manifest(target, manifest, source, dirs)
+    stats["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return stats
+
+
+def _target_matches(target_file: Path, size: int) -> bool:
+    try:
+        return target_file.stat().st_size == size
+    except FileNotFoundError:
+        return False
+
+
+def _prune_empty_dirs(directory: Path, root: Path) -> None:
+    while directory != root:
+        try:
+            directory.rmdir()
+        except OSError:
+            return
+        directory = directory.parent
@@ -1,15 +1,56 @@
 import json
 import shutil
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Union
+
 from ..config import get_settings
+from .asset_store import ASSET_DIR, AssetStore
+from .build_graph import TEMPLATE_KEY, get_build_graph
+from .executor import run_io
+from .importer import import_archive
+from .index import ThemeIndex
+from .sync import iter_files
+from .zip_stream import ZipMember, stream_zip
 
 settings = get_settings()
 
+
+def archive_members(
+    theme_dir: Path, templates_dir: Optional[Path] = None, prefix: str = ""
+) -> List[ZipMember]:
+    """列出导出主题时写入压缩包的文件
+
+    CSS使用构建后的结果（包括从模板继承的文件），其余文件在写入时才从磁盘读取。
+    继承了模板时导出的 skin.json 去掉 template 字段，导入方不需要有同名模板。
+    """
+    built, stats = get_build_graph(theme_dir, templates_dir).build()
+    if stats["templates"]:
+        config = json.loads((theme_dir / "skin.json").read_text(encoding="utf-8"))
+        config.pop(TEMPLATE_KEY, None)
+        built["skin.json"] = json.dumps(config, indent=2, ensure_ascii=False).encode(
+            "utf-8"
+        )
+    members = []
+    for rel_path, entry in sorted(iter_files(theme_dir), key=lambda item: item[0]):
+        data = built.pop(rel_path, None)
+        if data is not None:
+            members.append(ZipMember(prefix + rel_path, data=data))
+        else:
+            members.append(ZipMember(prefix + rel_path, path=Path(entry.path)))
+    members.extend(
+        ZipMember(prefix + rel_path, data=built[rel_path]) for rel_path in sorted(built)
+    )
+    return members
+
+
 class ThemeManager:
     def __init__(self):
         self.templates_dir = settings.THEMES_PATH / "templates"
         self.output_dir = settings.THEMES_PATH / "output"
+        self.theme_index = ThemeIndex(
+            self.output_dir, settings.TEMP_DIR / "output_index.json"
+        )
+        self.asset_store = AssetStore(settings.THEMES_PATH / ASSET_DIR)
         self._ensure_directories()
 
     def _ensure_directories(self):
@@ -19,6 +60,9 @@ class ThemeManager:
 
     async def create_theme(self, name: str, config: Dict) -> Path:
         """创建新主题"""
+        return await run_io(self._create_theme, name, config)
+
+    def _create_theme(self, name: str, config: Dict) -> Path:
         theme_dir = self.output_dir / name
         if theme_dir.exists():
             raise ValueError(f"主题 '{name}' 已存在")
@@ -51,6 +95,9 @@ class ThemeManager:
 
     async def get_theme(self, name: str) -> Optional[Dict]:
         """获取主题信息"""
+        return await run_io(self._get_theme, name)
+
+    def _get_theme(self, name: str) -> Optional[Dict]:
         theme_dir = self.output_dir / name
         if not theme_dir.exists():
             return None
@@ -62,26 +109,26 @@ class ThemeManager:
         with config_path.open("r", encoding="utf-8") as f:
             return json.load(f)
 
-    async def list_themes(self) -> List[Dict]:
+    async def list_themes(
+        self,
+        search: Optional[str] = None,
+        author: Optional[str] = None,
+        sort_by: str = "name",
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
         """列出所有主题"""
-        themes = []
-        for theme_dir in self.output_dir.iterdir():
-            if not theme_dir.is_dir():
-                continue
-
-            config_path = theme_dir / "skin.json"
-            if not config_path.exists():
-                continue
-
-            with config_path.open("r", encoding="utf-8") as f:
-                config = json.load(f)
-                config["path"] = str(theme_dir)
-                themes.append(config)
-
-        return themes
+        _, themes = await run_io(
+            self.theme_index.query, search, author, sort_by, descending, offset, limit
+        )
+        return [dict(theme["config"], path=theme["path"]) for theme in themes]
 
     async def update_theme(self, name: str, updates: Dict) -> bool:
         """更新主题"""
+        return await run_io(self._update_theme, name, updates)
+
+    def _update_theme(self, name: str, updates: Dict) -> bool:
         theme_dir = self.output_dir / name
         if not theme_dir.exists():
             return False
@@ -102,54 +149,50 @@ class ThemeManager:
 
     async def delete_theme(self, name: str) -> bool:
         """删除主题"""
+        return await run_io(self._delete_theme, name)
+
+    def _delete_theme(self, name: str) -> bool:
         theme_dir = self.output_dir / name
         if not theme_dir.exists():
             return False
 
         shutil.rmtree(theme_dir)
+        self.asset_store.collect_garbage()
         return True
 
+    async def export_stream(self, name: str) -> Optional[AsyncIterator[bytes]]:
+        """以ZIP数据流的形式导出主题，主题不存在时返回None"""
+        theme_dir = self.output_dir / name
+        if not await run_io(theme_dir.is_dir):
+            return None
+        members = await run_io(archive_members, theme_dir, self.templates_dir)
+        return stream_zip(members)
+
     async def export_theme(self, name: str, target_dir: Path) -> Optional[Path]:
         """导出主题"""
-        theme_dir = self.output_dir / name
-        if not theme_dir.exists():
+        stream = await self.export_stream(name)
+        if stream is None:
             return None
 
+        # 压缩数据边生成边写入目标文件，不需要临时压缩包
         target_path = target_dir / f"{name}.zip"
-        shutil.make_archive(str(target_path.with_suffix("")), "zip", theme_dir)
-
+        f = await run_io(target_path.open, "wb")
+        try:
+            async for chunk in stream:
+                await run_io(f.write, chunk)
+        except BaseException:
+            await run_io(f.close)
+            await run_io(target_path.unlink)
+            raise
+        await run_io(f.close)
         return target_path
 
-    async def import_theme(self, zip_path: Path) -> Optional[str]:
-        """导入主题"""
-        import tempfile
-        import zipfile
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            
-            # 解压主题文件
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(temp_path)
-
-            # 查找skin.json
-            config_files = list(temp_path.rglob("skin.json"))
-            if not config_files:
-                return None
-
-            config_path = config_files[0]
-            theme_dir = config_path.parent
-
-            # 读取主题配置
-            with config_path.open("r", encoding="utf-8") as f:
-                config = json.load(f)
-
-            # 移动到输出目录
-            theme_name = config.get("name", zip_path.stem)
-            target_dir = self.output_dir / theme_name
-
-            if target_dir.exists():
-                shutil.rmtree(target_dir)
-
-            shutil.copytree(theme_dir, target_dir)
-            return theme_name 
\ No newline at end of file
+    async def import_theme(
+        self, source: Union[Path, BinaryIO], default_name: Optional[str] = None
+    ) -> Optional[str]:
+        """导入主题压缩包（文件路径或上传的文件对象），返回主题名称"""
+        result = await run_io(import_archive, source, self.output_dir, default_name)
+        if result is None:
+            return None
+        await run_io(self.asset_store.ingest_tree, result.path)
+        return result.name
@@ -0,0 +1,195 @@
+"""
+主题批量验证
+在进程池中并发验证主题目录或主题压缩包，验证结果按文件清单哈希缓存，
+未变化的主题不会重复检查；结果在各个主题验证完成时逐个产出。
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+
+from ..config import get_settings
+from .executor import run_io
+from .sync import iter_files
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+settings = get_settings()
+
+REQUIRED_FILES = ["skin.json", "webkit.css"]
+REQUIRED_FIELDS = ["name", "author", "version"]
+
+
+def _check_config(config: Any) -> List[str]:
+    if not isinstance(config, dict):
+        return ["skin.json 必须是JSON对象"]
+    return [
+        f"skin.json 缺少字段: {field}" for field in REQUIRED_FIELDS if field not in config
+    ]
+
+
+def check_theme_dir(path: str) -> Dict[str, Any]:
+    """验证主题目录，返回验证结果（在工作进程中执行）"""
+    theme_path = Path(path)
+    errors = []
+    if not theme_path.is_dir():
+        return {"path": path, "valid": False, "errors": ["主题目录不存在"]}
+
+    for file in REQUIRED_FILES:
+        if not (theme_path / file).exists():
+            errors.append(f"缺少必需文件: {file}")
+
+    config = None
+    if (theme_path / "skin.json").exists():
+        try:
+            with (theme_path / "skin.json").open("r", encoding="utf-8") as f:
+                config = json.load(f)
+            errors.extend(_check_config(config))
+        except (ValueError, OSError) as e:
+            errors.append(f"skin.json 无效: {e}")
+
+    return {
+        "path": path,
+        "name": config.get("name") if isinstance(config, dict) else None,
+        "valid": not errors,
+        "errors": errors,
+    }
+
+
+def check_theme_zip(path: str) -> Dict[str, Any]:
+    """验证主题压缩包，只读取中央目录和 skin.json（在工作进程中执行）"""
+    errors = []
+    config = None
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if not name.endswith("/")]
+            configs = sorted(
+                (name for name in names if PurePosixPath(name).name == "skin.json"),
+                key=lambda name: name.count("/"),
+            )
+            if not configs:
+                errors.append("缺少必需文件: skin.json")
+            else:
+                root = PurePosixPath(configs[0]).parent
+                for file in REQUIRED_FILES:
+                    if (root / file).as_posix() not in names:
+                        errors.append(f"缺少必需文件: {file}")
+                try:
+                    config = json.loads(archive.read(configs[0]).decode("utf-8"))
+                    errors.extend(_check_config(config))
+                except ValueError as e:
+                    errors.append(f"skin.json 无效: {e}")
+    except (zipfile.BadZipFile, OSError) as e:
+        errors.append(f"无效的压缩包: {e}")
+
+    return {
+        "path": path,
+        "name": config.get("name") if isinstance(config, dict) else None,
+        "valid": not errors,
+        "errors": errors,
+    }
+
+
+def manifest_key(path: Path) -> Optional[str]:
+    """根据文件清单（相对路径、大小、修改时间）计算缓存键，不读取文件内容"""
+    digest = hashlib.sha256()
+    try:
+        if path.is_dir():
+            for rel_path, entry in sorted(iter_files(path), key=lambda item: item[0]):
+                stat = entry.stat()
+                digest.update(
+                    f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8")
+                )
+        else:
+            stat = path.stat()
+            digest.update(f"{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class ThemeValidator:
+    def __init__(self, max_workers: Optional[int] = None, cache_size: int = 1024):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._pool: Optional["ProcessPoolExecutor"] = None
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self) -> "ProcessPoolExecutor":
+        with self._lock:
+            if self._pool is None:
+                # 进程池模块只在第一次批量验证时加载
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return result
+
+    def _cache_put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def validate_many(self, paths: List[Path]) -> AsyncIterator[Dict[str, Any]]:
+        """并发验证多个主题目录或压缩包，按完成顺序产出结果"""
+        loop = asyncio.get_running_loop()
+        keys = await run_io(lambda: [manifest_key(path) for path in paths])
+
+        key_by_path = {str(path): key for path, key in zip(paths, keys)}
+        pending = []
+        for path, key in zip(paths, keys):
+            cached = self._cache_get(f"{path}\0{key}") if key else None
+            if cached is not None:
+                yield dict(cached, cached=True)
+                continue
+
+            check = (
+                check_theme_zip if path.suffix.lower() == ".zip" else check_theme_dir
+            )
+            pending.append(loop.run_in_executor(self._get_pool(), check, str(path)))
+
+        for future in asyncio.as_completed(pending):
+            result = await future
+            key = key_by_path[result["path"]]
+            if key:
+                self._cache_put(f"{result['path']}\0{key}", result)
+            yield dict(result, cached=False)
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存命中统计"""
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+theme_validator = ThemeValidator(settings.VALIDATION_WORKERS)
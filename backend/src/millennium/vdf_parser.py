@@ -1,52 +1,289 @@
 """
-简单的VDF（Valve Data Format）解析器
+VDF（Valve Data Format）解析器
 用于读取和修改Steam配置文件
+
+基于单遍扫描的分词器实现，支持带引号/不带引号的记号、转义字符、
+// 注释以及 [$WIN32] 形式的条件标记。除了构建完整字典的 parse 之外，
+还提供 iter_events 以生成器方式逐条产出 (path, key, value) 事件，
+用于扫描 localconfig.vdf 这类体积很大的文件而无需构建完整字典。
 """
 
+import mmap
 import re
-from typing import Dict, Any, Optional
+from pathlib import Path
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Set, Tuple, Union
+
+# 记号类型
+TOKEN_STRING = "string"
+TOKEN_OPEN = "open"
+TOKEN_CLOSE = "close"
+TOKEN_CONDITION = "condition"
+
+_TOKEN_PATTERN = r"""
+    \s*
+    (?:
+        //[^\n]*                          # 注释
+      | "(?P<quoted>(?:[^"\\]|\\.)*)"     # 带引号的字符串
+      | (?P<open>\{)
+      | (?P<close>\})
+      | \[(?P<condition>[^\]\n]*)\]       # 条件标记
+      | (?P<bare>[^\s{}"\[\]]+)           # 不带引号的字符串
+    )
+"""
+_TOKEN_RE = re.compile(_TOKEN_PATTERN, re.VERBOSE | re.DOTALL)
+_TOKEN_RE_BYTES = re.compile(_TOKEN_PATTERN.encode("utf-8"), re.VERBOSE | re.DOTALL)
+
+_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", '"': '"'}
+_UNESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+
+
+class VDFToken(NamedTuple):
+    """分词结果，start/end 为记号在源文本中的偏移"""
+
+    type: str
+    value: str
+    start: int
+    end: int
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return _UNESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(0)), value)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\t", "\\t")
+    )
+
+
+def tokenize(content: Union[str, bytes, mmap.mmap]) -> Iterator[VDFToken]:
+    """单遍扫描VDF内容并逐个产出记号
+
+    content 可以是 str，也可以是 bytes/mmap（按UTF-8解码每个记号），
+    后者允许在不把整个文件读入内存的情况下扫描大文件。
+    """
+    is_text = isinstance(content, str)
+    pattern = _TOKEN_RE if is_text else _TOKEN_RE_BYTES
+    match = pattern.match
+    length = len(content)
+    pos = 0
+
+    while pos < length:
+        m = match(content, pos)
+        if m is None:
+            if not content[pos : pos + 64].strip():
+                # 只剩空白，继续向后确认
+                pos += 64
+                continue
+            raise ValueError(f"VDF语法错误: 位置 {pos} 处无法识别的内容")
+        pos = m.end()
+
+        kind = m.lastgroup
+        if kind is None:
+            # 注释或末尾空白
+            continue
+        start, end = m.span(kind)
+        if kind == "quoted":
+            value = m.group(kind)
+            if not is_text:
+                value = value.decode("utf-8")
+            # 偏移包含两侧引号
+            yield VDFToken(TOKEN_STRING, _unescape(value), start - 1, end + 1)
+        elif kind == "bare":
+            value = m.group(kind)
+            if not is_text:
+                value = value.decode("utf-8")
+            yield VDFToken(TOKEN_STRING, value, start, end)
+        elif kind == "open":
+            yield VDFToken(TOKEN_OPEN, "{", start, end)
+        elif kind == "close":
+            yield VDFToken(TOKEN_CLOSE, "}", start, end)
+        else:
+            value = m.group(kind)
+            if not is_text:
+                value = value.decode("utf-8")
+            yield VDFToken(TOKEN_CONDITION, value.strip(), start - 1, end + 1)
+
+
+def evaluate_condition(expression: str, conditions: Set[str]) -> bool:
+    """计算条件表达式，例如 $WIN32、!$OSX、$WIN32||$LINUX"""
+    for alternative in expression.split("||"):
+        satisfied = True
+        for term in alternative.split("&&"):
+            term = term.strip()
+            negate = term.startswith("!")
+            name = term.lstrip("!").lstrip("$")
+            if (name in conditions) == negate:
+                satisfied = False
+                break
+        if satisfied:
+            return True
+    return False
+
+
+# libraryconfig.vdf 中主题设置的位置
+THEME_SETTINGS_PATH = ("libraryconfig", "settings")
+THEME_KEY = "SteamTheme"
+
+# 结构事件类型
+EVENT_ENTER = "enter"
+EVENT_LEAVE = "leave"
+EVENT_VALUE = "value"
+
+
+def _walk(
+    tokens: Iterator[VDFToken], conditions: Optional[Set[str]] = None
+) -> Iterator[Tuple[str, Optional[VDFToken], Optional[VDFToken]]]:
+    """把记号流转换为结构事件 (kind, key_token, value_token)
+
+    conditions 为 None 时忽略所有条件标记；否则条件不满足的条目被跳过。
+    根级别不带键的 { } 块被视为透明块，其内容归属于外层。
+    """
+    depth = 0
+    skip_depth = 0  # 大于0时表示正在跳过一个条件不满足的块
+    skip_next_block = False
+    pending_key: Optional[VDFToken] = None
+    pending_value: Optional[VDFToken] = None
+    pending_block = False
+    anonymous = []  # 记录每一层是否为透明块
+
+    def flush():
+        nonlocal pending_key, pending_value
+        if pending_key is not None and pending_value is not None:
+            event = (EVENT_VALUE, pending_key, pending_value)
+            pending_key = pending_value = None
+            return event
+        return None
+
+    for token in tokens:
+        if skip_depth:
+            if token.type == TOKEN_OPEN:
+                skip_depth += 1
+            elif token.type == TOKEN_CLOSE:
+                skip_depth -= 1
+            continue
+
+        if token.type == TOKEN_CONDITION:
+            if pending_block:
+                # "key" [$COND] { ... } 形式，条件作用于整个块
+                if conditions is not None and not evaluate_condition(
+                    token.value, conditions
+                ):
+                    pending_key = None
+                    pending_block = False
+                    skip_next_block = True  # 跳过随后的 { ... }
+                continue
+            if pending_value is not None:
+                if conditions is not None and not evaluate_condition(
+                    token.value, conditions
+                ):
+                    pending_key = pending_value = None
+                continue
+            continue
+
+        event = flush()
+        if event:
+            yield event
+
+        if skip_next_block:
+            skip_next_block = False
+            if token.type == TOKEN_OPEN:
+                skip_depth = 1
+                continue
+
+        if token.type == TOKEN_STRING:
+            if pending_key is None:
+                pending_key = token
+                pending_block = True
+            else:
+                pending_value = token
+                pending_block = False
+        elif token.type == TOKEN_OPEN:
+            if pending_key is None:
+                anonymous.append(True)
+            else:
+                anonymous.append(False)
+                yield (EVENT_ENTER, pending_key, None)
+                pending_key = None
+            pending_block = False
+            depth += 1
+        elif token.type == TOKEN_CLOSE:
+            if pending_key is not None:
+                raise ValueError(f"VDF语法错误: 键 '{pending_key.value}' 缺少值")
+            if depth == 0:
+                raise ValueError(f"VDF语法错误: 位置 {token.start} 处多余的 '}}'")
+            depth -= 1
+            if not anonymous.pop():
+                yield (EVENT_LEAVE, None, token)
+
+    event = flush()
+    if event:
+        yield event
+    if pending_key is not None:
+        raise ValueError(f"VDF语法错误: 键 '{pending_key.value}' 缺少值")
+    if depth:
+        raise ValueError("VDF语法错误: 缺少 '}'")
+
+
+def iter_events(
+    content: Union[str, bytes, mmap.mmap], conditions: Optional[Set[str]] = None
+) -> Iterator[Tuple[Tuple[str, ...], str, str]]:
+    """以生成器方式逐条产出 (path, key, value) 事件，不构建完整字典"""
+    path: list = []
+    for kind, key, value in _walk(tokenize(content), conditions):
+        if kind == EVENT_VALUE:
+            yield tuple(path), key.value, value.value
+        elif kind == EVENT_ENTER:
+            path.append(key.value)
+        else:
+            path.pop()
+
+
+def iter_file_events(
+    path: Path, conditions: Optional[Set[str]] = None
+) -> Iterator[Tuple[Tuple[str, ...], str, str]]:
+    """通过内存映射流式扫描VDF文件"""
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_events(mm, conditions)
+
 
 class VDFParser:
-    def __init__(self):
+    def __init__(self, conditions: Optional[Set[str]] = None):
         self.indent = "  "
         self.current_indent = 0
+        self.conditions = conditions
 
     def parse(self, content: str) -> dict:
         """解析VDF格式的内容为字典"""
-        lines = content.strip().split("\n")
-        result = {}
-        stack = [(result, 0)]
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        result: Dict[str, Any] = {}
+        stack = [result]
 
-            # 计算当前行的缩进级别
-            indent_level = (len(line) - len(line.lstrip())) // 2
-            line = line.strip()
-
-            # 处理键值对
-            if line.startswith('"') and line.endswith('"'):
-                # 单行键值对
-                key = line.strip('"')
-                current_dict = stack[-1][0]
-                current_dict[key] = {}
-            elif line.startswith('"'):
-                # 键值对开始
-                key = line.strip('"')
-                value = {}
-                current_dict = stack[-1][0]
-                current_dict[key] = value
-                stack.append((value, indent_level))
-            elif line == "{":
-                continue
-            elif line == "}":
-                if stack:
-                    stack.pop()
+        for kind, key, value in _walk(tokenize(content), self.conditions):
+            if kind == EVENT_VALUE:
+                stack[-1][key.value] = value.value
+            elif kind == EVENT_ENTER:
+                child = stack[-1].get(key.value)
+                if not isinstance(child, dict):
+                    child = {}
+                    stack[-1][key.value] = child
+                stack.append(child)
+            else:
+                stack.pop()
 
         return result
 
+    def iter_events(self, content: str) -> Iterator[Tuple[Tuple[str, ...], str, str]]:
+        """流式产出 (path, key, value) 事件"""
+        return iter_events(content, self.conditions)
+
     def format(self, data: dict, indent_level: int = 0) -> str:
         """将字典格式化为VDF格式的字符串"""
         result = []
@@ -54,39 +291,123 @@ class VDFParser:
 
         for key, value in data.items():
             if isinstance(value, dict):
-                result.append(f'{indent}"{key}"')
+                result.append(f'{indent}"{_escape(key)}"')
                 result.append(f"{indent}{{")
-                result.append(self.format(value, indent_level + 1))
+                if value:
+                    result.append(self.format(value, indent_level + 1))
                 result.append(f"{indent}}}")
             else:
-                result.append(f'{indent}"{key}" "{value}"')
+                result.append(f'{indent}"{_escape(key)}" "{_escape(str(value))}"')
 
         return "\n".join(result)
 
+    def patch_value(
+        self, content: str, path: Tuple[str, ...], key: str, value: str
+    ) -> str:
+        """就地修改 path 下 key 的值，文件其余部分保持逐字节不变
+
+        解析时记录记号偏移，只替换目标值所在的区间；若键或所在的块不存在，
+        则在最深的已有块末尾插入最少的缺失结构。
+        """
+        target = tuple(path)
+        stack: list = []
+        found: Optional[VDFToken] = None
+        closes: Dict[Tuple[str, ...], VDFToken] = {}
+        # 每个块最后一个子条目的 (键起始, 键结束, 值起始) 偏移，用于沿用原有缩进和分隔符
+        child_layout: Dict[Tuple[str, ...], Tuple[int, int, int]] = {}
+
+        for kind, key_token, value_token in _walk(tokenize(content), self.conditions):
+            current = tuple(stack)
+            if kind == EVENT_VALUE:
+                child_layout[current] = (
+                    key_token.start,
+                    key_token.end,
+                    value_token.start,
+                )
+                if current == target and key_token.value == key:
+                    found = value_token
+            elif kind == EVENT_ENTER:
+                child_layout.setdefault(current, (key_token.start, key_token.end, -1))
+                stack.append(key_token.value)
+            else:
+                closes[current] = value_token
+                stack.pop()
+
+        quoted = f'"{_escape(value)}"'
+        if found is not None:
+            if content[found.start : found.end] == quoted:
+                return content
+            return content[: found.start] + quoted + content[found.end :]
+
+        newline = "\r\n" if "\r\n" in content else "\n"
+
+        # 找到已存在的最深的块
+        depth = len(target)
+        while depth and target[:depth] not in closes:
+            depth -= 1
+
+        if depth == 0:
+            insert_at = len(content.rstrip())
+            prefix = newline if insert_at else ""
+            indent = ""
+            separator = " "
+            unit = self.indent
+        else:
+            close = closes[target[:depth]]
+            line_start = content.rfind("\n", 0, close.start) + 1
+            brace_indent = content[line_start : close.start]
+            if brace_indent.strip():
+                # 右括号前还有其他内容，另起一行插入
+                insert_at = close.start
+                prefix = newline
+                brace_indent = ""
+            else:
+                insert_at = line_start
+                prefix = ""
+            unit = "\t" if "\t" in brace_indent else self.indent
+            indent = brace_indent + unit
+            separator = " "
+            layout = child_layout.get(target[:depth])
+            if layout:
+                key_start, key_end, value_start = layout
+                sibling_start = content.rfind("\n", 0, key_start) + 1
+                sibling_indent = content[sibling_start:key_start]
+                if not sibling_indent.strip():
+                    indent = sibling_indent
+                    unit = "\t" if "\t" in sibling_indent else unit
+                if value_start >= 0:
+                    between = content[key_end:value_start]
+                    if between and not between.strip() and "\n" not in between:
+                        separator = between
+
+        lines = []
+        for name in target[depth:]:
+            lines.append(f'{indent}"{_escape(name)}"')
+            lines.append(f"{indent}{{")
+            indent += unit
+        lines.append(f'{indent}"{_escape(key)}"{separator}{quoted}')
+        for _ in target[depth:]:
+            indent = indent[: -len(unit)]
+            lines.append(f"{indent}}}")
+
+        insertion = prefix + newline.join(lines) + newline
+        if depth == 0:
+            return content[:insert_at] + insertion + content[insert_at:].lstrip()
+        return content[:insert_at] + insertion + content[insert_at:]
+
     def update_theme_config(self, content: str, theme_name: str) -> str:
-        """更新VDF配置中的主题设置"""
+        """更新VDF配置中的主题设置，只改写 SteamTheme 的值"""
         try:
-            data = self.parse(content)
-            
-            # 确保基本结构存在
-            if "libraryconfig" not in data:
-                data["libraryconfig"] = {}
-            if "settings" not in data["libraryconfig"]:
-                data["libraryconfig"]["settings"] = {}
-            
-            # 更新主题设置
-            data["libraryconfig"]["settings"]["SteamTheme"] = theme_name
-            
-            # 格式化回VDF格式
-            return self.format(data)
-            
+            return self.patch_value(content, THEME_SETTINGS_PATH, THEME_KEY, theme_name)
         except Exception as e:
             raise ValueError(f"更新VDF配置失败: {str(e)}")
 
     def get_current_theme(self, content: str) -> str:
         """获取当前主题名称"""
         try:
-            data = self.parse(content)
-            return data.get("libraryconfig", {}).get("settings", {}).get("SteamTheme", "")
+            for path, key, value in self.iter_events(content):
+                if path == THEME_SETTINGS_PATH and key == THEME_KEY:
+                    return value
+            return ""
         except Exception:
-            return ""
\ No newline at end of file
+            return ""
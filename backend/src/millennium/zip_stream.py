@@ -0,0 +1,385 @@
+"""
+流式ZIP写入
+边读取边压缩地生成ZIP数据，不需要先在磁盘上写出完整的压缩包，可以直接作为
+StreamingResponse 的内容。多个文件在线程池中并发压缩（zlib 压缩时释放GIL），
+按原顺序输出；每个文件最多缓存几个数据块，内存占用与主题大小无关。
+
+PNG、WOFF2 等已经压缩过的文件以存储（不压缩）方式写入。压缩的文件大小和CRC在
+数据之后的数据描述符中给出；存储的文件预先计算CRC，本地文件头中就带有大小，
+便于按顺序读取的解压工具处理。压缩包超过4GB或文件数超过65535时写入ZIP64结尾记录。
+"""
+
+import asyncio
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, Deque, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..config import get_settings
+
+settings = get_settings()
+
+STORED = 0
+DEFLATED = 8
+
+# 已经压缩过的格式，再次压缩几乎没有收益
+STORED_EXTENSIONS = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".ico",
+    ".woff",
+    ".woff2",
+    ".zip",
+    ".gz",
+    ".7z",
+    ".mp3",
+    ".ogg",
+    ".mp4",
+    ".webm",
+}
+
+QUEUE_CHUNKS = 4  # 每个文件最多缓存的数据块数量
+
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_OFFSET = struct.Struct("<HHQ")
+_ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+
+class ZipMember(NamedTuple):
+    name: str  # 压缩包中的路径
+    path: Optional[Path] = None  # 从文件读取
+    data: Optional[bytes] = None  # 或使用内存中的内容
+    compress: Optional[bool] = None  # 为空时按扩展名决定
+
+
+class _Entry(NamedTuple):
+    name: bytes
+    flags: int
+    method: int
+    dos_time: int
+    dos_date: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+
+
+class _Stored(NamedTuple):
+    crc: int
+    size: int
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def should_compress(name: str) -> bool:
+    """根据扩展名判断文件是否值得压缩"""
+    return PurePosixPath(name).suffix.lower() not in STORED_EXTENSIONS
+
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+def _iter_blocks(member: ZipMember, chunk_size: int) -> Iterable[bytes]:
+    if member.data is not None:
+        for start in range(0, len(member.data), chunk_size):
+            yield member.data[start : start + chunk_size]
+        return
+    with member.path.open("rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                return
+            yield block
+
+
+class _MemberJob:
+    """在工作线程中读取并压缩一个文件，数据块通过有界队列交给事件循环"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, cancelled: threading.Event):
+        self.loop = loop
+        self.cancelled = cancelled
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.slots = threading.Semaphore(QUEUE_CHUNKS)
+        self.future: Optional[asyncio.Future] = None
+
+    def put(self, item) -> None:
+        while not self.slots.acquire(timeout=0.1):
+            if self.cancelled.is_set():
+                raise _Cancelled()
+        if self.cancelled.is_set():
+            raise _Cancelled()
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    async def get(self):
+        item = await self.queue.get()
+        if item is not None:
+            self.slots.release()
+        return item
+
+    def run(
+        self, member: ZipMember, method: int, chunk_size: int, level: int
+    ) -> Tuple[int, int, int]:
+        try:
+            return self._run(member, method, chunk_size, level)
+        finally:
+            # 结束标记不占用队列位置，出错时也能唤醒等待的消费者
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    def _run(
+        self, member: ZipMember, method: int, chunk_size: int, level: int
+    ) -> Tuple[int, int, int]:
+        if method == STORED:
+            # 存储的文件先计算CRC，本地文件头中直接写入大小
+            crc, size = 0, 0
+            for block in _iter_blocks(member, chunk_size):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+            if size > _MAX_32:
+                raise ValueError(f"文件过大: {member.name}")
+            self.put(_Stored(crc, size))
+
+        compressor = (
+            zlib.compressobj(level, zlib.DEFLATED, -15) if method == DEFLATED else None
+        )
+        crc, size, compressed_size = 0, 0, 0
+        for block in _iter_blocks(member, chunk_size):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            if compressor is not None:
+                block = compressor.compress(block)
+            if block:
+                compressed_size += len(block)
+                self.put(block)
+        if compressor is not None:
+            block = compressor.flush()
+            compressed_size += len(block)
+            self.put(block)
+        if size > _MAX_32 or compressed_size > _MAX_32:
+            raise ValueError(f"文件过大: {member.name}")
+        return crc, size, compressed_size
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_WORKERS, thread_name_prefix="millennium-zip"
+            )
+        return _pool
+
+
+def _central_directory(entries: List[_Entry], offset: int) -> bytes:
+    parts = []
+    for entry in entries:
+        extra = b""
+        entry_offset = entry.offset
+        version = 20
+        if entry.offset > _MAX_32:
+            extra = _ZIP64_OFFSET.pack(0x0001, 8, entry.offset)
+            entry_offset = _MAX_32
+            version = 45
+        parts.append(
+            _CENTRAL.pack(
+                0x02014B50,
+                (3 << 8) | version,
+                version,
+                entry.flags,
+                entry.method,
+                entry.dos_time,
+                entry.dos_date,
+                entry.crc,
+                entry.compressed_size,
+                entry.size,
+                len(entry.name),
+                len(extra),
+                0,
+                0,
+                0,
+                0o100644 << 16,
+                entry_offset,
+            )
+        )
+        parts.append(entry.name)
+        parts.append(extra)
+    directory = b"".join(parts)
+
+    end = b""
+    count = len(entries)
+    if count > _MAX_16 or offset > _MAX_32 or len(directory) > _MAX_32:
+        zip64_offset = offset + len(directory)
+        end += _ZIP64_END.pack(
+            0x06064B50, 44, 45, 45, 0, 0, count, count, len(directory), offset
+        )
+        end += _ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_offset, 1)
+    end += _END.pack(
+        0x06054B50,
+        0,
+        0,
+        min(count, _MAX_16),
+        min(count, _MAX_16),
+        min(len(directory), _MAX_32),
+        min(offset, _MAX_32),
+        0,
+    )
+    return directory + end
+
+
+def _discard_result(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+async def stream_zip(
+    members: Iterable[ZipMember],
+    concurrency: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    level: int = 6,
+) -> AsyncIterator[bytes]:
+    """按顺序产出ZIP数据，最多同时压缩 concurrency 个文件"""
+    loop = asyncio.get_running_loop()
+    concurrency = concurrency or settings.EXPORT_WORKERS
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    cancelled = threading.Event()
+    pending = iter(members)
+    jobs: Deque[Tuple[ZipMember, int, _MemberJob]] = deque()
+    current: Optional[_MemberJob] = None
+
+    def start_next() -> None:
+        member = next(pending, None)
+        if member is None:
+            return
+        compress = (
+            member.compress
+            if member.compress is not None
+            else should_compress(member.name)
+        )
+        method = DEFLATED if compress else STORED
+        job = _MemberJob(loop, cancelled)
+        job.future = loop.run_in_executor(
+            _get_pool(), job.run, member, method, chunk_size, level
+        )
+        jobs.append((member, method, job))
+
+    entries: List[_Entry] = []
+    offset = 0
+    try:
+        for _ in range(concurrency):
+            start_next()
+        while jobs:
+            member, method, job = jobs.popleft()
+            current = job
+            start_next()
+
+            if member.path is not None:
+                dos_time, dos_date = _dos_datetime(member.path.stat().st_mtime)
+            else:
+                dos_time, dos_date = _dos_datetime(time.time())
+            name = member.name.encode("utf-8")
+            flags = _FLAG_UTF8
+
+            known = None
+            if method == STORED:
+                known = await job.get()
+                if known is None:
+                    await job.future  # 读取失败，抛出工作线程中的异常
+                header = _LOCAL.pack(
+                    0x04034B50,
+                    20,
+                    flags,
+                    method,
+                    dos_time,
+                    dos_date,
+                    known.crc,
+                    known.size,
+                    known.size,
+                    len(name),
+                    0,
+                )
+            else:
+                flags |= _FLAG_DESCRIPTOR
+                header = _LOCAL.pack(
+                    0x04034B50,
+                    20,
+                    flags,
+                    method,
+                    dos_time,
+                    dos_date,
+                    0,
+                    0,
+                    0,
+                    len(name),
+                    0,
+                )
+            yield header + name
+
+            while True:
+                block = await job.get()
+                if block is None:
+                    break
+                yield block
+            crc, size, compressed_size = await job.future
+
+            if known is not None and (known.crc, known.size) != (crc, size):
+                raise RuntimeError(f"文件在导出过程中被修改: {member.name}")
+            if method == DEFLATED:
+                yield _DESCRIPTOR.pack(0x08074B50, crc, compressed_size, size)
+
+            entries.append(
+                _Entry(
+                    name,
+                    flags,
+                    method,
+                    dos_time,
+                    dos_date,
+                    crc,
+                    compressed_size,
+                    size,
+                    offset,
+                )
+            )
+            offset += len(header) + len(name) + compressed_size
+            if method == DEFLATED:
+                offset += _DESCRIPTOR.size
+
+        yield _central_directory(entries, offset)
+    finally:
+        # 客户端断开或出错时停止仍在运行的工作线程
+        cancelled.set()
+        remaining = [job for _, _, job in jobs]
+        if current is not None:
+            remaining.append(current)
+        for job in remaining:
+            if not job.future.done():
+                job.future.cancel()
+            job.future.add_done_callback(_discard_result)
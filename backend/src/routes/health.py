@@ -1,10 +1,14 @@
-from fastapi import APIRouter
-from typing import Dict
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request, Response
+
 from ..config import get_settings
+from ..millennium.executor import io_executor
 
 router = APIRouter(prefix="/health", tags=["health"])
 settings = get_settings()
 
+
 @router.get("")
 async def health_check() -> Dict[str, str]:
     """
@@ -15,13 +19,35 @@ async def health_check() -> Dict[str, str]:
         "status": "ok",
         "app_name": settings.APP_NAME,
         "version": settings.APP_VERSION,
-        "environment": "development" if settings.DEBUG else "production"
+        "environment": "development" if settings.DEBUG else "production",
     }
 
+
 @router.get("/ping")
 async def ping() -> Dict[str, str]:
     """
     简单的ping测试
     用于验证API是否响应
     """
-    return {"ping": "pong"} 
\ No newline at end of file
+    return {"ping": "pong"}
+
+
+@router.get("/io")
+async def io_stats() -> Dict[str, Any]:
+    """
+    文件I/O线程池状态
+    返回排队深度以及等待/执行耗时
+    """
+    return io_executor.stats()
+
+
+@router.get("/ready")
+async def readiness(request: Request, response: Response) -> Dict[str, Any]:
+    """
+    就绪检查
+    启动完成前返回503，同时返回各启动阶段的耗时
+    """
+    startup_report = request.app.state.startup_report
+    if not startup_report.ready:
+        response.status_code = 503
+    return startup_report.as_dict()
@@ -1,22 +1,57 @@
-from fastapi import APIRouter, WebSocket, HTTPException, Depends
+import json
+import zipfile
 from pathlib import Path
-from typing import List, Dict, Any
-from ..millennium.core import MillenniumCore
-from ..millennium.preview import ThemePreview
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    HTTPException,
+    Response,
+    UploadFile,
+    WebSocket,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from ..config import get_settings
+from ..crud import files as files_crud
+from ..crud import themes as themes_crud
+from ..database import get_db, get_sessionmaker
+from ..millennium.bulk_import import STATUS_HASHED, STATUS_IMPORTED
+from ..millennium.cache import parse_cache
+from ..millennium.core import MillenniumCore, get_core
+from ..millennium.css_build import css_builder
+from ..millennium.delta_package import DeltaBaseMismatch
+from ..millennium.devtools import get_devtools_transport
+from ..millennium.executor import run_io
+from ..millennium.importer import ArchiveLimitError
+from ..millennium.preview_pool import PreviewPool
+from ..millennium.zip_stream import stream_zip
+from ..schemas import ThemeCreate
 
 router = APIRouter(prefix="/api/millennium")
-core = MillenniumCore()
-preview_manager = None
+settings = get_settings()
+preview_pool: Optional[PreviewPool] = None
+
+
+def get_preview_pool() -> Optional[PreviewPool]:
+    global preview_pool
+    core = get_core()
+    if preview_pool is None and core.steam_path:
+        preview_pool = PreviewPool(
+            core.steam_path,
+            max_sessions=settings.PREVIEW_MAX_SESSIONS,
+            idle_timeout=settings.PREVIEW_IDLE_TIMEOUT,
+        )
+    return preview_pool
 
-def get_preview_manager():
-    global preview_manager
-    if preview_manager is None and core.steam_path:
-        preview_manager = ThemePreview(core.steam_path)
-    return preview_manager
 
 @router.post("/initialize")
-async def initialize_millennium():
+async def initialize_millennium(core: MillenniumCore = Depends(get_core)):
     """初始化Millennium"""
     try:
         await core.initialize()
@@ -24,17 +59,40 @@ async def initialize_millennium():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
 @router.get("/themes")
-async def list_themes() -> List[Dict[str, Any]]:
-    """获取主题列表"""
+async def list_themes(
+    response: Response,
+    search: Optional[str] = None,
+    author: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    core: MillenniumCore = Depends(get_core),
+) -> List[Dict[str, Any]]:
+    """获取主题列表，支持搜索、排序和分页，匹配总数通过 X-Total-Count 返回"""
     try:
-        themes = await core.list_themes()
-        return themes
+        total, themes = await core.query_themes(
+            search=search,
+            author=author,
+            sort_by=sort,
+            descending=order == "desc",
+            offset=offset,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    response.headers["X-Total-Count"] = str(total)
+    return themes
+
 
 @router.post("/themes")
-async def create_theme(name: str, config: Dict[str, Any]):
+async def create_theme(
+    name: str, config: Dict[str, Any], core: MillenniumCore = Depends(get_core)
+):
     """创建新主题"""
     try:
         theme_path = await core.create_theme(name, config)
@@ -42,8 +100,164 @@ async def create_theme(name: str, config: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@router.post("/themes/validate")
+async def validate_themes(
+    paths: Optional[List[str]] = Body(None, embed=True),
+    core: MillenniumCore = Depends(get_core),
+):
+    """批量验证主题目录下的主题目录或主题压缩包，以NDJSON格式逐个返回结果；
+    路径不在主题目录下时返回400"""
+    theme_paths = None
+    if paths is not None:
+        try:
+            theme_paths = await core.resolve_theme_paths(paths)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        async for result in core.validate_themes(theme_paths):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _zip_response(members, file_name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_zip(members),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_name)}"
+        },
+    )
+
+
+@router.post("/themes/export")
+async def export_themes(
+    names: List[str] = Body(..., embed=True),
+    record: bool = Body(False, embed=True),
+    core: MillenniumCore = Depends(get_core),
+):
+    """批量导出主题到同一个ZIP流中，每个主题位于以其名称命名的目录中；
+    record 为真时记录导出的版本，之后可以相对于它导出增量包"""
+    try:
+        members = await core.archive_themes(names, record)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _zip_response(members, "themes.zip")
+
+
+@router.post("/themes/import")
+async def import_theme(
+    file: UploadFile = File(...), core: MillenniumCore = Depends(get_core)
+):
+    """导入上传的主题压缩包，超出大小、文件数量或压缩率限制时返回413"""
+    default_name = Path(file.filename).stem if file.filename else None
+    try:
+        theme_name = await core.import_theme(file.file, default_name)
+    except ArchiveLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "name": theme_name}
+
+
+@router.post("/themes/import/delta")
+async def import_theme_delta(
+    file: UploadFile = File(...),
+    fallback: Optional[UploadFile] = File(None),
+    core: MillenniumCore = Depends(get_core),
+):
+    """把上传的增量包应用到已安装的主题上；已安装的主题与增量包的基础版本不一致时导入
+    完整包 fallback，没有 fallback 时返回409和不一致的文件"""
+    try:
+        result = await core.import_theme_delta(
+            file.file, fallback.file if fallback else None
+        )
+    except DeltaBaseMismatch as e:
+        raise HTTPException(
+            status_code=409, detail={"message": str(e), "files": e.files}
+        )
+    except ArchiveLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", **result}
+
+
+def _theme_record(result: Dict[str, Any]) -> ThemeCreate:
+    config = result["config"]
+    description = config.get("description")
+    return ThemeCreate(
+        name=result["name"],
+        author=str(config.get("author") or ""),
+        version=str(config.get("version") or ""),
+        description=str(description) if description is not None else None,
+    )
+
+
+@router.post("/themes/import/bulk")
+async def import_themes(
+    paths: List[str] = Body(..., embed=True),
+    core: MillenniumCore = Depends(get_core),
+):
+    """批量导入服务器上导入目录中的主题压缩包（目录会展开为其中的 .zip 文件），以NDJSON
+    格式逐个返回进度；全部完成后在一个事务中把导入成功的主题写入数据库，最后一行为汇总。
+    路径不在导入目录下时返回400"""
+    try:
+        archive_paths = await core.resolve_import_paths(paths)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        counts: Dict[str, int] = {}
+        records = []
+        async for result in core.import_themes(archive_paths):
+            if result["status"] != STATUS_HASHED:
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] == STATUS_IMPORTED:
+                records.append(_theme_record(result))
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        summary: Dict[str, Any] = {
+            "status": "summary",
+            "counts": counts,
+            "registered": 0,
+        }
+        try:
+            async with get_sessionmaker()() as db:
+                summary["registered"] = await themes_crud.upsert_themes(db, records)
+        except Exception as e:
+            summary["error"] = f"写入数据库失败: {e}"
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/themes/{theme_name}/export")
+async def export_theme(
+    theme_name: str,
+    base: Optional[str] = None,
+    record: bool = False,
+    core: MillenniumCore = Depends(get_core),
+):
+    """以流的形式导出主题压缩包，边压缩边发送，不在服务器上生成临时文件；
+    record=1 时记录导出的版本，指定 base 时导出相对于该版本（之前记录过的 version）的增量包"""
+    try:
+        if base is None:
+            members = await core.archive_themes([theme_name], record)
+        else:
+            members = await core.archive_theme_delta(theme_name, base)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    file_name = (
+        f"{theme_name}.zip" if base is None else f"{theme_name}-delta-{base}.zip"
+    )
+    return _zip_response(members, file_name)
+
+
 @router.get("/themes/{theme_name}")
-async def get_theme(theme_name: str):
+async def get_theme(theme_name: str, core: MillenniumCore = Depends(get_core)):
     """获取主题信息"""
     try:
         theme = await core.get_theme(theme_name)
@@ -51,8 +265,11 @@ async def get_theme(theme_name: str):
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+
 @router.put("/themes/{theme_name}")
-async def update_theme(theme_name: str, config: Dict[str, Any]):
+async def update_theme(
+    theme_name: str, config: Dict[str, Any], core: MillenniumCore = Depends(get_core)
+):
     """更新主题"""
     try:
         await core.update_theme(theme_name, config)
@@ -60,64 +277,192 @@ async def update_theme(theme_name: str, config: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
 @router.delete("/themes/{theme_name}")
-async def delete_theme(theme_name: str):
+async def delete_theme(theme_name: str, core: MillenniumCore = Depends(get_core)):
     """删除主题"""
     try:
-        await core.delete_theme(theme_name)
-        return {"status": "success", "message": "主题删除成功"}
+        assets = await core.delete_theme(theme_name)
+        return {"status": "success", "message": "主题删除成功", "assets": assets}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
 @router.post("/themes/{theme_name}/apply")
-async def apply_theme(theme_name: str):
+async def apply_theme(theme_name: str, core: MillenniumCore = Depends(get_core)):
     """应用主题"""
     try:
         theme_path = core.themes_path / theme_name
-        await core.apply_theme(theme_path)
-        return {"status": "success", "message": "主题应用成功"}
+        stats = await core.apply_theme(theme_path)
+        return {"status": "success", "message": "主题应用成功", "sync": stats}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@router.get("/cache")
+async def get_cache_stats() -> Dict[str, int]:
+    """获取已解析文件缓存的命中统计"""
+    return parse_cache.stats()
+
+
+@router.get("/css-build")
+async def get_css_build_stats() -> Dict[str, Any]:
+    """获取CSS构建的累计构建次数和缓存命中次数"""
+    return css_builder.stats()
+
+
+@router.get("/assets")
+async def get_asset_stats(core: MillenniumCore = Depends(get_core)) -> Dict[str, Any]:
+    """获取共享资源存储的对象数量、去重率和回收的空间"""
+    return await run_io(core.asset_store.stats)
+
+
+@router.post("/assets/gc")
+async def collect_asset_garbage(
+    core: MillenniumCore = Depends(get_core),
+) -> Dict[str, int]:
+    """删除没有被任何主题引用的资源对象"""
+    return await run_io(core.asset_store.collect_garbage)
+
+
+async def refresh_db_css_index(core: MillenniumCore, db: AsyncSession) -> None:
+    """把数据库中CSS文件的变化同步到CSS索引，只读取 updated_at 变化的行的内容"""
+    versions = await files_crud.get_css_file_versions(db)
+    ids = {(theme, path): file_id for file_id, theme, path, _ in versions}
+    stale = core.css_index.stale_db_files(
+        {(theme, path): str(updated_at) for _, theme, path, updated_at in versions}
+    )
+    if not stale:
+        return
+    rows = await files_crud.get_theme_files_by_ids(db, [ids[name] for name in stale])
+    names = {file_id: name for name, file_id in ids.items()}
+    await run_io(
+        core.css_index.update_db_files,
+        [(*names[row.id], str(row.updated_at), row.content) for row in rows],
+    )
+
+
+@router.get("/search")
+async def search_css(
+    q: str,
+    kind: Optional[str] = None,
+    limit: Optional[int] = 100,
+    core: MillenniumCore = Depends(get_core),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """在所有主题（以及数据库中的主题文件）的CSS中查询选择器、自定义属性或 @import 目标；
+    kind 为 selector、property 或 import，q 支持 * 和 ? 通配符"""
+    try:
+        await refresh_db_css_index(core, db)
+        return await core.search_css(q, kind, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/apps/{app_id}")
+async def get_app_info(app_id: int, core: MillenniumCore = Depends(get_core)):
+    """获取Steam应用信息（读取appinfo.vdf）"""
+    try:
+        info = await run_io(core.get_app_info, app_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"应用 {app_id} 不存在")
+    return info
+
+
 @router.post("/themes/{theme_name}/preview")
-async def start_preview(theme_name: str):
-    """开始预览主题"""
-    preview = get_preview_manager()
-    if not preview:
+async def start_preview(
+    theme_name: str,
+    session: Optional[str] = None,
+    transport: Optional[str] = None,
+    core: MillenniumCore = Depends(get_core),
+):
+    """开始预览主题，不同会话的预览互不影响；transport 选择 file 或 devtools 预览方式"""
+    pool = get_preview_pool()
+    if not pool:
         raise HTTPException(status_code=500, detail="Steam未安装或预览服务未初始化")
 
     try:
+        preview = await pool.acquire(theme_name, session)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    try:
+        if transport:
+            preview.transport = transport
         theme_path = core.themes_path / theme_name
         await preview.preview_theme(theme_path)
-        return {"status": "success", "message": "预览开始"}
+        return {
+            "status": "success",
+            "message": "预览开始",
+            "warm": preview.warm,
+            "transport": preview.transport,
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
 @router.delete("/themes/{theme_name}/preview")
-async def stop_preview(theme_name: str):
-    """停止预览主题"""
-    preview = get_preview_manager()
+async def stop_preview(
+    theme_name: str, session: Optional[str] = None, close: bool = False
+):
+    """停止预览主题；close 为真时同时关闭会话并删除预览皮肤及其热备"""
+    pool = get_preview_pool()
+    preview = pool.get(theme_name, session) if pool else None
     if not preview:
         return {"status": "success", "message": "预览服务未运行"}
 
     try:
-        await preview.stop_preview()
+        if close:
+            await pool.release(theme_name, session)
+        else:
+            await preview.stop_preview()
         return {"status": "success", "message": "预览停止"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@router.get("/preview/stats")
+async def get_preview_stats() -> Dict[str, Any]:
+    """获取预览会话池状态、各会话的更新统计以及DevTools连接的往返耗时"""
+    pool = get_preview_pool()
+    if not pool:
+        return {"sessions": []}
+    await pool.expire_idle()
+    stats = pool.stats()
+    stats["devtools"] = get_devtools_transport().stats()
+    return stats
+
+
 @router.websocket("/themes/{theme_name}/preview/ws")
-async def preview_websocket(websocket: WebSocket, theme_name: str):
+async def preview_websocket(
+    websocket: WebSocket, theme_name: str, session: Optional[str] = None
+):
     """WebSocket连接用于实时预览"""
-    preview = get_preview_manager()
-    if not preview:
+    pool = get_preview_pool()
+    if not pool:
         await websocket.close(code=1000, reason="Steam未安装或预览服务未初始化")
         return
 
-    await websocket.accept()
     try:
+        preview = await pool.acquire(theme_name, session)
+    except RuntimeError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    # 同一会话只接受一个连接，后来的连接直接拒绝，不影响已有连接
+    if not preview.attach_websocket(websocket):
+        await websocket.close(code=1008, reason="该预览会话已有WebSocket连接")
+        return
+
+    try:
+        await websocket.accept()
         await preview.handle_websocket(websocket)
     except Exception as e:
         await websocket.close(code=1000, reason=str(e))
     finally:
-        await preview.stop_preview() 
\ No newline at end of file
+        # 只清理自己占用的连接
+        if preview.websocket is websocket:
+            await preview.stop_preview()
+            preview.websocket = None
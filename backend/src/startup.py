@@ -0,0 +1,57 @@
+"""
+启动耗时统计
+记录模块导入和 lifespan 中各个启动阶段的耗时，保存在 app.state 中，
+通过 /api/health/ready 查看。
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class StartupReport:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at: Optional[float] = None
+
+    def _record(self, name: str, duration: float) -> None:
+        self.phases.append({"name": name, "duration_ms": round(duration * 1000, 3)})
+
+    def mark(self, name: str) -> None:
+        """记录自上一次标记以来的耗时（用于模块导入阶段）"""
+        now = time.perf_counter()
+        self._record(name, now - self._last_mark)
+        self._last_mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._record(name, now - start)
+            self._last_mark = now
+
+    def mark_ready(self) -> None:
+        """标记应用已可以处理请求"""
+        self.ready_at = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """获取启动报告"""
+        total = (self.ready_at if self.ready else time.perf_counter()) - self.started_at
+        return {
+            "ready": self.ready,
+            "total_ms": round(total * 1000, 3),
+            "phases": list(self.phases),
+        }
+
+
+startup_report = StartupReport()
@@ -0,0 +1,91 @@
+import os
+import shutil
+
+from ..src.millennium.asset_store import AssetStore
+
+
+def make_theme(root, name, files):
+    theme = root / name
+    for rel_path, data in files.items():
+        (theme / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (theme / rel_path).write_bytes(data)
+    return theme
+
+
+def test_ingest_deduplicates_across_themes(tmp_path):
+    """测试相同内容的资源在主题之间只保存一份，CSS不进入存储"""
+    store = AssetStore(tmp_path / ".assets")
+    logo = os.urandom(4096)
+    first = make_theme(
+        tmp_path,
+        "a",
+        {"logo.png": logo, "fonts/x.woff2": b"font", "webkit.css": b"a{}"},
+    )
+    second = make_theme(tmp_path, "b", {"img/logo.png": logo, "webkit.css": b"a{}"})
+
+    assert store.ingest_tree(first)["stored"] == 2
+    stats = store.ingest_tree(second)
+    assert stats["deduplicated"] == 1 and stats["bytes_deduplicated"] == 4096
+    assert os.path.samefile(first / "logo.png", second / "img" / "logo.png")
+    assert not os.path.samefile(first / "webkit.css", second / "webkit.css")
+    assert (second / "img" / "logo.png").read_bytes() == logo
+    assert sorted(path.name for path in (second / "img").iterdir()) == ["logo.png"]
+
+    # 再次存入时已经是存储中的对象，不再计算哈希
+    assert store.ingest_tree(second)["deduplicated"] == 0
+    stats = store.stats()
+    assert stats["objects"] == 2 and stats["references"] == 3
+    assert stats["dedup_ratio"] == round((4096 * 2 + 4) / (4096 + 4), 3)
+
+
+def test_collect_garbage(tmp_path):
+    """测试删除主题后只回收不再被引用的对象"""
+    store = AssetStore(tmp_path / ".assets")
+    first = make_theme(tmp_path, "a", {"shared.png": b"shared", "own.png": b"own"})
+    second = make_theme(tmp_path, "b", {"shared.png": b"shared"})
+    store.ingest_tree(first)
+    store.ingest_tree(second)
+
+    shutil.rmtree(first)
+    assert store.collect_garbage() == {"removed": 1, "bytes_reclaimed": 3}
+    assert (second / "shared.png").read_bytes() == b"shared"
+
+    shutil.rmtree(second)
+    assert store.collect_garbage() == {"removed": 1, "bytes_reclaimed": 6}
+    stats = store.stats()
+    assert (
+        stats["objects"] == 0
+        and stats["bytes_reclaimed"] == 9
+        and stats["objects_collected"] == 2
+    )
+
+
+def test_objects_read_only_and_verified(tmp_path):
+    """测试对象设为只读，内容与名称不符的对象不会被链接到其他主题"""
+    store = AssetStore(tmp_path / ".assets")
+    first = make_theme(tmp_path, "a", {"logo.png": b"logo"})
+    store.ingest_tree(first)
+    if os.name != "nt":
+        assert (first / "logo.png").stat().st_mode & 0o777 == 0o444
+
+    os.chmod(first / "logo.png", 0o644)
+    (first / "logo.png").write_bytes(b"LOGO")  # 原地修改了对象
+    second = make_theme(tmp_path, "b", {"logo.png": b"logo"})
+    assert store.ingest_tree(second)["skipped"] == 1
+    assert (second / "logo.png").read_bytes() == b"logo"
+
+
+def test_stale_inode_cache(tmp_path):
+    """测试其他实例回收对象后，缓存中过期的inode不会被当作存储中的对象"""
+    store = AssetStore(tmp_path / ".assets")
+    first = make_theme(tmp_path, "a", {"logo.png": b"logo"})
+    store.ingest_tree(first)
+    digest = next(iter(store._inodes.values()))
+
+    shutil.rmtree(first)
+    assert AssetStore(tmp_path / ".assets").collect_garbage()["removed"] == 1
+    second = make_theme(tmp_path, "b", {"logo.png": b"logo"})
+    st = (second / "logo.png").stat()
+    store._inodes[(st.st_dev, st.st_ino)] = digest  # 模拟inode被新文件重用
+    assert store.ingest_tree(second)["stored"] == 1
+    assert store.stats()["objects"] == 1
@@ -0,0 +1,93 @@
+import struct
+
+from ..src.millennium.binary_vdf import (
+    APPINFO_MAGIC_V28,
+    APPINFO_MAGIC_V29,
+    AppInfoReader,
+    BinaryVDFParser,
+)
+
+
+def encode_kv(data, key_table=None):
+    """把字典编码为二进制VDF，仅用于构造测试数据"""
+    out = b""
+    for key, value in data.items():
+        if key_table is None:
+            encoded_key = key.encode() + b"\x00"
+        else:
+            if key not in key_table:
+                key_table.append(key)
+            encoded_key = struct.pack("<I", key_table.index(key))
+        if isinstance(value, dict):
+            out += b"\x00" + encoded_key + encode_kv(value, key_table) + b"\x08"
+        elif isinstance(value, int):
+            out += b"\x02" + encoded_key + struct.pack("<i", value)
+        else:
+            out += b"\x01" + encoded_key + value.encode() + b"\x00"
+    return out
+
+
+def build_appinfo(path, apps, magic):
+    key_table = [] if magic == APPINFO_MAGIC_V29 else None
+    entries = b""
+    for app_id, data in apps.items():
+        body = struct.pack(
+            "<IIQ20sI20s", 2, 1700000000, 0, b"\x01" * 20, 42, b"\x02" * 20
+        )
+        body += encode_kv({"appinfo": data}, key_table) + b"\x08"
+        entries += struct.pack("<II", app_id, len(body)) + body
+    entries += struct.pack("<I", 0)
+
+    if key_table is None:
+        content = struct.pack("<II", magic, 1) + entries
+    else:
+        table_offset = 16 + len(entries)
+        table = struct.pack("<I", len(key_table)) + b"".join(
+            k.encode() + b"\x00" for k in key_table
+        )
+        content = struct.pack("<IIq", magic, 1, table_offset) + entries + table
+    path.write_bytes(content)
+
+
+APPS = {
+    570: {"appid": 570, "common": {"name": "Dota 2", "type": "Game"}},
+    730: {"appid": 730, "common": {"name": "Counter-Strike 2", "type": "Game"}},
+}
+
+
+def test_appinfo_v28(tmp_path):
+    """测试appinfo.vdf v28的索引与惰性解码"""
+    path = tmp_path / "appinfo.vdf"
+    build_appinfo(path, APPS, APPINFO_MAGIC_V28)
+    with AppInfoReader(path) as reader:
+        assert reader.version == 28
+        assert sorted(reader.app_ids()) == [570, 730]
+        entry = reader[730]
+        assert entry["change_number"] == 42
+        assert entry["data"]["appinfo"]["common"]["name"] == "Counter-Strike 2"
+        assert reader.get(1) is None
+
+        # 释放映射后保留索引，读取时重新映射
+        reader.release()
+        assert reader[570]["data"]["appinfo"] == APPS[570]
+
+
+def test_appinfo_v29_key_table(tmp_path):
+    """测试appinfo.vdf v29的字符串表"""
+    path = tmp_path / "appinfo.vdf"
+    build_appinfo(path, APPS, APPINFO_MAGIC_V29)
+    with AppInfoReader(path) as reader:
+        assert reader.version == 29
+        assert reader[570]["data"]["appinfo"] == APPS[570]
+
+
+def test_shortcuts(tmp_path):
+    """测试shortcuts.vdf解析"""
+    shortcuts = {
+        "shortcuts": {
+            "0": {"appid": -123, "AppName": "My Game", "Exe": '"/usr/bin/game"'}
+        }
+    }
+    path = tmp_path / "shortcuts.vdf"
+    path.write_bytes(encode_kv(shortcuts) + b"\x08")
+    assert BinaryVDFParser().load(path) == shortcuts
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from ..src.millennium.build_graph import ThemeBuildGraph, split_imports
+from ..src.millennium.css_build import MODE_PASSTHROUGH, CSSBuilder
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def make_graph(tmp_path, mode=MODE_PASSTHROUGH):
+    return ThemeBuildGraph(
+        tmp_path / "theme", tmp_path / "templates", CSSBuilder(tmp_path / "cache", mode)
+    )
+
+
+def test_split_imports():
+    """测试拆分文件开头的 @import"""
+    imports, rest = split_imports(
+        '@charset "utf-8";\n/* c */ @import url("a.css");\n'
+        "@import 'b.css' screen;\na{}"
+    )
+    assert [(target, media) for _, target, media in imports] == [
+        ("a.css", ""),
+        ("b.css", "screen"),
+    ]
+    assert rest == "a{}"
+    assert split_imports("a{}\n@import 'late.css';") == ([], "a{}\n@import 'late.css';")
+
+
+def test_imports_and_templates(tmp_path):
+    """测试内联 @import 以及模板继承"""
+    write(
+        tmp_path / "templates" / "base" / "webkit.css",
+        "@import 'shared/colors.css';\n.base{}",
+    )
+    write(
+        tmp_path / "templates" / "base" / "shared" / "colors.css", ":root{--accent:red}"
+    )
+    write(tmp_path / "templates" / "base" / "friends.custom.css", ".friends{}")
+    write(
+        tmp_path / "theme" / "skin.json", json.dumps({"name": "t", "template": "base"})
+    )
+    # 导入与自身同名的文件时导入模板中的版本
+    write(
+        tmp_path / "theme" / "webkit.css",
+        "@import 'webkit.css';\n@import url(https://x/y.css);\n.theme{}",
+    )
+    write(
+        tmp_path / "theme" / "libraryroot.custom.css",
+        "@import './shared/colors.css';\n.library{}",
+    )
+
+    graph = make_graph(tmp_path)
+    outputs, stats = graph.build()
+    assert stats["templates"] == ["base"] and stats["full"]
+    assert sorted(outputs) == [
+        "friends.custom.css",
+        "libraryroot.custom.css",
+        "shared/colors.css",
+        "webkit.css",
+    ]
+    webkit = outputs["webkit.css"].decode()
+    assert webkit.startswith("@import url(https://x/y.css);")
+    assert (
+        webkit.index("--accent:red")
+        < webkit.index(".base{}")
+        < webkit.index(".theme{}")
+    )
+    assert graph.dependents("shared/colors.css") == [
+        "libraryroot.custom.css",
+        "shared/colors.css",
+        "webkit.css",
+    ]
+
+
+def test_incremental_rebuild(tmp_path):
+    """测试只重新构建依赖于变化文件的输出"""
+    write(tmp_path / "theme" / "skin.json", json.dumps({"name": "t"}))
+    write(tmp_path / "theme" / "vars.css", ":root { --a: 1 }")
+    write(
+        tmp_path / "theme" / "webkit.css", "@import 'vars.css';\na { color: #ffffff }"
+    )
+    for i in range(5):
+        write(tmp_path / "theme" / f"page{i}.custom.css", f".page{i} {{ top: 0 }}")
+
+    graph = make_graph(tmp_path, mode="minify")
+    outputs, stats = graph.build()
+    assert len(stats["rebuilt"]) == 7
+    assert outputs["webkit.css"] == b":root{--a:1}a{color:#fff}"
+
+    write(tmp_path / "theme" / "vars.css", ":root { --a: 22 }")
+    outputs, stats = graph.build(changed=["vars.css"])
+    assert stats["rebuilt"] == ["vars.css", "webkit.css"] and stats["reused"] == 5
+    assert outputs["webkit.css"] == b":root{--a:22}a{color:#fff}"
+
+    # 不指定变化的文件时扫描目录，删除的文件不再输出
+    (tmp_path / "theme" / "page0.custom.css").unlink()
+    outputs, stats = graph.build()
+    assert stats["rebuilt"] == [] and "page0.custom.css" not in outputs
+
+    # 更换模板后完整重新构建
+    write(tmp_path / "templates" / "base" / "base.css", ".base{}")
+    write(
+        tmp_path / "theme" / "skin.json", json.dumps({"name": "t", "template": "base"})
+    )
+    outputs, stats = graph.build(changed=["skin.json"])
+    assert stats["full"] and "base.css" in outputs
+
+
+def test_import_cycle(tmp_path):
+    """测试循环 @import 和无效模板"""
+    write(tmp_path / "theme" / "a.css", "@import 'b.css';")
+    write(tmp_path / "theme" / "b.css", "@import 'a.css';")
+    with pytest.raises(ValueError):
+        make_graph(tmp_path).build()
+
+    write(tmp_path / "theme" / "b.css", ".b{}")
+    write(tmp_path / "theme" / "skin.json", json.dumps({"template": "../escape"}))
+    with pytest.raises(ValueError):
+        make_graph(tmp_path).build()
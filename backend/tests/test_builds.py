@@ -0,0 +1,58 @@
+from ..src.millennium.builds import SkinBuilds, exchange_dirs
+
+
+def make_theme(root, css):
+    root.mkdir(parents=True)
+    (root / "skin.json").write_text("{}")
+    (root / "webkit.css").write_text(css)
+
+
+def test_exchange_dirs(tmp_path):
+    """测试目录交换"""
+    a, b = tmp_path / "a", tmp_path / "b"
+    make_theme(a, "a")
+    make_theme(b, "b")
+    exchange_dirs(a, b)
+    assert (a / "webkit.css").read_text() == "b"
+    assert (b / "webkit.css").read_text() == "a"
+
+
+def test_double_buffered_deploy(tmp_path):
+    """测试在构建目录中同步后切换，以及热备的复用和淘汰"""
+    skins, builds = tmp_path / "skins", tmp_path / ".skin-builds"
+    skins.mkdir()
+    manager = SkinBuilds(skins, builds, max_warm_builds=2)
+    theme_a, theme_b = tmp_path / "themes" / "a", tmp_path / "themes" / "b"
+    make_theme(theme_a, "a1")
+    make_theme(theme_b, "b1")
+
+    stats = manager.deploy(theme_a, "A")
+    assert not stats["warm_build"]
+    assert (skins / "A" / "webkit.css").read_text() == "a1"
+
+    (theme_a / "webkit.css").write_text("a2")
+    manager.deploy(theme_a, "A")
+    assert (skins / "A" / "webkit.css").read_text() == "a2"
+    # 旧的缓冲区保留在构建目录中
+    assert (builds / "A" / "webkit.css").read_text() == "a1"
+
+    manager.deploy(theme_b, "B")
+    assert manager.retire("A")
+    assert not (skins / "A").exists()
+
+    # 切换回A时复用热备，不复制任何文件
+    stats = manager.deploy(theme_a, "A")
+    assert stats["warm_build"] and stats["files_copied"] == 0
+    assert (skins / "A" / "webkit.css").read_text() == "a2"
+
+    assert len(manager.warm_builds()) <= 2
+    manager.remove("A")
+    assert not (skins / "A").exists() and not (builds / "A").exists()
+
+
+def test_retire_ignores_foreign_skins(tmp_path):
+    """测试不会移动非本工具部署的皮肤"""
+    skins = tmp_path / "skins"
+    make_theme(skins / "Manual", "x")
+    assert not SkinBuilds(skins, tmp_path / ".skin-builds").retire("Manual")
+    assert (skins / "Manual").exists()
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import shutil
+
+from ..src.millennium.bulk_import import BulkImporter
+from ..src.millennium.importer import ImportLimits
+from .test_importer import make_zip
+
+LIMITS = ImportLimits(max_size=10 * 1024 * 1024, max_files=100, max_ratio=100)
+
+
+def write_theme_zip(path, name, css="a{}"):
+    path.write_bytes(
+        make_zip(
+            {
+                f"{name}/skin.json": json.dumps(
+                    {"name": name, "author": "me", "version": "1"}
+                ),
+                f"{name}/webkit.css": css,
+            }
+        ).getvalue()
+    )
+    return path
+
+
+def test_import_many(tmp_path):
+    """测试批量导入的去重、同名冲突、失败记录和进度"""
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    paths = [
+        write_theme_zip(archives / "a.zip", "Alpha"),
+        write_theme_zip(archives / "b.zip", "Beta"),
+        write_theme_zip(archives / "a2.zip", "Alpha", css="b{}"),  # 同名的不同版本
+        archives / "broken.zip",
+    ]
+    paths.insert(2, shutil.copy(paths[0], archives / "a-copy.zip"))  # 内容相同
+    paths[-1].write_bytes(b"not a zip")
+
+    importer = BulkImporter(max_workers=2)
+    try:
+
+        async def run():
+            return [
+                result
+                async for result in importer.import_many(
+                    paths, tmp_path / "themes", LIMITS
+                )
+            ]
+
+        results = asyncio.run(run())
+    finally:
+        importer.shutdown()
+
+    final = {
+        result["path"]: result for result in results if result["status"] != "hashed"
+    }
+    status = {path.split("/")[-1]: result["status"] for path, result in final.items()}
+    assert status == {
+        "a.zip": "imported",
+        "b.zip": "imported",
+        "a-copy.zip": "duplicate",
+        "a2.zip": "conflict",
+        "broken.zip": "failed",
+    }
+    assert final[str(archives / "a-copy.zip")]["duplicate_of"] == str(
+        archives / "a.zip"
+    )
+    assert final[str(archives / "a.zip")]["config"]["author"] == "me"
+    assert results[-1]["done"] == results[-1]["total"] == 5
+    assert sorted(path.name for path in (tmp_path / "themes").iterdir()) == [
+        "Alpha",
+        "Beta",
+    ]
+    assert (tmp_path / "themes" / "Alpha" / "webkit.css").read_text() == "a{}"
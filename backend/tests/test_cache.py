@@ -0,0 +1,57 @@
+import json
+import os
+
+from ..src.millennium.cache import ParsedFileCache
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    """测试文件未变化时命中缓存，变化后重新解析"""
+    cache = ParsedFileCache(max_entries=4)
+    config_path = tmp_path / "skin.json"
+    config_path.write_text(json.dumps({"name": "A"}), encoding="utf-8")
+
+    first = cache.load_json(config_path)
+    assert cache.load_json(config_path) is first
+    assert cache.stats()["hits"] == 1
+
+    config_path.write_text(json.dumps({"name": "Longer"}), encoding="utf-8")
+    stat = config_path.stat()
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert cache.load_json(config_path) == {"name": "Longer"}
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_skips_file_changed_during_read(tmp_path):
+    """测试读取期间文件被改写时不缓存旧的修改时间"""
+    cache = ParsedFileCache(max_entries=4)
+    config_path = tmp_path / "skin.json"
+    config_path.write_text(json.dumps({"name": "A"}), encoding="utf-8")
+
+    def loader(data):
+        config_path.write_text(json.dumps({"name": "Newer"}), encoding="utf-8")
+        stat = config_path.stat()
+        os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        return json.loads(data)
+
+    assert cache.load(config_path, "json", loader) == {"name": "A"}
+    assert cache.stats()["entries"] == 0
+    assert cache.load_json(config_path) == {"name": "Newer"}
+
+
+def test_cache_lru_eviction(tmp_path):
+    """测试LRU淘汰"""
+    cache = ParsedFileCache(max_entries=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.vdf"
+        path.write_text(f'"root" {{ "value" "{i}" }}', encoding="utf-8")
+        paths.append(path)
+
+    cache.load_vdf(paths[0])
+    cache.load_vdf(paths[1])
+    cache.load_vdf(paths[0])
+    cache.load_vdf(paths[2])
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert cache.load_vdf(paths[0]) == {"root": {"value": "0"}}
+    assert cache.stats()["hits"] == 2
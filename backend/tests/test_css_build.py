@@ -0,0 +1,87 @@
+from ..src.millennium.css_build import MODE_PASSTHROUGH, CSSBuilder, minify_css
+
+
+def test_minify_css():
+    """测试CSS压缩"""
+    assert (
+        minify_css("/* c */ a , b { color : #FFFFFF ; margin: 0 auto ; }")
+        == "a,b{color:#fff;margin:0 auto}"
+    )
+    assert (
+        minify_css('p::before { content: "a  ,  /* b */"; }')
+        == 'p::before{content:"a  ,  /* b */"}'
+    )
+    assert (
+        minify_css("div { width: calc(100% - 2px) !important; }")
+        == "div{width:calc(100% - 2px)!important}"
+    )
+    # 颜色只在声明中缩短，ID选择器保持不变
+    assert (
+        minify_css("#aabbcc { color: #AABBCCDD; border-color: #aabbcd }")
+        == "#aabbcc{color:#abcd;border-color:#aabbcd}"
+    )
+    assert minify_css(".empty { }") == ""
+
+
+def test_minify_comments():
+    """测试注释直接去掉，只有两侧的记号会连在一起时才保留空白"""
+    assert minify_css(".a/**/.b{color:red}") == ".a.b{color:red}"
+    assert minify_css(".a /* x */ .b{color:red}") == ".a .b{color:red}"
+    assert minify_css("a{margin:1px/**/2px}") == "a{margin:1px 2px}"
+    assert minify_css("a{opacity:1/**/.5}") == "a{opacity:1 .5}"
+    assert minify_css("a{color:/* x */red}") == "a{color:red}"
+    assert minify_css("/* top */ a{top:0;/* end */}") == "a{top:0}"
+
+
+def test_minify_url_and_custom_properties():
+    """测试去掉 url() 括号内侧的空白，自定义属性的值除空白外不改写"""
+    assert (
+        minify_css('a { background: url( "x y.png" ) }')
+        == 'a{background:url("x y.png")}'
+    )
+    assert minify_css("a{background:URL(\n  x.png\t)}") == "a{background:URL(x.png)}"
+    assert (
+        minify_css(
+            ":root { --accent :  #FFFFFF ; --list: a , b  >  c; color: #FFFFFF }"
+        )
+        == ":root{--accent:#FFFFFF;--list:a , b > c;color:#fff}"
+    )
+
+
+def test_merge_adjacent_rules():
+    """测试只合并相邻的相同选择器"""
+    assert (
+        minify_css("a{color:red}a{margin:0}b{top:0}a{left:0}")
+        == "a{color:red;margin:0}b{top:0}a{left:0}"
+    )
+    assert minify_css(
+        "@media (max-width: 600px) { a { color: red } a { top: 0 } }"
+    ) == ("@media (max-width: 600px){a{color:red;top:0}}")
+
+
+def test_builder_caches_by_content(tmp_path):
+    """测试构建结果按内容哈希缓存"""
+    theme = tmp_path / "theme"
+    theme.mkdir()
+    (theme / "webkit.css").write_text("a { color: #ffffff; }")
+    (theme / "skin.json").write_text("{}")
+    builder = CSSBuilder(tmp_path / "cache")
+
+    outputs, stats = builder.build_tree(theme)
+    assert outputs == {"webkit.css": b"a{color:#fff}"}
+    assert stats["built"] == 1 and stats["files"][0]["output_bytes"] == len(
+        b"a{color:#fff}"
+    )
+
+    outputs, stats = builder.build_tree(theme)
+    assert stats["cached"] == 1 and stats["built"] == 0
+
+    # 另一个构建器（例如重启后）同样命中磁盘缓存
+    assert CSSBuilder(tmp_path / "cache").build_tree(theme)[1]["cached"] == 1
+
+    (theme / "webkit.css").write_text("a { color: #000000; }")
+    outputs, stats = builder.build_tree(theme)
+    assert outputs["webkit.css"] == b"a{color:#000}" and stats["built"] == 1
+
+    outputs, stats = CSSBuilder(tmp_path / "cache", MODE_PASSTHROUGH).build_tree(theme)
+    assert outputs == {} and stats["mode"] == "passthrough"
@@ -0,0 +1,111 @@
+import os
+
+from ..src.millennium.css_index import CSSIndex, extract_terms
+
+
+def write_css(root, theme, name, text):
+    path = root / theme / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_extract_terms():
+    """测试提取选择器、自定义属性和 @import 目标"""
+    terms = extract_terms(
+        '@import url("friends.custom.css");\n'
+        "@import 'base.css';\n"
+        ":root { --accent-color: #fff; color: red }\n"
+        "/* .commented { } */\n"
+        ".libraryhome_Header > a[href='x.y'], :is(.a, .b) { --gap: 1px }\n"
+        "@media (max-width: 100px) { #main .libraryhome_Body { top: 0 } }\n"
+    )
+    assert terms["import"] == ["base.css", "friends.custom.css"]
+    assert terms["property"] == ["--accent-color", "--gap"]
+    selectors = terms["selector"]
+    assert ".libraryhome_Header > a[href='x.y']" in selectors
+    assert ":is(.a, .b)" in selectors
+    assert {".libraryhome_Header", ".libraryhome_Body", "#main", ".a", ".b"} <= set(
+        selectors
+    )
+    assert ".y" not in selectors and ".commented" not in selectors
+
+
+def test_search_incremental(tmp_path):
+    """测试跨主题查询以及只重新解析变化的文件"""
+    root = tmp_path / "themes"
+    write_css(
+        root, "alpha", "webkit.css", ".libraryhome_Header { --accent-color: red }"
+    )
+    write_css(root, "beta", "webkit.css", ".friends_List { color: blue }")
+    beta = write_css(
+        root, "beta", "libraryroot.custom.css", ".libraryhome_Footer { top: 0 }"
+    )
+    index_path = tmp_path / "css_index.json"
+
+    index = CSSIndex(root, index_path)
+    assert index.refresh() == 3
+    result = index.search(".libraryhome_*", kind="selector")
+    assert result["themes"] == ["alpha", "beta"]
+    assert [(item["theme"], item["file"]) for item in result["results"]] == [
+        ("alpha", "webkit.css"),
+        ("beta", "libraryroot.custom.css"),
+    ]
+    assert index.search("--accent-color")["themes"] == ["alpha"]
+    assert index.refresh() == 0
+
+    beta.write_text(".friends_Header { --accent-color: blue }", encoding="utf-8")
+    os.utime(beta, ns=(1, 1))
+    (root / "alpha" / "webkit.css").unlink()
+    assert index.refresh() == 1
+    assert index.search(".libraryhome_*")["total"] == 0
+    assert index.search("--accent-color")["themes"] == ["beta"]
+
+    # 新实例从磁盘加载索引，不需要重新解析
+    cold = CSSIndex(root, index_path)
+    assert cold.refresh() == 0
+    assert cold.search(".friends_*")["total"] == 2
+
+
+def test_refresh_skips_non_theme_dirs(tmp_path):
+    """测试只索引主题目录，跳过资源存储、导入暂存目录以及模板和输出目录"""
+    root = tmp_path / "themes"
+    write_css(root, "alpha", "webkit.css", ".a {}")
+    for directory in (
+        ".assets/objects",
+        ".import-1234",
+        "templates/base",
+        "output/beta",
+    ):
+        write_css(root, directory, "webkit.css", ".b {}")
+    (root / "root.css").write_text(".c {}", encoding="utf-8")
+
+    index = CSSIndex(root, tmp_path / "css_index.json")
+    assert index.refresh() == 1
+    assert index.search(".a")["themes"] == ["alpha"]
+    assert index.search(".b")["total"] == 0
+
+
+def test_search_db_files(tmp_path):
+    """测试数据库中的CSS文件按 updated_at 增量索引"""
+    index = CSSIndex(tmp_path / "themes", tmp_path / "css_index.json")
+    versions = {("gamma", "webkit.css"): "t1", ("gamma", "old.css"): "t1"}
+    assert sorted(index.stale_db_files(versions)) == [
+        ("gamma", "old.css"),
+        ("gamma", "webkit.css"),
+    ]
+    index.update_db_files(
+        [
+            ("gamma", "webkit.css", "t1", "@import url(old.css); .x { --y: 1 }"),
+            ("gamma", "old.css", "t1", ".z {}"),
+        ]
+    )
+    assert index.stale_db_files(versions) == []
+
+    result = index.search("old.css", kind="import")
+    assert result["results"][0]["source"] == "db"
+
+    assert index.stale_db_files({("gamma", "webkit.css"): "t2"}) == [
+        ("gamma", "webkit.css")
+    ]
+    assert index.search(".z")["total"] == 0
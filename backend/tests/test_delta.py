@@ -0,0 +1,67 @@
+import pytest
+
+from ..src.millennium.delta import (
+    DeltaDocuments,
+    DeltaOp,
+    RevisionMismatch,
+    apply_ops,
+    decode_frame,
+    encode_frame,
+)
+
+BASE = "body { color: red; }\n.header { margin: 0; }\n".encode("utf-8")
+
+
+def test_apply_ops_sequential():
+    """测试差异操作依次应用"""
+    ops = [DeltaOp(14, 3, b"blue"), DeltaOp(0, 0, "/* 主题 */\n".encode("utf-8"))]
+    result = apply_ops(BASE, ops)
+    assert (
+        result.decode("utf-8")
+        == "/* 主题 */\nbody { color: blue; }\n.header { margin: 0; }\n"
+    )
+
+    with pytest.raises(ValueError):
+        apply_ops(BASE, [DeltaOp(len(BASE), 1)])
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_frame_roundtrip(compress):
+    """测试增量帧编码和解码"""
+    ops = [DeltaOp(14, 3, b"blue")]
+    document = apply_ops(BASE, ops)
+    data = encode_frame(
+        "libraryroot.custom.css", 3, 4, ops, document, compress=compress
+    )
+    frame = decode_frame(data)
+    assert frame.file_name == "libraryroot.custom.css"
+    assert (frame.base_rev, frame.new_rev) == (3, 4)
+    assert frame.ops == ops
+
+    with pytest.raises(ValueError):
+        decode_frame(data[:8])
+
+
+def test_documents_resync():
+    """测试基准版本不一致或校验失败时要求重新同步"""
+    documents = DeltaDocuments()
+    ops = [DeltaOp(14, 3, b"blue")]
+    document = apply_ops(BASE, ops)
+
+    with pytest.raises(RevisionMismatch) as error:
+        documents.apply(decode_frame(encode_frame("webkit.css", 0, 1, ops, document)))
+    assert error.value.expected_rev is None
+
+    documents.set("webkit.css", 0, BASE)
+    assert (
+        documents.apply(decode_frame(encode_frame("webkit.css", 0, 1, ops, document)))
+        == document
+    )
+    assert documents.revision("webkit.css") == 1
+
+    with pytest.raises(RevisionMismatch) as error:
+        documents.apply(decode_frame(encode_frame("webkit.css", 0, 2, ops, document)))
+    assert error.value.expected_rev == 1
+
+    with pytest.raises(RevisionMismatch):
+        documents.apply(decode_frame(encode_frame("webkit.css", 1, 2, [], b"wrong")))
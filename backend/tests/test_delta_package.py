@@ -0,0 +1,129 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+
+from ..src.millennium.css_build import css_builder
+from ..src.millennium.delta_package import (
+    DeltaBaseMismatch,
+    VersionHistory,
+    apply_delta,
+    delta_members,
+    member_hashes,
+)
+from ..src.millennium.importer import import_archive
+from ..src.millennium.theme import archive_members
+from ..src.millennium.zip_stream import stream_zip
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def package(members):
+    return io.BytesIO(asyncio.run(collect(stream_zip(members))))
+
+
+def write_theme(theme, version, files):
+    theme.mkdir(parents=True, exist_ok=True)
+    (theme / "skin.json").write_text(json.dumps({"name": "demo", "version": version}))
+    for rel_path, data in files.items():
+        (theme / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (theme / rel_path).write_bytes(data)
+
+
+@pytest.fixture
+def releases(tmp_path, monkeypatch):
+    """导出 1.0 和 1.1 两个版本：修改CSS、新增和删除一个文件，图片不变"""
+    monkeypatch.setattr(css_builder, "cache_dir", tmp_path / "cache")
+    source = tmp_path / "source" / "demo"
+    history = VersionHistory(tmp_path / "versions")
+
+    write_theme(
+        source,
+        "1.0",
+        {"webkit.css": b"a { color: red }", "logo.png": b"\x89PNG", "old.css": b"b{}"},
+    )
+    v1 = archive_members(source)
+    history.record("demo", "1.0", member_hashes(v1))
+    full = package(v1)
+
+    (source / "old.css").unlink()
+    write_theme(source, "1.1", {"webkit.css": b"a { color: blue }", "new.css": b"c{}"})
+    v2 = archive_members(source)
+    delta = delta_members(
+        "demo", v2, member_hashes(v2), history.load("demo", "1.0"), "1.0", "1.1"
+    )
+    return full, delta
+
+
+def test_delta_contains_only_changes(releases):
+    """测试增量包只包含新增和修改的文件"""
+    _, delta = releases
+    assert [member.name for member in delta] == [
+        "delta.json",
+        "files/new.css",
+        "files/skin.json",
+        "files/webkit.css",
+    ]
+    manifest = json.loads(delta[0].data)
+    assert manifest["removed"] == ["old.css"] and sorted(manifest["base"]) == [
+        "logo.png",
+        "old.css",
+        "skin.json",
+        "webkit.css",
+    ]
+
+
+def test_apply_delta(tmp_path, releases):
+    """测试增量包应用到已安装的旧版本上"""
+    full, delta = releases
+    themes = tmp_path / "themes"
+    installed = import_archive(full, themes).path
+    logo_inode = (installed / "logo.png").stat().st_ino
+
+    name, path, config = apply_delta(package(delta), themes)
+    assert name == "demo" and config["version"] == "1.1"
+    assert sorted(p.name for p in path.iterdir()) == [
+        "logo.png",
+        "new.css",
+        "skin.json",
+        "webkit.css",
+    ]
+    assert (path / "webkit.css").read_bytes() == b"a{color:blue}"
+    # 未变化的文件直接硬链接，不重新写入
+    assert (path / "logo.png").stat().st_ino == logo_inode
+    assert [p.name for p in themes.iterdir()] == ["demo"]
+
+
+def test_apply_delta_base_mismatch(tmp_path, releases):
+    """测试已安装的主题与基础版本不一致时不修改任何文件"""
+    full, delta = releases
+    themes = tmp_path / "themes"
+    installed = import_archive(full, themes).path
+    (installed / "webkit.css").write_bytes(b"/* local edit */")
+
+    with pytest.raises(DeltaBaseMismatch) as error:
+        apply_delta(package(delta), themes)
+    assert error.value.files == ["webkit.css"]
+    assert (installed / "webkit.css").read_bytes() == b"/* local edit */"
+    assert (installed / "old.css").exists() and [p.name for p in themes.iterdir()] == [
+        "demo"
+    ]
+
+    with pytest.raises(DeltaBaseMismatch):
+        apply_delta(package(delta), tmp_path / "empty")
+
+
+@pytest.mark.parametrize("rel_path", ["../x.css", "/x.css", "C:/x.css", "..\\x.css"])
+def test_apply_delta_rejects_unsafe_paths(tmp_path, rel_path):
+    """测试增量包清单中的不安全路径（包括盘符）被拒绝"""
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        manifest = {"format": 1, "base": {}, "files": {rel_path: "0" * 64}}
+        archive.writestr("delta.json", json.dumps(manifest))
+    data.seek(0)
+    with pytest.raises(ValueError, match="不安全的路径"):
+        apply_delta(data, tmp_path / "themes")
@@ -0,0 +1,178 @@
+import json
+import warnings
+from http import HTTPStatus
+
+import pytest
+
+with warnings.catch_warnings():
+    # websockets 14 起旧版接口已弃用，但 pyproject 锁定的 12.x 只提供这套接口
+    warnings.simplefilter("ignore", DeprecationWarning)
+    serve = pytest.importorskip("websockets.legacy.server").serve
+from ..src.millennium.devtools import DevToolsError, DevToolsTransport
+from ..src.millennium.preview import TRANSPORT_DEVTOOLS
+from .test_preview import make_preview, make_theme
+
+
+class FakeDevTools:
+    """本地模拟的CEF DevTools端点，targets 中值为假的目标不支持CSS域"""
+
+    def __init__(self, targets):
+        self.targets = targets  # 目标ID -> 是否支持CSS域
+        self.connections = 0
+        self.stylesheets = {}
+        self.sheets_created = 0
+        self.evaluated = []
+        self.port = None
+
+    async def process_request(self, path, request_headers):
+        if path == "/json":
+            return (
+                HTTPStatus.OK,
+                [("Content-Type", "application/json")],
+                json.dumps(
+                    [
+                        {
+                            "id": target_id,
+                            "type": "page",
+                            "url": "https://steamloopback.host/index.html",
+                            "webSocketDebuggerUrl": (
+                                f"ws://127.0.0.1:{self.port}/devtools/page/{target_id}"
+                            ),
+                        }
+                        for target_id in self.targets
+                    ]
+                    + [{"id": "other", "type": "page", "url": "https://example.com"}]
+                ).encode("utf-8"),
+            )
+        return None
+
+    async def handler(self, websocket):
+        target_id = websocket.path.rsplit("/", 1)[-1]
+        self.connections += 1
+        async for message in websocket:
+            request = json.loads(message)
+            method, params = request["method"], request["params"]
+            response = {"id": request["id"], "result": {}}
+            if method.startswith("CSS.") and not self.targets[target_id]:
+                response = {
+                    "id": request["id"],
+                    "error": {"message": "CSS domain not supported"},
+                }
+            elif method == "Page.getFrameTree":
+                response["result"] = {"frameTree": {"frame": {"id": "frame-1"}}}
+            elif method == "CSS.createStyleSheet":
+                self.sheets_created += 1
+                response["result"] = {
+                    "styleSheetId": f"{target_id}-sheet-{self.sheets_created}"
+                }
+            elif method == "CSS.setStyleSheetText":
+                self.stylesheets[params["styleSheetId"]] = params["text"]
+            elif method == "Runtime.evaluate":
+                self.evaluated.append(params["expression"])
+            await websocket.send(json.dumps(response))
+
+
+@pytest.mark.asyncio
+async def test_push_stylesheet_pools_connections():
+    """测试通过CSS域和 Runtime.evaluate 推送样式表，连接按目标复用"""
+    fake = FakeDevTools({"library": True, "overlay": False})
+    async with serve(
+        fake.handler, "127.0.0.1", 0, process_request=fake.process_request
+    ) as server:
+        fake.port = server.sockets[0].getsockname()[1]
+        transport = DevToolsTransport("127.0.0.1", fake.port)
+        try:
+            for i in range(3):
+                result = await transport.push_stylesheet(
+                    "webkit.css", f"body {{ --i: {i}; }}"
+                )
+                assert result == dict(result, targets=2, failed=0)
+        finally:
+            await transport.close()
+
+    assert fake.connections == 2
+    assert fake.stylesheets == {"library-sheet-1": ""}  # 关闭时清空注入的样式表
+    assert len(fake.evaluated) == 4 and "body { --i: 2; }" in fake.evaluated[2]
+    assert fake.evaluated[-1].endswith("?.remove()")
+    stats = transport.stats()
+    assert stats["pushes"] == 3 and stats["round_trip_ms"]["max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_sessions_and_cleanup():
+    """测试不同会话注入各自的样式表，清除会话和关闭时移除注入的样式"""
+    fake = FakeDevTools({"library": True, "overlay": False})
+    async with serve(
+        fake.handler, "127.0.0.1", 0, process_request=fake.process_request
+    ) as server:
+        fake.port = server.sockets[0].getsockname()[1]
+        transport = DevToolsTransport("127.0.0.1", fake.port)
+        try:
+            await transport.push_stylesheet(
+                "webkit.css", "body { color: red; }", "alice"
+            )
+            await transport.push_stylesheet(
+                "webkit.css", "body { color: blue; }", "bob"
+            )
+            assert fake.stylesheets == {
+                "library-sheet-1": "body { color: red; }",
+                "library-sheet-2": "body { color: blue; }",
+            }
+            assert '"sts-preview-alice-webkit.css"' in fake.evaluated[0]
+            assert '"sts-preview-bob-webkit.css"' in fake.evaluated[1]
+
+            assert await transport.clear_session("alice") == 2
+            assert fake.stylesheets["library-sheet-1"] == ""
+            assert fake.stylesheets["library-sheet-2"] == "body { color: blue; }"
+            assert (
+                fake.evaluated[-1]
+                == 'document.getElementById("sts-preview-alice-webkit.css")?.remove()'
+            )
+        finally:
+            await transport.close()
+
+    assert fake.stylesheets["library-sheet-2"] == ""
+    assert (
+        fake.evaluated[-1]
+        == 'document.getElementById("sts-preview-bob-webkit.css")?.remove()'
+    )
+
+
+@pytest.mark.asyncio
+async def test_push_without_steam():
+    """测试没有调试端口时报告错误"""
+    transport = DevToolsTransport("127.0.0.1", 9)
+    with pytest.raises(DevToolsError):
+        await transport.push_stylesheet("webkit.css", "body {}")
+
+
+@pytest.mark.asyncio
+async def test_preview_devtools_transport(tmp_path):
+    """测试预览选择DevTools方式时不写入文件，调试端口不可用时回退到写入文件"""
+    preview = make_preview(tmp_path)
+    await preview.preview_theme(make_theme(tmp_path / "themes" / "test-theme"))
+    deployed = preview.core.skins_path / "Preview Theme"
+    preview.transport = TRANSPORT_DEVTOOLS
+
+    fake = FakeDevTools({"library": True})
+    try:
+        async with serve(
+            fake.handler, "127.0.0.1", 0, process_request=fake.process_request
+        ) as server:
+            fake.port = server.sockets[0].getsockname()[1]
+            preview.devtools = DevToolsTransport("127.0.0.1", fake.port)
+            result = await preview.update_preview("body { color: red; }")
+            assert result["transport"] == "devtools" and result["targets"] == 1
+            assert fake.stylesheets == {"library-sheet-1": "body { color: red; }"}
+            assert (deployed / "webkit.css").read_text() == "body {}"
+            await preview.stop_preview()
+            assert fake.stylesheets == {"library-sheet-1": ""}
+            await preview.devtools.close()
+            await preview.preview_theme(tmp_path / "themes" / "test-theme")
+
+        preview.devtools = DevToolsTransport("127.0.0.1", 9)
+        result = await preview.update_preview("body { color: blue; }")
+        assert result["transport"] == "file"
+        assert (deployed / "webkit.css").read_text() == "body { color: blue; }"
+    finally:
+        await preview.close()
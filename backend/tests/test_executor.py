@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from ..src.millennium.executor import IOExecutor
+
+
+@pytest.mark.asyncio
+async def test_run_io_does_not_block_event_loop():
+    """测试同步I/O在线程池中执行时事件循环仍然响应"""
+    executor = IOExecutor(max_workers=2, max_pending=2)
+    ticks = []
+
+    async def ticker():
+        for _ in range(10):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    results = await asyncio.gather(
+        *(executor.run(time.sleep, 0.05) for _ in range(6)),
+        ticker(),
+    )
+    assert results[:6] == [None] * 6
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    assert max(gaps) < 0.05
+
+    stats = executor.stats()
+    assert stats["completed"] == 6 and stats["queued"] == 0 and stats["running"] == 0
+    assert stats["max_queue_depth"] <= 4
+    assert stats["run_ms"]["max"] >= 50
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_io_propagates_errors():
+    """测试异常传递与失败计数"""
+    executor = IOExecutor(max_workers=1)
+    with pytest.raises(ZeroDivisionError):
+        await executor.run(lambda: 1 / 0)
+    assert executor.stats()["failed"] == 1
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_before_start_leaves_queue():
+    """测试开始执行前被取消的任务不会留在排队计数中"""
+    executor = IOExecutor(max_workers=1)
+    blocker = asyncio.ensure_future(executor.run(time.sleep, 0.1))
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(executor.run(time.sleep, 0))
+    await asyncio.sleep(0.01)
+    assert executor.stats()["queued"] == 1
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await blocker
+    stats = executor.stats()
+    assert stats["queued"] == 0 and stats["running"] == 0
+    executor.shutdown()
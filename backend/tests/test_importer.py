@@ -0,0 +1,94 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from ..src.millennium.importer import ArchiveLimitError, ImportLimits, import_archive
+
+LIMITS = ImportLimits(max_size=10 * 1024 * 1024, max_files=10, max_ratio=50)
+
+
+def make_zip(files, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_import_from_stream(tmp_path):
+    """测试从文件对象导入，只解压 skin.json 所在目录下的文件"""
+    source = make_zip(
+        {
+            "__MACOSX/._skin.json": b"junk",
+            "pack/readme.txt": b"outside",
+            "pack/demo/skin.json": json.dumps({"name": "Demo"}),
+            "pack/demo/webkit.css": b"a{}",
+            "pack/demo/assets/bg.png": b"\x89PNG",
+        }
+    )
+    name, path, config = import_archive(source, tmp_path / "themes", limits=LIMITS)
+    assert (
+        name == "Demo"
+        and path == tmp_path / "themes" / "Demo"
+        and config == {"name": "Demo"}
+    )
+    assert sorted(
+        p.relative_to(path).as_posix() for p in path.rglob("*") if p.is_file()
+    ) == [
+        "assets/bg.png",
+        "skin.json",
+        "webkit.css",
+    ]
+    # 只留下主题目录，不留下暂存目录
+    assert [p.name for p in (tmp_path / "themes").iterdir()] == ["Demo"]
+
+    # 再次导入时原子地替换旧目录
+    source = make_zip({"skin.json": json.dumps({"name": "Demo"}), "webkit.css": b"b{}"})
+    import_archive(source, tmp_path / "themes", limits=LIMITS)
+    assert (path / "webkit.css").read_bytes() == b"b{}" and not (
+        path / "assets"
+    ).exists()
+    assert [p.name for p in (tmp_path / "themes").iterdir()] == ["Demo"]
+
+
+def test_import_without_config(tmp_path):
+    """测试没有 skin.json 的压缩包"""
+    assert (
+        import_archive(make_zip({"webkit.css": b"a{}"}), tmp_path, limits=LIMITS)
+        is None
+    )
+
+
+@pytest.mark.parametrize(
+    "files, error",
+    [
+        (
+            {"skin.json": "{}", **{f"{i}.css": b"" for i in range(11)}},
+            ArchiveLimitError,
+        ),
+        ({"skin.json": "{}", "bomb.css": b"\0" * (2 * 1024 * 1024)}, ArchiveLimitError),
+        ({"skin.json": "{}", "../escape.css": b""}, ValueError),
+        ({"skin.json": json.dumps({"name": "../x"})}, ValueError),
+        ({"skin.json": json.dumps({"name": "templates"})}, ValueError),
+        ({"skin.json": json.dumps({"name": ".assets"})}, ValueError),
+    ],
+)
+def test_import_limits(tmp_path, files, error):
+    """测试文件数量、压缩率、不安全路径和主题名称的检查"""
+    with pytest.raises(error):
+        import_archive(
+            make_zip(files), tmp_path / "themes", default_name="t", limits=LIMITS
+        )
+    assert list((tmp_path / "themes").glob("*")) == []
+
+
+def test_import_size_limit(tmp_path):
+    """测试解压后总大小限制"""
+    source = make_zip({"skin.json": "{}", "big.bin": b"x" * 2048}, zipfile.ZIP_STORED)
+    with pytest.raises(ArchiveLimitError):
+        import_archive(
+            source, tmp_path, default_name="t", limits=LIMITS._replace(max_size=1024)
+        )
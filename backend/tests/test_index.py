@@ -0,0 +1,56 @@
+import json
+
+from ..src.millennium.index import ThemeIndex
+
+
+def write_theme(root, dir_name, **config):
+    theme_dir = root / dir_name
+    theme_dir.mkdir(parents=True, exist_ok=True)
+    (theme_dir / "skin.json").write_text(json.dumps(config), encoding="utf-8")
+
+
+def test_index_incremental_refresh(tmp_path):
+    """测试索引只重新读取变化的主题"""
+    root = tmp_path / "themes"
+    write_theme(root, "a", name="Alpha", author="x", version="1.0")
+    write_theme(root, "b", name="Beta", author="y", version="1.0")
+    (root / "broken").mkdir()
+    for dir_name in ("templates", "output", ".assets"):
+        write_theme(root, dir_name, name=dir_name)
+    index_path = tmp_path / "index.json"
+
+    index = ThemeIndex(root, index_path)
+    total, themes = index.query()
+    assert total == 2 and [t["name"] for t in themes] == ["a", "b"]
+    assert index.reads == 2
+
+    index.query()
+    assert index.reads == 2
+
+    write_theme(root, "b", name="Beta 2", author="y", version="1.1")
+    assert index.refresh() == 1
+
+    # 新实例从磁盘加载索引，不需要重新读取
+    cold = ThemeIndex(root, index_path)
+    assert cold.refresh() == 0
+    assert cold.query(search="beta 2")[1][0]["config"]["version"] == "1.1"
+
+
+def test_index_sort_filter_paginate(tmp_path):
+    """测试排序、过滤与分页"""
+    root = tmp_path / "themes"
+    for i in range(5):
+        write_theme(
+            root,
+            f"t{i}",
+            name=f"Theme {i}",
+            author="me" if i % 2 else "you",
+            version="1",
+        )
+    index = ThemeIndex(root, tmp_path / "index.json")
+
+    total, page = index.query(author="me", sort_by="title", descending=True)
+    assert total == 2 and [t["name"] for t in page] == ["t3", "t1"]
+
+    total, page = index.query(offset=1, limit=2)
+    assert total == 5 and [t["name"] for t in page] == ["t1", "t2"]
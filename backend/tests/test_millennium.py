@@ -1,16 +1,21 @@
+import json
+import shutil
+from pathlib import Path
+
 import pytest
 from fastapi.testclient import TestClient
 from fastapi.websockets import WebSocket
-from pathlib import Path
-import json
-import shutil
+
 from ..src.main import app
-from ..src.millennium.core import MillenniumCore
+from ..src.millennium.asset_store import AssetStore
+from ..src.millennium.core import MillenniumCore, get_core
+from ..src.millennium.delta_package import VersionHistory
 from ..src.millennium.preview import ThemePreview
 
 client = TestClient(app)
 core = MillenniumCore()
 
+
 @pytest.fixture
 def test_theme_path(tmp_path):
     """创建测试主题"""
@@ -22,7 +27,7 @@ def test_theme_path(tmp_path):
         "name": "Test Theme",
         "author": "Test Author",
         "version": "1.0.0",
-        "description": "A test theme"
+        "description": "A test theme",
     }
     with (theme_path / "skin.json").open("w", encoding="utf-8") as f:
         json.dump(config, f)
@@ -32,17 +37,20 @@ def test_theme_path(tmp_path):
 
     return theme_path
 
+
 def test_millennium_initialize():
     """测试Millennium初始化"""
     response = client.post("/api/millennium/initialize")
     assert response.status_code in [200, 500]  # 500是因为可能没有找到Steam
 
+
 def test_list_themes():
     """测试主题列表"""
     response = client.get("/api/millennium/themes")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+
 def test_create_theme():
     """测试创建主题"""
     theme_data = {
@@ -51,12 +59,13 @@ def test_create_theme():
             "name": "Test Theme",
             "author": "Test Author",
             "version": "1.0.0",
-            "description": "A test theme"
-        }
+            "description": "A test theme",
+        },
     }
     response = client.post("/api/millennium/themes", params=theme_data)
     assert response.status_code in [200, 400]  # 400是因为主题可能已存在
 
+
 @pytest.mark.asyncio
 async def test_validate_theme(test_theme_path):
     """测试主题验证"""
@@ -67,6 +76,71 @@ async def test_validate_theme(test_theme_path):
     invalid_theme_path.mkdir()
     assert not await core.validate_theme(invalid_theme_path)
 
+
+@pytest.mark.asyncio
+async def test_resolve_theme_paths(tmp_path, monkeypatch):
+    """测试只接受主题目录下的路径"""
+    monkeypatch.setattr(core, "themes_path", tmp_path)
+    assert await core.resolve_theme_paths(["a", str(tmp_path / "b.zip")]) == [
+        tmp_path.resolve() / "a",
+        tmp_path.resolve() / "b.zip",
+    ]
+    for path in ["../outside", "/etc", "a/../..", "."]:
+        with pytest.raises(ValueError):
+            await core.resolve_theme_paths([path])
+
+
+def test_import_themes_rejects_outside_paths(tmp_path, monkeypatch):
+    """测试批量导入拒绝导入目录之外的路径"""
+    monkeypatch.setattr(core, "import_path", tmp_path)
+    app.dependency_overrides[get_core] = lambda: core
+    try:
+        url = app.url_path_for("import_themes")
+        for path in ["../outside.zip", "/etc/passwd", "a/../../b.zip"]:
+            response = client.post(url, json={"paths": [path]})
+            assert response.status_code == 400
+        response = client.post(url, json={"paths": ["."]})
+        assert response.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_archive_themes_rejects_outside_names(tmp_path, monkeypatch):
+    """测试导出只接受主题目录下的主题名称"""
+    monkeypatch.setattr(core, "themes_path", tmp_path / "themes")
+    (tmp_path / "themes").mkdir()
+    (tmp_path / "secret").mkdir()
+    (tmp_path / "secret" / "skin.json").write_text("{}")
+    for names in (["../secret"], [str(tmp_path / "secret")], ["..", "."]):
+        with pytest.raises(ValueError):
+            await core.archive_themes(names)
+    with pytest.raises(ValueError):
+        await core.archive_theme_delta("../secret", "1.0")
+
+
+@pytest.mark.asyncio
+async def test_export_records_versions_on_request(tmp_path, monkeypatch):
+    """测试只在要求时记录导出的版本，删除主题时一并删除版本记录"""
+    themes = tmp_path / "themes"
+    monkeypatch.setattr(core, "themes_path", themes)
+    monkeypatch.setattr(core, "version_history", VersionHistory(themes / ".versions"))
+    monkeypatch.setattr(core, "asset_store", AssetStore(themes / ".assets"))
+    monkeypatch.setattr(core, "skins_path", None)
+    (themes / "demo").mkdir(parents=True)
+    (themes / "demo" / "skin.json").write_text(
+        json.dumps({"name": "demo", "version": "1.0"})
+    )
+
+    await core.archive_themes(["demo"])
+    assert core.version_history.versions("demo") == []
+    await core.archive_themes(["demo"], record=True)
+    assert core.version_history.versions("demo") == ["1.0"]
+
+    await core.delete_theme("demo")
+    assert not (themes / ".versions" / "demo").exists()
+
+
 @pytest.mark.asyncio
 async def test_apply_theme(test_theme_path):
     """测试主题应用"""
@@ -88,6 +162,7 @@ async def test_apply_theme(test_theme_path):
             if applied_theme_path.exists():
                 shutil.rmtree(applied_theme_path)
 
+
 @pytest.mark.asyncio
 async def test_remove_theme(test_theme_path):
     """测试主题移除"""
@@ -105,6 +180,7 @@ async def test_remove_theme(test_theme_path):
     except Exception as e:
         pytest.fail(f"移除主题失败: {str(e)}")
 
+
 @pytest.mark.asyncio
 async def test_preview_theme(test_theme_path):
     """测试主题预览"""
@@ -120,13 +196,16 @@ async def test_preview_theme(test_theme_path):
     finally:
         await preview.stop_preview()
 
+
 @pytest.mark.asyncio
 async def test_preview_websocket():
     """测试预览WebSocket"""
     if not core.steam_path:
         pytest.skip("Steam未安装")
 
-    with client.websocket_connect("/api/millennium/themes/test-theme/preview/ws") as websocket:
+    with client.websocket_connect(
+        "/api/millennium/themes/test-theme/preview/ws"
+    ) as websocket:
         try:
             # 发送测试CSS
             websocket.send_text("body { background: #000; }")
@@ -134,4 +213,4 @@ async def test_preview_websocket():
             assert response["status"] in ["success", "error"]
         except Exception as e:
             if "无法连接到Steam客户端" not in str(e):
-                pytest.fail(f"WebSocket测试失败: {str(e)}")
\ No newline at end of file
+                pytest.fail(f"WebSocket测试失败: {str(e)}")
@@ -0,0 +1,313 @@
+import asyncio
+import json
+
+import pytest
+
+from ..src.millennium import build_graph
+from ..src.millennium.asset_store import AssetStore
+from ..src.millennium.builds import SkinBuilds
+from ..src.millennium.core import MillenniumCore
+from ..src.millennium.css_build import css_builder
+from ..src.millennium.delta import DeltaOp, apply_ops, encode_frame
+from ..src.millennium.preview import ThemePreview, parse_preview_message
+from ..src.millennium.preview_updates import PreviewUpdateScheduler
+
+
+def make_theme(root, css="body {}"):
+    root.mkdir(parents=True)
+    config = {"name": "Preview Theme", "author": "Test Author", "version": "1.0.0"}
+    (root / "skin.json").write_text(json.dumps(config))
+    (root / "webkit.css").write_text(css)
+    (root / "libraryroot.custom.css").write_text(":root {}")
+    return root
+
+
+def make_core(tmp_path):
+    """创建使用临时Steam目录的 MillenniumCore"""
+    core = MillenniumCore()
+    core.skins_path = tmp_path / "steam" / "steamui" / "skins"
+    core.skins_path.mkdir(parents=True)
+    core.skin_builds = SkinBuilds(
+        core.skins_path, tmp_path / "steam" / "steamui" / ".skin-builds"
+    )
+    return core
+
+
+def make_preview(tmp_path, core=None):
+    """创建使用临时Steam目录的预览"""
+    preview = ThemePreview(tmp_path / "steam")
+    preview.core = core or make_core(tmp_path)
+    return preview
+
+
+def test_parse_preview_message():
+    """测试文本预览消息解析"""
+    assert parse_preview_message("body {}") == ("webkit.css", "body {}", None, 0)
+    message = json.dumps(
+        {"file": "libraryroot.custom.css", "content": ":root {}", "id": 7, "rev": 3}
+    )
+    assert parse_preview_message(message) == (
+        "libraryroot.custom.css",
+        ":root {}",
+        7,
+        3,
+    )
+
+
+@pytest.mark.asyncio
+async def test_hot_reload_writes_single_file(tmp_path):
+    """测试热更新只写入变化的文件，不重新部署整个主题"""
+    preview = make_preview(tmp_path)
+    await preview.preview_theme(make_theme(tmp_path / "themes" / "test-theme"))
+    deployed = preview.core.skins_path / "Preview Theme"
+
+    deploys = []
+    apply_theme = preview.core.apply_theme
+    preview.core.apply_theme = lambda *args, **kwargs: deploys.append(
+        args
+    ) or apply_theme(*args, **kwargs)
+    try:
+        result = await preview.update_preview("body { color: red; }")
+        assert result["status"] == "success" and result["hot_reload"]
+        assert (deployed / "webkit.css").read_text() == "body { color: red; }"
+
+        result = await preview.update_preview(
+            ":root { --x: 1; }", "libraryroot.custom.css"
+        )
+        assert result["hot_reload"]
+        assert (deployed / "libraryroot.custom.css").read_text() == ":root { --x: 1; }"
+        assert not deploys
+
+        for file_name in ("skin.json", "../webkit.css", "/etc/x.custom.css"):
+            result = await preview.update_preview("x", file_name)
+            assert result["status"] == "error"
+    finally:
+        await preview.close()
+
+
+@pytest.mark.asyncio
+async def test_overlay_updated_on_event_loop(tmp_path):
+    """测试 overlay 在事件循环上更新，IO线程中的写入不访问它"""
+    preview = make_preview(tmp_path)
+    await preview.preview_theme(make_theme(tmp_path / "themes" / "test-theme"))
+    write_preview_file = preview._write_preview_file
+    seen = []
+
+    def write(file_name, data):
+        overlay = preview.overlay
+        preview.overlay = None  # IO线程中访问 overlay 会失败
+        try:
+            return write_preview_file(file_name, data)
+        finally:
+            preview.overlay = overlay
+            seen.append(dict(overlay))
+
+    preview._write_preview_file = write
+    try:
+        result = await preview.update_preview("body { color: red; }")
+        assert result["status"] == "success" and result["hot_reload"]
+        assert seen == [{"webkit.css": b"body { color: red; }"}]
+    finally:
+        await preview.close()
+
+
+@pytest.mark.asyncio
+async def test_full_deploy_after_hot_reload(tmp_path):
+    """测试热更新后再完整部署时，被直接修改的文件会重新同步"""
+    preview = make_preview(tmp_path)
+    theme_path = make_theme(
+        tmp_path / "themes" / "test-theme", css="body { color: red; }"
+    )
+    await preview.preview_theme(theme_path)
+    deployed = preview.core.skins_path / "Preview Theme"
+
+    try:
+        # 大小相同但内容不同，同步时不能只比较大小
+        await preview.update_preview("body { color: tan; }")
+        # 第二次部署后被修改的皮肤成为构建缓冲区，第三次部署会在它上面增量同步
+        await preview.preview_theme(theme_path)
+        await preview.preview_theme(theme_path)
+        assert (deployed / "webkit.css").read_text() == "body { color: red; }"
+    finally:
+        await preview.close()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_coalesces_updates():
+    """测试同一文件在防抖窗口内只应用最新内容，旧消息以 dropped 确认"""
+    applied, sent = [], []
+
+    async def apply(content, file_name):
+        applied.append((file_name, content))
+        return {"status": "success", "file": file_name}
+
+    async def send(result):
+        sent.append(result)
+
+    scheduler = PreviewUpdateScheduler(apply, send, debounce=0.02)
+    scheduler.start()
+    try:
+        for i in range(5):
+            await scheduler.submit("webkit.css", f"v{i}", i)
+        await scheduler.submit("libraryroot.custom.css", "c", "c")
+        await asyncio.sleep(0.1)
+    finally:
+        await scheduler.close()
+
+    assert applied == [("webkit.css", "v4"), ("libraryroot.custom.css", "c")]
+    assert [r["id"] for r in sent if r["status"] == "dropped"] == [0, 1, 2, 3]
+    assert [r["id"] for r in sent if r["status"] == "success"] == [4, "c"]
+    assert scheduler.stats() == {
+        "received": 6,
+        "applied": 2,
+        "coalesced": 4,
+        "pending": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_scheduler_survives_send_errors():
+    """测试发送结果失败后调度器继续应用后面的更新"""
+    applied = []
+
+    async def apply(content, file_name):
+        applied.append(content)
+        return {"status": "success", "file": file_name}
+
+    async def send(result):
+        if result["id"] == 1:
+            raise RuntimeError("客户端已断开")
+
+    scheduler = PreviewUpdateScheduler(apply, send, debounce=0)
+    scheduler.start()
+    try:
+        await scheduler.submit("webkit.css", "a", 1)
+        await asyncio.sleep(0.05)
+        await scheduler.submit("webkit.css", "b", 2)
+        await asyncio.sleep(0.05)
+    finally:
+        await scheduler.close()
+    assert applied == ["a", "b"]
+
+
+class FakeWebSocket:
+    """按顺序返回预设消息的WebSocket"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    async def receive(self):
+        await asyncio.sleep(0.05)
+        if not self.messages:
+            return {"type": "websocket.disconnect"}
+        return dict(self.messages.pop(0), type="websocket.receive")
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_websocket_delta_frames(tmp_path):
+    """测试通过二进制增量帧更新预览，基准版本不一致时要求重新同步"""
+    preview = make_preview(tmp_path)
+    await preview.preview_theme(make_theme(tmp_path / "themes" / "test-theme"))
+
+    base = "body { color: red; }"
+    ops = [DeltaOp(14, 3, b"blue")]
+    document = apply_ops(base.encode("utf-8"), ops)
+    websocket = FakeWebSocket(
+        [
+            {"text": json.dumps({"content": base, "rev": 1, "id": 1})},
+            {"bytes": encode_frame("webkit.css", 1, 2, ops, document, compress=True)},
+            {"bytes": encode_frame("webkit.css", 1, 3, ops, document)},
+        ]
+    )
+    await preview.handle_websocket(websocket)
+
+    assert [(r["status"], r["id"]) for r in websocket.sent] == [
+        ("success", 1),
+        ("success", 2),
+        ("resync", 3),
+    ]
+    assert websocket.sent[-1]["rev"] == 2
+    assert preview.update_stats()["applied"] == 2
+
+
+@pytest.mark.asyncio
+async def test_websocket_send_error_stops_preview(tmp_path):
+    """测试发送失败（客户端中途断开）后仍然停止预览"""
+    preview = make_preview(tmp_path)
+    await preview.preview_theme(make_theme(tmp_path / "themes" / "test-theme"))
+
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            raise RuntimeError("客户端已断开")
+
+    websocket = BrokenWebSocket(
+        [
+            {"text": json.dumps({"content": "a{}", "id": 1})},
+            {"text": json.dumps({"content": "b{}", "id": 2})},
+        ]
+    )
+    await preview.handle_websocket(websocket)
+    assert not preview.preview_active and preview.scheduler is None
+    assert preview.update_stats()["applied"] == 2
+
+
+@pytest.mark.asyncio
+async def test_preview_builds_templates_and_restores_applied_theme(
+    tmp_path, monkeypatch
+):
+    """测试预览同样内联模板和 @import，停止预览后恢复为正常应用时的构建结果"""
+    monkeypatch.setattr(css_builder, "cache_dir", tmp_path / "cache")
+    monkeypatch.setattr(build_graph.settings, "THEMES_PATH", tmp_path / "themes")
+    template = tmp_path / "themes" / "templates" / "base"
+    template.mkdir(parents=True)
+    (template / "base.css").write_text(".base { color: red; }")
+    theme_path = make_theme(
+        tmp_path / "themes" / "test-theme",
+        css='@import "base.css";\n.a { color: blue; }',
+    )
+    config = json.loads((theme_path / "skin.json").read_text())
+    (theme_path / "skin.json").write_text(json.dumps(dict(config, template="base")))
+
+    core = make_core(tmp_path)
+    core.steam_path = tmp_path / "steam"
+    core.asset_store = AssetStore(tmp_path / "themes" / ".assets")
+    (core.steam_path / "config").mkdir(parents=True)
+    (core.steam_path / "config" / "libraryconfig.vdf").write_text(
+        '"libraryconfig"\n{\n\t"settings"\n\t{\n\t\t"SteamTheme"\t\t""\n\t}\n}\n'
+    )
+    await core.apply_theme(theme_path)
+    deployed = core.skins_path / "Preview Theme"
+    applied = {
+        "webkit.css": ".base{color:red}.a{color:blue}",
+        "base.css": ".base{color:red}",
+    }
+    assert {name: (deployed / name).read_text() for name in applied} == applied
+
+    preview = make_preview(tmp_path, core)
+    await preview.preview_theme(theme_path)
+    try:
+        assert (deployed / "webkit.css").read_text() == (
+            ".base { color: red; }\n.a { color: blue; }"
+        )
+        await preview.update_preview('@import "base.css";\n.a { color: green; }')
+        assert (deployed / "webkit.css").read_text() == (
+            ".base { color: red; }\n.a { color: green; }"
+        )
+
+        # 修改被导入的文件时重新构建导入它的输出
+        await preview.update_preview(".b {}", "x.custom.css")
+        await preview.update_preview(
+            '@import "x.custom.css";\n.a {}', "libraryroot.custom.css"
+        )
+        assert (deployed / "libraryroot.custom.css").read_text() == ".b {}\n.a {}"
+        await preview.update_preview(".c {}", "x.custom.css")
+        assert (deployed / "libraryroot.custom.css").read_text() == ".c {}\n.a {}"
+
+        await preview.stop_preview()
+        assert {name: (deployed / name).read_text() for name in applied} == applied
+    finally:
+        await preview.close()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from ..src.millennium.preview_pool import PreviewPool
+from .test_preview import FakeWebSocket, make_core, make_preview, make_theme
+
+
+def make_pool(tmp_path, **kwargs):
+    core = make_core(tmp_path)
+    return PreviewPool(
+        tmp_path / "steam",
+        factory=lambda steam_path: make_preview(tmp_path, core),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_isolated_and_reused(tmp_path):
+    """测试不同会话互不影响，同一会话再次预览时复用热备的皮肤构建"""
+    pool = make_pool(tmp_path)
+    theme_path = make_theme(tmp_path / "themes" / "test-theme")
+    try:
+        first = await pool.acquire("test-theme", "alice")
+        second = await pool.acquire("test-theme", "bob")
+        assert first is not second
+
+        await first.preview_theme(theme_path)
+        assert not first.warm
+        await first.update_preview("body { color: red; }")
+        assert first.memory_usage()["overlay_bytes"] == len("body { color: red; }")
+        await first.stop_preview()
+        assert first.core.skin_builds.warm_builds() == ["Preview Theme@alice"]
+
+        assert await pool.acquire("test-theme", "alice") is first
+        await first.preview_theme(theme_path)
+        assert first.warm
+        assert pool.stats()["reused"] == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_sessions_deploy_to_separate_skins(tmp_path):
+    """测试两个会话预览同一主题时部署到不同目录，停止其中一个不影响另一个"""
+    pool = make_pool(tmp_path)
+    theme_path = make_theme(tmp_path / "themes" / "test-theme")
+    skins = tmp_path / "steam" / "steamui" / "skins"
+    try:
+        alice = await pool.acquire("test-theme", "alice")
+        bob = await pool.acquire("test-theme", "bob/../x")
+        default = await pool.acquire("test-theme")
+        for preview in (alice, bob, default):
+            await preview.preview_theme(theme_path)
+        assert sorted(path.name for path in skins.iterdir()) == [
+            "Preview Theme",
+            "Preview Theme@alice",
+            "Preview Theme@bob____x",
+        ]
+
+        await alice.update_preview("body { color: red; }")
+        await bob.stop_preview()
+        assert (
+            skins / "Preview Theme@alice" / "webkit.css"
+        ).read_text() == "body { color: red; }"
+        assert (skins / "Preview Theme" / "webkit.css").read_text() == "body {}"
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_idle_timeout(tmp_path):
+    """测试超出会话上限时淘汰最久未用的会话，以及空闲超时"""
+    pool = make_pool(tmp_path, max_sessions=2)
+    try:
+        a = await pool.acquire("a")
+        await pool.acquire("b")
+        await pool.acquire("a")
+        await pool.acquire("c")
+        assert pool.get("b") is None
+        assert pool.get("a") is a
+        assert pool.stats()["evicted"] == 1
+
+        # 所有会话都有连接时无法淘汰
+        for preview in (pool.get("a"), pool.get("c")):
+            preview.websocket = object()
+        with pytest.raises(RuntimeError):
+            await pool.acquire("d")
+        for preview in (pool.get("a"), pool.get("c")):
+            preview.websocket = None
+
+        pool.idle_timeout = 0
+        await pool.expire_idle()
+        assert pool.stats()["sessions"] == []
+        assert pool.stats()["expired"] == 2
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_websocket_is_rejected(tmp_path):
+    """测试同一会话的第二个连接被拒绝，也不会停止第一个连接的预览"""
+    pool = make_pool(tmp_path)
+    theme_path = make_theme(tmp_path / "themes" / "test-theme")
+    try:
+        preview = await pool.acquire("test-theme", "alice")
+        await preview.preview_theme(theme_path)
+        first = FakeWebSocket([{"text": json.dumps({"content": "a{}", "id": 1})}])
+        task = asyncio.create_task(preview.handle_websocket(first))
+        await asyncio.sleep(0.01)
+
+        second = FakeWebSocket([])
+        assert not preview.attach_websocket(second)
+        with pytest.raises(RuntimeError):
+            await preview.handle_websocket(second)
+        assert preview.websocket is first and preview.preview_active
+
+        await task
+        assert preview.websocket is None and not preview.preview_active
+        assert [result["id"] for result in first.sent] == [1]
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_reaped_in_background(tmp_path):
+    """测试没有后续请求时后台任务也会关闭空闲超时的会话"""
+    pool = make_pool(tmp_path, idle_timeout=0.05, reap_interval=0.02)
+    try:
+        await pool.acquire("a")
+        connected = await pool.acquire("b")
+        connected.websocket = object()
+        await asyncio.sleep(0.2)
+        assert pool.get("a") is None
+        assert pool.get("b") is connected
+        assert pool.stats()["expired"] == 1
+        connected.websocket = None
+    finally:
+        await pool.close()
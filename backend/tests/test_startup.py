@@ -0,0 +1,30 @@
+import time
+
+from ..src.millennium.core import find_steam_path, get_core
+from ..src.startup import StartupReport
+
+
+def test_startup_report_phases():
+    """测试启动阶段耗时记录"""
+    report = StartupReport()
+    report.mark("import:test")
+    with report.phase("lifespan:test"):
+        time.sleep(0.01)
+
+    data = report.as_dict()
+    assert data["ready"] is False
+    assert [phase["name"] for phase in data["phases"]] == [
+        "import:test",
+        "lifespan:test",
+    ]
+    assert data["phases"][1]["duration_ms"] >= 10
+
+    report.mark_ready()
+    assert report.as_dict()["ready"] is True
+
+
+def test_core_is_shared_and_lazy():
+    """测试共享的 MillenniumCore 只创建一次，Steam路径只查找一次"""
+    assert get_core() is get_core()
+    find_steam_path()
+    assert find_steam_path.cache_info().currsize == 1
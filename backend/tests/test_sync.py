@@ -0,0 +1,131 @@
+import shutil
+
+from ..src.millennium.deploy import (
+    STRATEGY_COPY,
+    STRATEGY_HARDLINK,
+    STRATEGY_REFLINK,
+    deploy_file,
+    get_deploy_function,
+)
+from ..src.millennium.sync import manifest_path_for, remove_tree, sync_tree
+
+
+def make_theme(root):
+    (root / "assets").mkdir(parents=True)
+    (root / "webkit.css").write_text("body {}")
+    (root / "assets" / "bg.png").write_bytes(b"\x89PNG" * 1000)
+    (root / "assets" / "old.png").write_bytes(b"old")
+
+
+def test_sync_copies_only_changes(tmp_path):
+    """测试增量同步只复制变化的文件"""
+    source = tmp_path / "theme"
+    target = tmp_path / "skins" / "theme"
+    make_theme(source)
+
+    stats = sync_tree(source, target)
+    assert stats["files_copied"] == 3
+    assert manifest_path_for(target).exists()
+
+    stats = sync_tree(source, target)
+    assert stats["files_copied"] == 0
+    assert stats["files_hashed"] == 0
+    assert stats["files_unchanged"] == 3
+
+    (source / "webkit.css").write_text("body { color: red; }")
+    (source / "assets" / "old.png").unlink()
+    stats = sync_tree(source, target)
+    assert stats["files_copied"] == 1
+    assert stats["bytes_copied"] == len("body { color: red; }")
+    assert stats["files_deleted"] == 1
+    assert (target / "webkit.css").read_text() == "body { color: red; }"
+    assert not (target / "assets" / "old.png").exists()
+
+
+def test_sync_skips_walk_when_dirs_unchanged(tmp_path):
+    """测试源目录未增删文件时不遍历源目录，原地修改的文件仍会同步"""
+    source = tmp_path / "theme"
+    target = tmp_path / "skins" / "theme"
+    make_theme(source)
+    assert sync_tree(source, target)["source_walked"]
+
+    stats = sync_tree(source, target)
+    assert not stats["source_walked"] and stats["files_unchanged"] == 3
+
+    (source / "webkit.css").write_text("body { color: red; }")
+    stats = sync_tree(source, target)
+    assert not stats["source_walked"] and stats["files_copied"] == 1
+    assert (target / "webkit.css").read_text() == "body { color: red; }"
+
+    (source / "assets" / "new.png").write_bytes(b"new")
+    stats = sync_tree(source, target)
+    assert stats["source_walked"] and stats["files_copied"] == 1
+    assert (target / "assets" / "new.png").read_bytes() == b"new"
+
+    # 换了源目录时重新遍历
+    shutil.copytree(source, tmp_path / "copy")
+    assert sync_tree(tmp_path / "copy", target)["source_walked"]
+
+
+def test_sync_without_manifest_compares_hashes(tmp_path):
+    """测试已有部署但没有清单时按内容比较"""
+    source = tmp_path / "theme"
+    target = tmp_path / "skins" / "theme"
+    make_theme(source)
+    sync_tree(source, target)
+    manifest_path_for(target).unlink()
+
+    stats = sync_tree(source, target)
+    assert stats["files_copied"] == 0
+
+    remove_tree(target)
+    assert not target.exists()
+
+
+def test_sync_with_overlay(tmp_path):
+    """测试内存中的文件代替源文件部署，移除后恢复为源文件"""
+    source = tmp_path / "theme"
+    target = tmp_path / "skins" / "theme"
+    make_theme(source)
+    sync_tree(source, target)
+
+    overlay = {"webkit.css": b"body { color: red; }", "extra.custom.css": b":root {}"}
+    stats = sync_tree(source, target, overlay=overlay)
+    assert stats["files_copied"] == 2
+    assert stats["files_unchanged"] == 2
+    assert (target / "webkit.css").read_text() == "body { color: red; }"
+    assert (source / "webkit.css").read_text() == "body {}"
+
+    assert sync_tree(source, target, overlay=overlay)["files_copied"] == 0
+
+    stats = sync_tree(source, target)
+    assert stats["files_copied"] == 1
+    assert stats["files_deleted"] == 1
+    assert (target / "webkit.css").read_text() == "body {}"
+
+
+def test_deploy_strategies(tmp_path):
+    """测试部署策略的回退"""
+    source = tmp_path / "theme"
+    make_theme(source)
+
+    target = tmp_path / "skins" / "hardlink"
+    stats = sync_tree(source, target, copy_file=get_deploy_function(STRATEGY_HARDLINK))
+    # CSS始终复制，图片资源使用硬链接
+    assert stats["files_copied"] == 1 and stats["files_linked"] == 2
+    assert (target / "assets" / "bg.png").stat().st_ino == (
+        source / "assets" / "bg.png"
+    ).stat().st_ino
+    assert (target / "webkit.css").stat().st_ino != (
+        source / "webkit.css"
+    ).stat().st_ino
+
+    target = tmp_path / "skins" / "copy"
+    stats = sync_tree(source, target, copy_file=get_deploy_function(STRATEGY_COPY))
+    assert stats["files_copied"] == 3 and stats["files_linked"] == 0
+
+    assert deploy_file(source / "webkit.css", tmp_path / "auto.css") in (
+        STRATEGY_REFLINK,
+        STRATEGY_COPY,
+    )
+    assert (tmp_path / "auto.css").read_text() == "body {}"
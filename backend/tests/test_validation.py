@@ -0,0 +1,47 @@
+import json
+import zipfile
+
+import pytest
+
+from ..src.millennium.validation import ThemeValidator
+
+
+def make_theme(root, **config):
+    root.mkdir(parents=True)
+    (root / "skin.json").write_text(json.dumps(config), encoding="utf-8")
+    (root / "webkit.css").write_text("body {}")
+
+
+@pytest.mark.asyncio
+async def test_validate_many(tmp_path):
+    """测试批量验证目录和压缩包，以及结果缓存"""
+    good = tmp_path / "good"
+    make_theme(good, name="Good", author="a", version="1.0")
+    bad = tmp_path / "bad"
+    make_theme(bad, name="Bad")
+    archive = tmp_path / "pack.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(
+            "pack/skin.json", json.dumps({"name": "Zip", "author": "a", "version": "1"})
+        )
+        zf.writestr("pack/webkit.css", "")
+
+    validator = ThemeValidator(max_workers=2)
+    try:
+        results = [r async for r in validator.validate_many([good, bad, archive])]
+        by_path = {r["path"]: r for r in results}
+        assert by_path[str(good)]["valid"]
+        assert not by_path[str(bad)]["valid"]
+        assert "skin.json 缺少字段: author" in by_path[str(bad)]["errors"]
+        assert by_path[str(archive)]["valid"] and by_path[str(archive)]["name"] == "Zip"
+        assert not any(r["cached"] for r in results)
+
+        (bad / "skin.json").write_text(
+            json.dumps({"name": "Bad", "author": "a", "version": "2"})
+        )
+        results = [r async for r in validator.validate_many([good, bad, archive])]
+        by_path = {r["path"]: r for r in results}
+        assert by_path[str(good)]["cached"] and by_path[str(archive)]["cached"]
+        assert not by_path[str(bad)]["cached"] and by_path[str(bad)]["valid"]
+    finally:
+        validator.shutdown()
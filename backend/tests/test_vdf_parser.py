@@ -0,0 +1,93 @@
+import pytest
+
+from ..src.millennium.vdf_parser import VDFParser, iter_events, iter_file_events
+
+SAMPLE = """// Steam library config
+"libraryconfig"
+{
+  "settings"
+  {
+    "SteamTheme" "Old Theme"
+    "Path" "C:\\\\Games\\"x\\""
+    unquoted value
+    "WinOnly" "1" [$WIN32]
+    "Section"
+    {
+      "nested" "yes"
+    }
+  }
+}
+"""
+
+
+def test_parse_key_values():
+    """测试键值对与嵌套块的解析"""
+    data = VDFParser().parse(SAMPLE)
+    settings = data["libraryconfig"]["settings"]
+    assert settings["SteamTheme"] == "Old Theme"
+    assert settings["Path"] == 'C:\\Games"x"'
+    assert settings["unquoted"] == "value"
+    assert settings["Section"] == {"nested": "yes"}
+
+
+def test_parse_conditions():
+    """测试条件标记"""
+    assert "WinOnly" in VDFParser().parse(SAMPLE)["libraryconfig"]["settings"]
+    data = VDFParser(conditions={"LINUX"}).parse(SAMPLE)
+    assert "WinOnly" not in data["libraryconfig"]["settings"]
+
+
+def test_parse_anonymous_root_block():
+    """测试_setup_environment写入的带外层括号的配置"""
+    content = '{\n  "libraryconfig"\n  {\n    "settings"\n    {\n    }\n  }\n}\n'
+    assert VDFParser().parse(content) == {"libraryconfig": {"settings": {}}}
+
+
+@pytest.mark.parametrize("content", ['"a" "b', '"a" {', "}", '"a"'])
+def test_parse_invalid(content):
+    """测试语法错误"""
+    with pytest.raises(ValueError):
+        VDFParser().parse(content)
+
+
+def test_iter_events(tmp_path):
+    """测试流式事件"""
+    events = list(iter_events(SAMPLE))
+    assert events[0] == (("libraryconfig", "settings"), "SteamTheme", "Old Theme")
+    assert events[-1] == (("libraryconfig", "settings", "Section"), "nested", "yes")
+
+    vdf_path = tmp_path / "localconfig.vdf"
+    vdf_path.write_text(SAMPLE, encoding="utf-8")
+    assert list(iter_file_events(vdf_path)) == events
+
+
+def test_update_theme_config_round_trip():
+    """测试更新主题后其他设置不丢失"""
+    parser = VDFParser()
+    updated = parser.update_theme_config(SAMPLE, "New Theme")
+    assert parser.get_current_theme(updated) == "New Theme"
+    original = parser.parse(SAMPLE)
+    original["libraryconfig"]["settings"]["SteamTheme"] = "New Theme"
+    assert parser.parse(updated) == original
+
+
+def test_patch_value_preserves_other_bytes():
+    """测试就地修改只改变SteamTheme的值"""
+    content = (
+        '"libraryconfig"\r\n{\r\n\t"settings"\r\n\t{\r\n'
+        '\t\t"SteamTheme"\t\t"Old"\r\n\t\t"Other"  "keep me"\r\n\t}\r\n}\r\n'
+    )
+    updated = VDFParser().update_theme_config(content, "New")
+    assert updated == content.replace('"Old"', '"New"')
+
+
+def test_patch_value_inserts_missing_structure():
+    """测试缺少settings块时只插入最少的结构"""
+    content = '"libraryconfig"\n{\n\t"other"\t\t"x"\n}\n'
+    parser = VDFParser()
+    updated = parser.update_theme_config(content, "New")
+    assert updated.startswith('"libraryconfig"\n{\n\t"other"\t\t"x"\n')
+    assert parser.parse(updated) == {
+        "libraryconfig": {"other": "x", "settings": {"SteamTheme": "New"}}
+    }
+    assert parser.update_theme_config(updated, "New") == updated
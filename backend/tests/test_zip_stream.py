@@ -0,0 +1,112 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+from ..src.millennium.build_graph import ThemeBuildGraph
+from ..src.millennium.css_build import CSSBuilder, css_builder
+from ..src.millennium.importer import import_archive
+from ..src.millennium.theme import ThemeManager, archive_members
+from ..src.millennium.zip_stream import DEFLATED, STORED, ZipMember, stream_zip
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_stream_zip_roundtrip(tmp_path):
+    """测试流式写入的压缩包可以被 zipfile 读取，已压缩的格式以存储方式写入"""
+    (tmp_path / "big.css").write_bytes(b"a { color: red }\n" * 50000)
+    (tmp_path / "image.png").write_bytes(os.urandom(100000))
+    members = [
+        ZipMember("webkit.css", path=tmp_path / "big.css"),
+        ZipMember("assets/image.png", path=tmp_path / "image.png"),
+        ZipMember("主题/skin.json", data=b'{"name": "x"}'),
+        ZipMember("empty.txt", data=b""),
+    ]
+    data = asyncio.run(collect(stream_zip(members, concurrency=2, chunk_size=4096)))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        infos = {info.filename: info for info in archive.infolist()}
+        assert list(infos) == [
+            "webkit.css",
+            "assets/image.png",
+            "主题/skin.json",
+            "empty.txt",
+        ]
+        assert infos["webkit.css"].compress_type == DEFLATED
+        assert infos["webkit.css"].compress_size < infos["webkit.css"].file_size // 10
+        assert infos["assets/image.png"].compress_type == STORED
+        assert archive.read("assets/image.png") == (tmp_path / "image.png").read_bytes()
+        assert archive.read("主题/skin.json") == b'{"name": "x"}'
+
+
+def test_stream_zip_missing_file(tmp_path):
+    """测试读取失败时数据流抛出异常"""
+    members = [
+        ZipMember("a.css", data=b"a{}"),
+        ZipMember("b.png", path=tmp_path / "missing.png"),
+    ]
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(collect(stream_zip(members)))
+
+
+def test_export_theme_streams_to_file(tmp_path, monkeypatch):
+    """测试导出主题时CSS使用构建结果并直接写入目标文件"""
+    monkeypatch.setattr(css_builder, "cache_dir", tmp_path / "cache")
+    manager = ThemeManager.__new__(ThemeManager)
+    manager.output_dir = tmp_path / "output"
+    manager.templates_dir = tmp_path / "templates"
+    theme = manager.output_dir / "demo"
+    theme.mkdir(parents=True)
+    (theme / "skin.json").write_text(json.dumps({"name": "demo"}))
+    (theme / "webkit.css").write_text("a { color: #ffffff; }")
+    (theme / "logo.png").write_bytes(b"\x89PNG")
+
+    names = [
+        member.name
+        for member in archive_members(theme, manager.templates_dir, prefix="demo/")
+    ]
+    assert names == ["demo/logo.png", "demo/skin.json", "demo/webkit.css"]
+
+    target = asyncio.run(manager.export_theme("demo", tmp_path))
+    with zipfile.ZipFile(target) as archive:
+        assert archive.read("webkit.css") == b"a{color:#fff}"
+        assert archive.read("logo.png") == b"\x89PNG"
+    assert asyncio.run(manager.export_theme("missing", tmp_path)) is None
+
+
+def test_export_flattens_templates(tmp_path, monkeypatch):
+    """测试导出继承模板的主题时内联模板并去掉 template 字段，导入方没有模板也能构建"""
+    monkeypatch.setattr(css_builder, "cache_dir", tmp_path / "cache")
+    templates = tmp_path / "templates"
+    (templates / "base").mkdir(parents=True)
+    (templates / "base" / "friends.custom.css").write_text(".friends { top: 0 }")
+    theme = tmp_path / "themes" / "demo"
+    theme.mkdir(parents=True)
+    (theme / "skin.json").write_text(json.dumps({"name": "demo", "template": "base"}))
+    (theme / "webkit.css").write_text("a { color: red }")
+
+    archive = tmp_path / "demo.zip"
+    archive.write_bytes(
+        asyncio.run(
+            collect(stream_zip(archive_members(theme, templates, prefix="demo/")))
+        )
+    )
+    result = import_archive(archive, tmp_path / "imported")
+    assert result.config == {"name": "demo"}
+    assert (result.path / "friends.custom.css").read_text() == ".friends{top:0}"
+
+    graph = ThemeBuildGraph(
+        result.path, tmp_path / "no-templates", CSSBuilder(tmp_path / "cache")
+    )
+    built, stats = graph.build()
+    assert stats["templates"] == []
+    assert built == {
+        "friends.custom.css": b".friends{top:0}",
+        "webkit.css": b"a{color:red}",
+    }